@@ -0,0 +1,237 @@
+import os
+import sys
+import time
+from collections import namedtuple
+
+from storage import append_line, locked, update_lines
+
+# --- CONSTANTS ---
+POWER_SUPPLY_ROOT = "/sys/class/power_supply"
+HISTORY_FILE = "data/battery.csv"
+TAIL_BYTES = 16 * 1024  # first read when only recent samples are wanted
+TRIM_EVERY = 256         # appends between trims of samples older than `battery.history_days`
+MIN_SAMPLES = 3          # a rate needs at least this many samples...
+MIN_SPAN = 120           # ...spread over at least this many seconds
+MAX_GAP = 1800           # a longer pause between samples (suspend, shutdown) starts a new run
+CHARGING_STATES = ("Charging", "Full", "Not charging")
+EXTERNAL_SUPPLIES = ("Mains", "USB", "USB_C", "USB_PD", "USB_PD_DRP", "Wireless")
+PARTIAL_BLOCKS = "▁▂▃▄▅▆▇"
+
+# percent is a float; seconds_left is the OS/driver estimate (None when it has none)
+Reading = namedtuple("Reading", "time percent plugged status seconds_left source")
+Sample = namedtuple("Sample", "time percent plugged")
+# rate in percent per hour (negative while discharging); seconds to empty or to full
+Estimate = namedtuple("Estimate", "rate seconds samples span")
+
+# --- READING ---
+
+def _read(directory: str, name: str):
+    try:
+        with open(os.path.join(directory, name), "r", encoding="ascii", errors="replace") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def _read_int(directory: str, name: str):
+    value = _read(directory, name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+def read_sysfs(root: str = POWER_SUPPLY_ROOT):
+    """Reading from the kernel's power_supply class, or None without a system battery.
+
+    Several batteries are combined by their energy (or charge) counters, which are also
+    finer-grained than the whole-percent `capacity` file. Peripheral batteries (mice,
+    headsets: scope "Device") are skipped.
+    """
+    try:
+        names = sorted(os.listdir(root))
+    except OSError:
+        return None
+    levels, capacities, statuses, online = [], [], [], []
+    energy_now = power_now = 0
+    for name in names:
+        supply = os.path.join(root, name)
+        kind = _read(supply, "type")
+        if kind in EXTERNAL_SUPPLIES:
+            value = _read_int(supply, "online")
+            if value is not None:
+                online.append(value == 1)
+            continue
+        if kind != "Battery" or _read(supply, "scope") == "Device" or _read(supply, "present") == "0":
+            continue
+        statuses.append(_read(supply, "status") or "Unknown")
+        capacity = _read_int(supply, "capacity")
+        if capacity is not None:
+            capacities.append(capacity)
+        level = None
+        for unit in ("energy", "charge"):
+            now, full = _read_int(supply, f"{unit}_now"), _read_int(supply, f"{unit}_full")
+            if now is not None and full:
+                level = (unit, now, full)
+                levels.append(level)
+                break
+        power = _read_int(supply, "power_now")
+        if power is None:  # charge-reporting drivers give current (uA) instead
+            current, voltage = _read_int(supply, "current_now"), _read_int(supply, "voltage_now")
+            power = current * voltage // 1_000_000 if current is not None and voltage else None
+        if level and level[0] == "energy" and power:
+            energy_now += level[1]
+            power_now += abs(power)
+    if not statuses:
+        return None
+    if levels and len(levels) == len(statuses) and len({unit for unit, _now, _full in levels}) == 1:
+        percent = 100.0 * sum(now for _unit, now, _full in levels) / sum(full for _unit, _now, full in levels)
+    elif capacities:
+        percent = float(sum(capacities)) / len(capacities)
+    else:
+        return None
+    plugged = any(online) if online else any(status in CHARGING_STATES for status in statuses)
+    status = "Charging" if "Charging" in statuses else statuses[0]
+    seconds_left = int(energy_now / power_now * 3600) if power_now and not plugged else None
+    return Reading(time.time(), min(percent, 100.0), plugged, status, seconds_left, "sysfs")
+
+def read_battery(root: str = POWER_SUPPLY_ROOT):
+    """One reading, or None without a battery. On Linux the sysfs files are read
+    directly (psutil reads the same files with more work); elsewhere psutil is asked once."""
+    if sys.platform.startswith("linux") and os.path.isdir(root):
+        return read_sysfs(root)
+    try:
+        import psutil
+        battery = psutil.sensors_battery()
+    except (AttributeError, NotImplementedError, OSError, ImportError):
+        return None
+    if battery is None:
+        return None
+    seconds_left = battery.secsleft
+    if seconds_left in (psutil.POWER_TIME_UNLIMITED, psutil.POWER_TIME_UNKNOWN) or seconds_left < 0:
+        seconds_left = None
+    plugged = bool(battery.power_plugged)
+    status = "Full" if battery.percent >= 100 else ("Charging" if plugged else "Discharging")
+    return Reading(time.time(), float(battery.percent), plugged, status, seconds_left, "psutil")
+
+# --- HISTORY ---
+
+_appends = 0
+
+def record(reading, path: str = HISTORY_FILE, keep_days: float = None):
+    """Appends a reading as one `time,percent,plugged` line (about 20 bytes). Samples
+    are telemetry, so the append is not fsynced; every TRIM_EVERY appends (and on the
+    first one in a process) samples older than keep_days are dropped."""
+    global _appends
+    append_line(path, f"{int(reading.time)},{reading.percent:.2f},{int(reading.plugged)}", fsync="none")
+    if keep_days is not None and _appends % TRIM_EVERY == 0:
+        trim(path, time.time() - keep_days * 86400)
+    _appends += 1
+
+def _parse(line: str):
+    try:
+        stamp, percent, plugged = line.split(",")
+        return Sample(int(stamp), float(percent), plugged.strip() == "1")
+    except ValueError:
+        return None
+
+def trim(path: str, cutoff: float):
+    """Drops samples older than cutoff. Returns how many were dropped."""
+    def mutate(lines):
+        kept = [line for line, sample in zip(lines, map(_parse, lines)) if sample is not None and sample.time >= cutoff]
+        return (kept if len(kept) < len(lines) else None), len(lines) - len(kept)
+    return update_lines(path, mutate, fsync="none")
+
+def load_history(path: str = HISTORY_FILE, since: float = None):
+    """Samples in time order, optionally only those at or after `since`. Recent samples
+    are read from the end of the file, so a short window does not parse all of it."""
+    with locked(path, exclusive=False):
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return []
+        with f:
+            size = f.seek(0, os.SEEK_END)
+            block = TAIL_BYTES
+            while True:
+                start = max(size - block, 0) if since is not None else 0
+                f.seek(start)
+                lines = f.read().decode("ascii", "replace").splitlines()
+                samples = [sample for sample in map(_parse, lines[1:] if start else lines) if sample is not None]
+                if not start or (samples and samples[0].time < since):
+                    break
+                block *= 4
+    if since is not None:
+        samples = [sample for sample in samples if sample.time >= since]
+    return samples
+
+# --- ESTIMATION ---
+
+def current_run(samples, window: float):
+    """The trailing samples in the same plugged state as the newest one, without a
+    pause longer than MAX_GAP, and no older than `window` seconds before the newest."""
+    if not samples:
+        return []
+    last = samples[-1]
+    start = len(samples) - 1
+    while start > 0:
+        previous = samples[start - 1]
+        if (previous.plugged != last.plugged or samples[start].time - previous.time > MAX_GAP
+                or last.time - previous.time > window):
+            break
+        start -= 1
+    return samples[start:]
+
+def estimate(samples, window: float):
+    """Least-squares fit of percent against time over the current run.
+
+    Returns an Estimate with the rate in percent per hour and the seconds until empty
+    (discharging) or full (charging), measured from the fitted level at the newest
+    sample; None while there are too few samples, or the level is not moving the way
+    the plugged state says it should.
+    """
+    run = current_run(samples, window)
+    if len(run) < MIN_SAMPLES or run[-1].time - run[0].time < MIN_SPAN:
+        return None
+    t0 = run[0].time
+    n = len(run)
+    mean_t = sum(s.time - t0 for s in run) / n
+    mean_p = sum(s.percent for s in run) / n
+    var_t = sum((s.time - t0 - mean_t) ** 2 for s in run)
+    if not var_t:
+        return None
+    slope = sum((s.time - t0 - mean_t) * (s.percent - mean_p) for s in run) / var_t  # percent per second
+    level = mean_p + slope * (run[-1].time - t0 - mean_t)
+    if run[-1].plugged:
+        if slope <= 0:
+            return None
+        seconds = max(100.0 - level, 0.0) / slope
+    else:
+        if slope >= 0:
+            return None
+        seconds = max(level, 0.0) / -slope
+    return Estimate(slope * 3600, int(seconds), n, run[-1].time - t0)
+
+# --- CHART ---
+
+def chart(samples, start: float, end: float, width: int, height: int):
+    """Bar chart of the level between start and end: `height` strings of `width` columns
+    (top row first), plus each column's state: "plugged", "discharging" or None when
+    the column has no samples. A column shows the mean of its samples."""
+    sums, counts, plugged = [0.0] * width, [0] * width, [0] * width
+    span = max(end - start, 1)
+    for sample in samples:
+        if start <= sample.time <= end:
+            column = min(int((sample.time - start) / span * width), width - 1)
+            sums[column] += sample.percent
+            counts[column] += 1
+            plugged[column] += sample.plugged
+    eighths = [round(sums[i] / counts[i] / 100 * height * 8) if counts[i] else None for i in range(width)]
+    rows = []
+    for row in range(height - 1, -1, -1):
+        cells = []
+        for level in eighths:
+            filled = -1 if level is None else level - row * 8
+            cells.append(" " if filled <= 0 else "█" if filled >= 8 else PARTIAL_BLOCKS[filled - 1])
+        rows.append("".join(cells))
+    states = [None if not counts[i] else ("plugged" if plugged[i] * 2 >= counts[i] else "discharging")
+              for i in range(width)]
+    return rows, states
@@ -0,0 +1,253 @@
+import hashlib
+import hmac
+import os
+import struct
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+    HAS_CRYPTOGRAPHY = True
+except ImportError:  # Optional dependency: fall back to a stdlib-only construction
+    AESGCM = ChaCha20Poly1305 = None
+    HAS_CRYPTOGRAPHY = False
+
+# --- CONSTANTS ---
+MAGIC = b"LABE"
+FORMAT_VERSION = 1
+DEFAULT_CHUNK_SIZE = 1024 * 1024  # 1 MiB of plaintext per authenticated chunk
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+ALG_AES_GCM = 1
+ALG_CHACHA20 = 2
+ALG_SHAKE_HMAC = 3  # SHAKE256 keystream + HMAC-SHA256 (encrypt-then-MAC), no extra deps
+ALGORITHMS = {"aes-gcm": ALG_AES_GCM, "chacha20": ALG_CHACHA20, "shake-hmac": ALG_SHAKE_HMAC}
+ALGORITHM_NAMES = {v: k for k, v in ALGORITHMS.items()}
+TAG_SIZES = {ALG_AES_GCM: 16, ALG_CHACHA20: 16, ALG_SHAKE_HMAC: 32}
+
+KDF_SCRYPT = 1
+KDF_PBKDF2 = 2
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2 ** 14, 8, 1
+PBKDF2_ITERATIONS = 600_000
+MAX_KDF_FACTOR = 4  # decryption accepts up to this multiple of the encrypt-time KDF work
+
+# magic, version, alg, kdf, kdf cost, kdf r, kdf p, salt, chunk size, base nonce
+HEADER = struct.Struct(">4sBBBIBB16sI12s")
+# flags (bit 0 = final chunk), sealed length
+FRAME = struct.Struct(">BI")
+FLAG_FINAL = 1
+
+class DecryptionError(ValueError):
+    """Raised when a ciphertext is malformed, truncated or fails authentication."""
+
+# --- KEY DERIVATION ---
+
+def default_algorithm():
+    return "aes-gcm" if HAS_CRYPTOGRAPHY else "shake-hmac"
+
+def derive_key(password: str, salt: bytes, kdf: int, cost: int, r: int, p: int, length: int):
+    """Derives `length` key bytes from a password with scrypt or PBKDF2-HMAC-SHA256."""
+    secret = password.encode("utf-8")
+    if kdf == KDF_SCRYPT:
+        return hashlib.scrypt(secret, salt=salt, n=cost, r=r, p=p, dklen=length,
+                              maxmem=256 * cost * r + 1024 * 1024)
+    if kdf == KDF_PBKDF2:
+        return hashlib.pbkdf2_hmac("sha256", secret, salt, cost, dklen=length)
+    raise DecryptionError(f"Unknown key derivation function id: {kdf}")
+
+def _check_kdf(kdf: int, cost: int, r: int, p: int):
+    """Rejects KDF parameters from an untrusted header that would cost more CPU or memory
+    than MAX_KDF_FACTOR times what encrypt_stream uses."""
+    if kdf == KDF_SCRYPT:
+        if cost < 2 or cost & (cost - 1) or r < 1 or p < 1:
+            raise DecryptionError("Invalid scrypt parameters in header.")
+        if cost * r > MAX_KDF_FACTOR * SCRYPT_N * SCRYPT_R or cost * r * p > MAX_KDF_FACTOR * SCRYPT_N * SCRYPT_R * SCRYPT_P:
+            raise DecryptionError("Key derivation cost in header exceeds the allowed maximum.")
+    elif kdf == KDF_PBKDF2:
+        if not 1 <= cost <= MAX_KDF_FACTOR * PBKDF2_ITERATIONS:
+            raise DecryptionError("Key derivation cost in header exceeds the allowed maximum.")
+    else:
+        raise DecryptionError(f"Unknown key derivation function id: {kdf}")
+
+def _default_kdf():
+    """Prefers scrypt; some OpenSSL builds ship hashlib without it."""
+    if hasattr(hashlib, "scrypt"):
+        return KDF_SCRYPT, SCRYPT_N, SCRYPT_R, SCRYPT_P
+    return KDF_PBKDF2, PBKDF2_ITERATIONS, 0, 0
+
+def _key_length(alg):
+    # The stdlib construction needs separate encryption and MAC keys.
+    return 64 if alg == ALG_SHAKE_HMAC else 32
+
+# --- CHUNK PRIMITIVES ---
+
+def _chunk_nonce(base_nonce: bytes, index: int):
+    counter = int.from_bytes(base_nonce[4:], "big") ^ index
+    return base_nonce[:4] + counter.to_bytes(8, "big")
+
+def _chunk_aad(header: bytes, index: int, final: bool):
+    # Binding the index and final flag stops chunks from being reordered, dropped or truncated.
+    return header + struct.pack(">QB", index, FLAG_FINAL if final else 0)
+
+def _xor(data: bytes, keystream: bytes):
+    n = len(data)
+    return (int.from_bytes(data, "big") ^ int.from_bytes(keystream, "big")).to_bytes(n, "big")
+
+def _seal(alg, key, nonce, data, aad):
+    if alg == ALG_AES_GCM:
+        return AESGCM(key).encrypt(nonce, data, aad)
+    if alg == ALG_CHACHA20:
+        return ChaCha20Poly1305(key).encrypt(nonce, data, aad)
+    enc_key, mac_key = key[:32], key[32:]
+    ciphertext = _xor(data, hashlib.shake_256(enc_key + nonce).digest(len(data))) if data else b""
+    tag = hmac.new(mac_key, aad + nonce + ciphertext, hashlib.sha256).digest()
+    return ciphertext + tag
+
+def _open(alg, key, nonce, sealed, aad):
+    try:
+        if alg == ALG_AES_GCM:
+            return AESGCM(key).decrypt(nonce, sealed, aad)
+        if alg == ALG_CHACHA20:
+            return ChaCha20Poly1305(key).decrypt(nonce, sealed, aad)
+    except Exception:
+        raise DecryptionError("Authentication failed: wrong key or corrupted data.")
+    enc_key, mac_key = key[:32], key[32:]
+    ciphertext, tag = sealed[:-32], sealed[-32:]
+    expected = hmac.new(mac_key, aad + nonce + ciphertext, hashlib.sha256).digest()
+    if not hmac.compare_digest(tag, expected):
+        raise DecryptionError("Authentication failed: wrong key or corrupted data.")
+    return _xor(ciphertext, hashlib.shake_256(enc_key + nonce).digest(len(ciphertext))) if ciphertext else b""
+
+def _seal_task(task):
+    alg, key, nonce, data, aad, final = task
+    return FRAME.pack(FLAG_FINAL if final else 0, len(data) + TAG_SIZES[alg]) + _seal(alg, key, nonce, data, aad)
+
+def _open_task(task):
+    alg, key, nonce, sealed, aad = task
+    return _open(alg, key, nonce, sealed, aad)
+
+def _run_ordered(func, tasks, dst, workers):
+    """Applies func to tasks and writes results in order, in parallel when workers > 1.
+
+    At most 2 * workers chunks are in flight, so memory stays bounded for any input size.
+    """
+    total = 0
+    if workers <= 1:
+        for task in tasks:
+            out = func(task)
+            dst.write(out)
+            total += len(out)
+        return total
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(func, task))
+            if len(pending) >= workers * 2:
+                out = pending.popleft().result()
+                dst.write(out)
+                total += len(out)
+        while pending:
+            out = pending.popleft().result()
+            dst.write(out)
+            total += len(out)
+    return total
+
+# --- STREAM FORMAT ---
+
+def _read_full(stream, size):
+    chunks = []
+    remaining = size
+    while remaining:
+        data = stream.read(remaining)
+        if not data:
+            break
+        chunks.append(data)
+        remaining -= len(data)
+    return b"".join(chunks)
+
+def encrypt_stream(src, dst, password: str, algorithm: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE, workers: int = 1):
+    """Encrypts src into dst as a sequence of independently authenticated chunks. Returns bytes written."""
+    algorithm = algorithm or default_algorithm()
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown cipher '{algorithm}'. Use: {', '.join(ALGORITHMS)}")
+    alg = ALGORITHMS[algorithm]
+    if alg != ALG_SHAKE_HMAC and not HAS_CRYPTOGRAPHY:
+        raise ValueError(f"Cipher '{algorithm}' requires the 'cryptography' package.")
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError("Invalid chunk size.")
+
+    kdf, cost, r, p = _default_kdf()
+    salt = os.urandom(16)
+    base_nonce = os.urandom(12)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, alg, kdf, cost, r, p, salt, chunk_size, base_nonce)
+    key = derive_key(password, salt, kdf, cost, r, p, _key_length(alg))
+    dst.write(header)
+
+    def tasks():
+        index = 0
+        current = _read_full(src, chunk_size)
+        while True:
+            following = _read_full(src, chunk_size) if len(current) == chunk_size else b""
+            final = not following
+            yield (alg, key, _chunk_nonce(base_nonce, index), current, _chunk_aad(header, index, final), final)
+            if final:
+                return
+            current = following
+            index += 1
+
+    return len(header) + _run_ordered(_seal_task, tasks(), dst, workers)
+
+def decrypt_stream(src, dst, password: str, workers: int = 1):
+    """Verifies and decrypts a stream produced by encrypt_stream. Returns plaintext bytes written."""
+    header = _read_full(src, HEADER.size)
+    if len(header) != HEADER.size:
+        raise DecryptionError("Input is too short to be an encrypted stream.")
+    magic, version, alg, kdf, cost, r, p, salt, chunk_size, base_nonce = HEADER.unpack(header)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise DecryptionError("Not an encrypted stream (bad header).")
+    if alg not in TAG_SIZES:
+        raise DecryptionError(f"Unknown cipher id: {alg}")
+    if alg != ALG_SHAKE_HMAC and not HAS_CRYPTOGRAPHY:
+        raise DecryptionError(f"Cipher '{ALGORITHM_NAMES[alg]}' requires the 'cryptography' package.")
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise DecryptionError("Invalid chunk size in header.")
+    _check_kdf(kdf, cost, r, p)
+    key = derive_key(password, salt, kdf, cost, r, p, _key_length(alg))
+    max_sealed = chunk_size + TAG_SIZES[alg]
+
+    def tasks():
+        index = 0
+        while True:
+            frame = _read_full(src, FRAME.size)
+            if len(frame) != FRAME.size:
+                raise DecryptionError("Encrypted stream is truncated (missing final chunk).")
+            flags, length = FRAME.unpack(frame)
+            if length > max_sealed:
+                raise DecryptionError("Corrupted chunk length.")
+            sealed = _read_full(src, length)
+            if len(sealed) != length:
+                raise DecryptionError("Encrypted stream is truncated.")
+            final = bool(flags & FLAG_FINAL)
+            yield (alg, key, _chunk_nonce(base_nonce, index), sealed, _chunk_aad(header, index, final))
+            if final:
+                if src.read(1):
+                    raise DecryptionError("Unexpected data after the final chunk.")
+                return
+            index += 1
+
+    return _run_ordered(_open_task, tasks(), dst, workers)
+
+# --- IN-MEMORY HELPERS ---
+
+def encrypt_bytes(data: bytes, password: str, algorithm: str = None):
+    import io
+    out = io.BytesIO()
+    encrypt_stream(io.BytesIO(data), out, password, algorithm)
+    return out.getvalue()
+
+def decrypt_bytes(data: bytes, password: str):
+    import io
+    out = io.BytesIO()
+    decrypt_stream(io.BytesIO(data), out, password)
+    return out.getvalue()
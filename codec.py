@@ -0,0 +1,120 @@
+import base64
+import binascii
+
+# --- CONSTANTS ---
+# 57 raw bytes make one 76-character MIME line, and 57 is a multiple of 3,
+# so every full chunk encodes without padding in all three variants.
+ENCODE_CHUNK_SIZE = 57 * 16384  # ~912 KiB of raw input per read
+DECODE_CHUNK_SIZE = 4 * 262144  # 1 MiB of encoded input per read
+B64_VARIANTS = ("standard", "url", "mime")
+
+_URL_ENCODE_TABLE = bytes.maketrans(b"+/", b"-_")
+_URL_DECODE_TABLE = bytes.maketrans(b"-_", b"+/")
+_WHITESPACE = b" \t\r\n\v\f"
+
+# --- HELPERS ---
+
+def _read_full(stream, view):
+    """Fills a memoryview from stream, looping over short reads (pipes). Returns bytes read."""
+    total = 0
+    size = len(view)
+    while total < size:
+        n = stream.readinto(view[total:])
+        if not n:
+            break
+        total += n
+    return total
+
+def _encode_block(block, variant):
+    if variant == "mime":
+        return base64.encodebytes(block)
+    encoded = binascii.b2a_base64(block, newline=False)
+    if variant == "url":
+        encoded = encoded.translate(_URL_ENCODE_TABLE)
+    return encoded
+
+def _decode_block(block, variant):
+    if variant == "url":
+        block = block.translate(_URL_DECODE_TABLE)
+    return binascii.a2b_base64(block)
+
+# --- BASE64 ENCODE / DECODE ---
+
+def b64_encode_bytes(data: bytes, variant: str = "standard"):
+    """Encodes an in-memory payload using the given variant."""
+    if variant not in B64_VARIANTS:
+        raise ValueError(f"Unknown base64 variant: {variant}")
+    return _encode_block(data, variant)
+
+def b64_decode_bytes(data: bytes, variant: str = "standard"):
+    """Decodes an in-memory payload, tolerating whitespace and missing padding."""
+    if variant not in B64_VARIANTS:
+        raise ValueError(f"Unknown base64 variant: {variant}")
+    data = data.translate(None, _WHITESPACE)
+    data += b"=" * (-len(data) % 4)
+    try:
+        return _decode_block(data, variant)
+    except binascii.Error as e:
+        raise ValueError(f"Invalid base64 input: {e}")
+
+def b64_encode_stream(src, dst, variant: str = "standard", chunk_size: int = ENCODE_CHUNK_SIZE):
+    """Encodes a binary stream into dst in constant memory. Returns (bytes_in, bytes_out)."""
+    if variant not in B64_VARIANTS:
+        raise ValueError(f"Unknown base64 variant: {variant}")
+    if chunk_size <= 0 or chunk_size % 57:
+        raise ValueError("Chunk size must be a positive multiple of 57 bytes.")
+
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    bytes_in = bytes_out = 0
+    while True:
+        n = _read_full(src, view)
+        if not n:
+            break
+        encoded = _encode_block(view[:n], variant)
+        dst.write(encoded)
+        bytes_in += n
+        bytes_out += len(encoded)
+        if n < chunk_size:
+            break
+
+    # Standard/URL output has no trailing newline; keep text files well-formed.
+    if variant != "mime" and bytes_in:
+        dst.write(b"\n")
+        bytes_out += 1
+    return bytes_in, bytes_out
+
+def b64_decode_stream(src, dst, variant: str = "standard", chunk_size: int = DECODE_CHUNK_SIZE):
+    """Decodes a base64 stream into dst in constant memory. Returns (bytes_in, bytes_out)."""
+    if variant not in B64_VARIANTS:
+        raise ValueError(f"Unknown base64 variant: {variant}")
+    if chunk_size <= 0 or chunk_size % 4:
+        raise ValueError("Chunk size must be a positive multiple of 4 bytes.")
+
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    pending = b""
+    bytes_in = bytes_out = 0
+    while True:
+        n = _read_full(src, view)
+        bytes_in += n
+        # Line breaks and spaces can fall anywhere, so only whole 4-char quanta are decoded
+        # and the remainder is carried into the next round.
+        data = pending + bytes(view[:n]).translate(None, _WHITESPACE)
+        eof = n < chunk_size
+        if eof:
+            data += b"=" * (-len(data) % 4)
+            cut = len(data)
+        else:
+            cut = len(data) - (len(data) % 4)
+        pending = data[cut:]
+        if cut:
+            try:
+                decoded = _decode_block(data[:cut], variant)
+            except binascii.Error as e:
+                raise ValueError(f"Invalid base64 input near byte {bytes_in - n}: {e}")
+            dst.write(decoded)
+            bytes_out += len(decoded)
+        if eof:
+            break
+    return bytes_in, bytes_out
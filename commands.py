@@ -1,111 +1,101 @@
 import threading
 import random
 import json
+import re
 import hashlib
-import base64
-import qrcode
-import requests
-import sqlite3
 import os
+import sys
+import time
 import shutil
+import contextlib
+import fnmatch
+from collections import Counter, namedtuple
 from datetime import datetime
-from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
+from rich.markup import escape
+from rich.text import Text
 from rich import print as rprint
 from utils import (
     get_time, open_path, safe_eval, append_note, read_all_notes, get_sysinfo, 
     delete_note_by_index, search_notes, delete_notes_by_keyword, edit_note_by_index,
     read_calc_history, convert_unit, get_random_string, clean_system, 
-    get_battery_info, get_network_info, get_fun_quote, get_fun_joke, set_reminder
+    get_battery_info, get_network_info, get_fun_quote, get_fun_joke, set_reminder,
+    parse_flags
+)
+from codec import b64_encode_bytes, b64_decode_bytes, b64_encode_stream, b64_decode_stream
+from cipher import encrypt_bytes, decrypt_bytes, encrypt_stream, decrypt_stream
+from jsontools import (
+    is_ndjson, parse_query, apply_query, query_stream, format_stream, iter_ndjson, dump_value
+)
+from texttools import (
+    SORT_MEMORY_MB, file_stats, word_counts, top_words, map_files, iter_matches, replace_stream,
+    dedup_stream, sort_unique
+)
+from config import SCHEMA, settings, get_setting
+from registry import COMMANDS, command
+from history import command_history
+from jobs import jobs, check_cancelled, cancellable_copy, sleep as job_sleep
+from pipeline import StatusConsole, PipelineError, as_text, values_or_args, mark_failed
+from output import DataTable, print_lines
+from storage import atomic_write
+from task_store import add_task, list_tasks, complete_task, delete_task, reopen_task
+from passwords import (
+    CHARSETS, iter_passwords, write_passwords, password_entropy, benchmark_passwords,
+    generate_passphrase, generate_token
 )
 
-# Initialize Rich Console for colored output
-console = Console()
+# Initialize Rich Console for colored output (tracks errors for `&&` chains)
+console = StatusConsole()
 
 # Constants
 NOTES_FILE = "data/notes.txt"
+BACKUP_MANIFEST = ".backup_manifest.json"  # written into directory backups so later runs only copy changes
+BACKUP_MANIFEST_VERSION = 1
+
+# Help table section order; plugin categories not listed here follow at the end
+HELP_CATEGORIES = (
+    "Basic", "Note Management", "Calculator & Math", "System Information", "File Management",
+    "Security & Encryption", "Data Processing", "Task Management", "Web Tools", "Backup & Restore",
+    "Settings", "Diagnostics", "History & Scripts", "Pipelines & Chaining", "Background Jobs", "Entertainment",
+    "System Commands",
+)
+# Help rows for syntax rather than commands
+SYNTAX_HELP = {
+    "Pipelines & Chaining": [
+        ("a | b", "Pass values from one command to the next", "password 20 | qr"),
+        ("a && b ; c", "Run b only if a succeeded; c always", "calc 2+2 && note show"),
+        ("head/tail/count/grep", "Filter piped values", "file search \"*.py\" | hash --file | head 10"),
+    ],
+    "Background Jobs": [("<command> &", "Run any command in the background", "backup Documents docs_bak &")],
+    "System Commands": [("exit/quit", "Exit the bot", "exit")],
+}
 
 # --- COMMAND IMPLEMENTATIONS ---
 
-def cmd_help():
+@command("help", help="Show this help menu", example="help", category="Basic")
+def cmd_help(_args):
     table = Table(title="[bold blue]Advanced Local Assistant Bot - Available Commands[/bold blue]", show_header=True, header_style="bold green")
     table.add_column("Command", style="cyan", justify="left")
     table.add_column("Description", style="white", justify="left")
     table.add_column("Example", style="yellow", justify="left")
 
-    # Basic Commands
-    table.add_row("help", "Show this help menu", "help")
-    table.add_row("time", "Display current date & time", "time")
-    table.add_row("open", "Open a file or folder on your system", "open C:\\Users\\...\\Desktop")
-    
-    # Note Management
-    table.add_row("[bold]note add[/bold]", "Add a timestamped note", "note add \"Buy milk\"")
-    table.add_row("[bold]note show[/bold]", "Display all saved notes with indices", "note show")
-    table.add_row("[bold]note delete[/bold]", "Delete note by index or keyword", "note delete 5 / note delete \"milk\"")
-    table.add_row("[bold]note search[/bold]", "Search notes by keyword", "note search Python")
-    table.add_row("[bold]note edit[/bold]", "Edit note by index", "note edit 3 \"New text\"")
-
-    # Calculator & Math
-    table.add_row("[bold]calc[/bold]", "Calculate a math expression", "calc 2+3*4")
-    table.add_row("[bold]calc history[/bold]", "Show last 10 calculations", "calc history")
-    table.add_row("[bold]convert[/bold]", "Convert units (e.g. km to mi)", "convert length 10 km to mi")
-    table.add_row("[bold]random[/bold]", "Generate a random string/number", "random string 15 / random number 1 100")
-    
-    # System Information
-    table.add_row("sysinfo", "Show system hardware/performance info", "sysinfo")
-    table.add_row("clean", "Clean temporary files and caches", "clean")
-    table.add_row("battery", "Show battery percentage and time left", "battery")
-    table.add_row("network", "Show local IP and Wi-Fi name", "network")
-    table.add_row("process", "List running processes", "process list")
-    table.add_row("disk", "Analyze disk usage", "disk")
-    table.add_row("monitor", "Real-time system monitoring", "monitor")
-
-    # File Management
-    table.add_row("[bold]file list[/bold]", "List directory contents", "file list C:\\Users")
-    table.add_row("[bold]file copy[/bold]", "Copy files/directories", "file copy source.txt dest.txt")
-    table.add_row("[bold]file move[/bold]", "Move files/directories", "file move old.txt new.txt")
-    table.add_row("[bold]file delete[/bold]", "Delete files/directories", "file delete temp.txt")
-
-    # Security & Encryption
-    table.add_row("[bold]password[/bold]", "Generate secure passwords", "password 16 -u -n -s")
-    table.add_row("[bold]encrypt[/bold]", "Encrypt text", "encrypt \"secret text\" key123")
-    table.add_row("[bold]decrypt[/bold]", "Decrypt text", "decrypt \"encrypted_text\" key123")
-    table.add_row("[bold]hash[/bold]", "Generate hash (MD5, SHA1, SHA256, SHA512)", "hash \"text\" sha256")
-
-    # Data Processing
-    table.add_row("[bold]base64[/bold]", "Base64 encode text", "base64 \"Hello World\"")
-    table.add_row("[bold]decode64[/bold]", "Base64 decode text", "decode64 \"SGVsbG8gV29ybGQ=\"")
-    table.add_row("[bold]json[/bold]", "Format JSON text", "json '{\"key\":\"value\"}'")
-    table.add_row("[bold]text[/bold]", "Text manipulation tools", "text upper \"hello world\"")
-
-    # Task Management
-    table.add_row("[bold]tasks add[/bold]", "Add a new task", "tasks add \"Complete project\"")
-    table.add_row("[bold]tasks list[/bold]", "List all tasks", "tasks list")
-    table.add_row("[bold]tasks complete[/bold]", "Mark task as complete", "tasks complete 1")
-    table.add_row("[bold]tasks delete[/bold]", "Delete a task", "tasks delete 1")
-
-    # Web Tools
-    table.add_row("[bold]weather[/bold]", "Get weather information", "weather London")
-    table.add_row("[bold]url[/bold]", "Shorten URLs", "url https://example.com")
-    table.add_row("[bold]qr[/bold]", "Generate QR codes", "qr \"https://example.com\"")
-
-    # Backup & Restore
-    table.add_row("[bold]backup[/bold]", "Backup files/directories", "backup C:\\Important backup_folder")
-    table.add_row("[bold]restore[/bold]", "Restore from backup", "restore backup_folder restored")
-
-    # Settings
-    table.add_row("[bold]settings[/bold]", "Manage application settings", "settings show")
-    table.add_row("[bold]settings set[/bold]", "Set a configuration value", "settings set theme dark")
-
-    # Entertainment
-    table.add_row("[bold]fun quote[/bold]", "Get a random quote", "fun quote")
-    table.add_row("[bold]fun joke[/bold]", "Get a local joke", "fun joke")
-    table.add_row("[bold]remind[/bold]", "Set a desktop notification reminder", "remind 60 \"Check code commit\"")
-    
-    # System Commands
-    table.add_row("clear/cls", "Clear the screen", "clear")
-    table.add_row("exit/quit", "Exit the bot", "exit")
+    # Rows come from each command's @command metadata (and plugin manifests), grouped by category
+    by_category = {category: [] for category in HELP_CATEGORIES}
+    for spec in COMMANDS.specs():
+        if spec.hidden:
+            continue
+        rows = spec.help_rows()
+        missing = spec.missing_requirements() if spec.requires else []
+        if missing:
+            rows = [(label, f"{description} [dim](needs {', '.join(missing)})[/dim]", example)
+                    for label, description, example in rows]
+        by_category.setdefault(spec.category, []).extend(rows)
+    for category, rows in SYNTAX_HELP.items():
+        by_category.setdefault(category, []).extend(rows)
+    for rows in by_category.values():
+        for label, description, example in rows:
+            table.add_row(f"[bold]{escape(label)}[/bold]", description, escape(example))
 
     rprint(table)
     rprint(Panel(
@@ -119,24 +109,122 @@ def cmd_help():
     ))
     return None
 
+@command("time", help="Display current date & time", example="time", category="Basic")
 def cmd_time(_args):
     rprint(f"[bold white on blue] Current Time: {get_time()} [/bold white on blue]")
     return None
 
+AUTO_OPEN_SCORE = 0.8  # a name match (not fuzzy) is opened without asking, if it is the clear best
+
+@command("open", help="Open a file or folder, by path or by (part of) its name",
+         example="open report / open C:\\Users\\...\\Desktop", category="Basic")
 def cmd_open(args):
-    if not args:
-        console.print("[bold red] Usage: open <path>[/bold red]")
-        return None
-    path = " ".join(args)
+    """Opens a path, or the best match for a name among recently/often opened paths and
+    the `open.roots` index. `--list` shows the matches, `--pick N` opens one of them."""
+    import pathindex
+
+    try:
+        rest, flags = parse_flags(args, value_flags=("--pick",), bool_flags=("--list", "--recent", "--index", "--forget"))
+        if flags.get("index"):
+            return _open_index()
+        if flags.get("recent"):
+            return _open_recent()
+        if not rest:
+            console.print("[bold red] Usage: open <path or name...> [--list] [--pick N] | open --recent | open --index | open --forget <path>[/bold red]")
+            return None
+        query = " ".join(rest)
+        if flags.get("forget"):
+            if pathindex.forget(os.path.expanduser(query.strip('"').strip("'"))):
+                console.print(f"[bold green] Forgot: {escape(query)}[/bold green]")
+            else:
+                console.print(f"[bold yellow] Not in the recent list: {escape(query)}[/bold yellow]")
+            return None
+
+        direct = os.path.expanduser(query.strip('"').strip("'"))
+        if os.path.exists(direct) and not flags.get("list") and "pick" not in flags:
+            return _open_and_record(direct)
+
+        matches = [match for match in pathindex.search(query) if os.path.exists(match.path)]
+        if not matches:
+            hint = "" if pathindex.load_index() else " (set `open.roots` and run `open --index` to find files by name)"
+            console.print(f"[bold red] Path not found and nothing matches: {escape(query)}{hint}[/bold red]")
+            return None
+        if "pick" in flags:
+            pick = int(flags["pick"])
+            if not 1 <= pick <= len(matches):
+                console.print(f"[bold red] --pick must be between 1 and {len(matches)}[/bold red]")
+                return None
+            return _open_and_record(matches[pick - 1].path)
+        best = matches[0]
+        clear = len(matches) == 1 or best.score > matches[1].score
+        if not flags.get("list") and best.score >= AUTO_OPEN_SCORE and clear:
+            return _open_and_record(best.path)
+
+        table = DataTable(title=f" Matches for '{query}'")
+        table.add_column("#", style="bold white", justify="right")
+        table.add_column("Path", style="cyan")
+        table.add_column("Score", style="yellow", justify="right")
+        table.add_column("From", style="grey50")
+        for number, match in enumerate(matches, 1):
+            table.add_row(str(number), match.path, f"{match.score:.2f}", match.source)
+        table.print(console)
+        console.print(f"[bold yellow] Open one with: open {escape(query)} --pick N[/bold yellow]")
+    except Exception as e:
+        console.print(f"[bold red] Error: {e}[/bold red]")
+    return None
+
+def _open_and_record(path):
+    import pathindex
+
     ok, msg = open_path(path)
     if ok:
-        console.print(f"[bold green] {msg}[/bold green]")
+        pathindex.record_open(path)
+        console.print(f"[bold green] {escape(msg)}[/bold green]")
     else:
-        console.print(f"[bold red] {msg}[/bold red]")
+        console.print(f"[bold red] {escape(msg)}[/bold red]")
+    return None
+
+def _open_recent():
+    import pathindex
+
+    rows = pathindex.frecent()
+    if not rows:
+        console.print("[bold yellow] Nothing opened yet.[/bold yellow]")
+        return None
+    table = DataTable(title=" Recently & Often Opened")
+    table.add_column("Path", style="cyan")
+    table.add_column("Frecency", style="yellow", justify="right")
+    for path, frecency in rows:
+        table.add_row(path, f"{frecency:.1f}")
+    table.print(console)
+    return None
+
+def _open_index():
+    import pathindex
+
+    roots = [root for root in get_setting("open.roots").split(os.pathsep) if root.strip()]
+    if not roots:
+        console.print(f"[bold red] No roots to index: settings set open.roots ~/Documents{os.pathsep}~/Projects[/bold red]")
+        return None
+    missing = [root for root in roots if not os.path.isdir(os.path.expanduser(root))]
+    if missing:
+        console.print(f"[bold yellow] Skipping missing root(s): {escape(', '.join(missing))}[/bold yellow]")
+    start = time.perf_counter()
+    count = pathindex.build_index([root for root in roots if root not in missing])
+    size = os.path.getsize(pathindex.PATH_INDEX_FILE)
+    console.print(f"[bold green] Indexed {count:,} paths into {pathindex.PATH_INDEX_FILE} "
+                  f"({_format_bytes(size)}, {time.perf_counter() - start:.1f}s)[/bold green]")
     return None
 
 # --- NOTE MANAGEMENT COMMAND ---
 
+@command("note", category="Note Management", subcommands={
+    "add": ("Add a timestamped note", "note add \"Buy milk\""),
+    "show": ("Display all saved notes with indices", "note show"),
+    "delete": ("Delete note by index or keyword", "note delete 5 / note delete \"milk\""),
+    "search": ("Search notes by keyword", "note search Python"),
+    "edit": ("Edit note by index", "note edit 3 \"New text\""),
+})
 def cmd_note(args):
     if not args:
         console.print("[bold red] Usage: note add/show/delete/search/edit[/bold red]")
@@ -159,14 +247,14 @@ def cmd_note(args):
             console.print("[bold yellow] No notes found. Add one with 'note add \"text\"'[/bold yellow]")
             return None
         
-        table = Table(title="[bold cyan] Your Local Notes[/bold cyan]", show_header=True, header_style="bold magenta")
+        table = DataTable(title=" Your Local Notes", title_style="bold cyan", header_style="bold magenta")
         table.add_column("Index", style="yellow", justify="right")
         table.add_column("Note Content", style="white", justify="left")
         
         for index, line in enumerate(notes, 1):
             table.add_row(str(index), line.strip())
         
-        rprint(table)
+        table.print(console)
         return None
     
     elif sub == "delete":
@@ -247,6 +335,7 @@ def cmd_note(args):
 
 # --- CALCULATION COMMANDS ---
 
+@command("calc", help="Calculate a math expression", example="calc 2+3*4", category="Calculator & Math")
 def cmd_calc(args):
     if not args:
         console.print("[bold red] Usage: calc <expression> (e.g. calc 1500 / 3.5)[/bold red]")
@@ -261,15 +350,18 @@ def cmd_calc(args):
         console.print(f"[bold red] Error evaluating expression: {expr}[/bold red]")
     return None
 
+@command("calc history", help="Show recent calculations", example="calc history", category="Calculator & Math")
 def cmd_calc_history(_args):
     history = read_calc_history()
     if not history:
         console.print("[bold yellow] Calculation history is empty.[/bold yellow]")
         return None
         
-    rprint(Panel("\n".join(history), title="[bold blue]Last 10 Calculations[/bold blue]"))
+    rprint(Panel("".join(history).rstrip("\n"), title=f"[bold blue]Last {len(history)} Calculations[/bold blue]"))
     return None
 
+@command("convert", help="Convert units (e.g. km to mi)", example="convert length 10 km to mi",
+         category="Calculator & Math", subcommands=("length", "weight", "temp"))
 def cmd_convert(args):
     if len(args) != 4 or args[2].lower() != 'to':
         console.print("[bold red] Usage: convert <type> <value> to <unit>[/bold red]")
@@ -293,6 +385,8 @@ def cmd_convert(args):
         console.print(f"[bold red] Error: {e}[/bold red]")
     return None
 
+@command("random", help="Generate a random string/number", example="random string 15 / random number 1 100",
+         category="Calculator & Math", subcommands=("string", "number"))
 def cmd_random(args):
     if not args:
         console.print("[bold red] Usage: random string [length] or random number [min] [max][/bold red]")
@@ -318,6 +412,7 @@ def cmd_random(args):
 
 # --- SYSTEM COMMANDS ---
 
+@command("sysinfo", help="Show system hardware/performance info", example="sysinfo", category="System Information")
 def cmd_sysinfo(_args):
     info = get_sysinfo()
     rprint(Panel(
@@ -332,13 +427,29 @@ def cmd_sysinfo(_args):
     ))
     return None
 
+@command("clean", help="Clean temporary files and caches", example="clean", category="System Information")
 def cmd_clean(_args):
     rprint(f"[bold yellow] Starting system cleanup...[/bold yellow]")
     msg = clean_system()
     rprint(f"[bold green] Cleanup Complete:[/bold green] {msg}")
     return None
 
-def cmd_battery(_args):
+@command("battery", help="Show battery percentage and time left", example="battery", category="System Information",
+         subcommands={
+             "log": ("Sample the battery every `battery.interval` seconds (run it with &)", "battery log &"),
+             "history": ("Chart of the logged level (green: plugged in)", "battery history --hours 12"),
+         })
+def cmd_battery(args):
+    """Battery level from sysfs (psutil elsewhere), logged so the time left is measured, not guessed"""
+    action = args[0].lower() if args else ""
+    if action == "log":
+        return _battery_log(args[1:])
+    if action == "history":
+        return _battery_history(args[1:])
+    if action:
+        console.print(f"[bold red] Unknown battery action: {action}. Use log or history[/bold red]")
+        return None
+
     info = get_battery_info()
     
     if info["status"] == "N/A":
@@ -347,6 +458,11 @@ def cmd_battery(_args):
         
     plugged_status = "[green]Plugged in[/green]" if info['plugged'] else "[red]Discharging[/red]"
     time_display = f"Time Left: [cyan]{info['time_left']}[/cyan]" if info['time_left'] != 'N/A' else ""
+    if info["estimated"]:
+        time_display += f" [grey50](from {info['samples']} samples)[/grey50]"
+        time_display = f"[bold magenta]Rate:[/bold magenta] [yellow]{info['rate']:+.1f}%/h[/yellow]\n{time_display}"
+    elif time_display:
+        time_display += " [grey50](OS estimate)[/grey50]"
 
     rprint(Panel(
         f"[bold magenta]Status:[/bold magenta] {info['status']} ({plugged_status})\n"
@@ -356,35 +472,312 @@ def cmd_battery(_args):
     ))
     return None
 
-def cmd_network(_args):
-    info = get_network_info()
-    rprint(Panel(
-        f"[bold cyan]IP Address (Local):[/bold cyan] [white]{info.get('IP Address')}[/white]\n"
-        f"[bold cyan]Wi-Fi Name (SSID):[/bold cyan] [white]{info.get('Wi-Fi Name')}[/white]\n"
-        f"[bold cyan]Gateway (Simplified):[/bold cyan] [white]N/A (Requires complex routing info)[/white]",
-        title="[bold blue] Network Info[/bold blue]"
-    ))
+def _battery_log(args):
+    """`battery log [--interval s] [--count N]`: the sampler behind `battery` estimates."""
+    import battery
+
+    try:
+        _rest, flags = parse_flags(args, value_flags=("--interval", "--count"))
+        interval = float(flags["interval"]) if "interval" in flags else None
+        count = int(flags.get("count", 0))
+        if (interval is not None and interval <= 0) or count < 0:
+            console.print("[bold red] Usage: battery log [--interval seconds > 0] [--count N][/bold red]")
+            return None
+        if battery.read_battery() is None:
+            console.print("[bold yellow] Battery information not available (not a laptop or psutil failed).[/bold yellow]")
+            return None
+        taken = 0
+        while True:
+            reading = battery.read_battery()
+            if reading is not None:
+                battery.record(reading, keep_days=get_setting("battery.history_days"))
+                taken += 1
+                window = get_setting("battery.window") * 60
+                fit = battery.estimate(battery.load_history(since=reading.time - window), window)
+                rate = f"  [yellow]{fit.rate:+.1f}%/h[/yellow]" if fit else ""
+                state = "[green]plugged[/green]" if reading.plugged else "[red]on battery[/red]"
+                console.print(f"[bold white]{get_time()}[/bold white]  {reading.percent:.1f}% {state}{rate}")
+            if count and taken >= count:
+                return None
+            # Re-read every tick so `settings set battery.interval` applies to a running log.
+            job_sleep(interval or get_setting("battery.interval"))
+    except KeyboardInterrupt:
+        console.print("\n[bold green] Battery log stopped[/bold green]")
+    except Exception as e:
+        console.print(f"[bold red] Error: {e}[/bold red]")
+    return None
+
+def _battery_history(args):
+    """`battery history [--hours H] [--height N]`: the logged level as a bar chart."""
+    import battery
+
+    try:
+        _rest, flags = parse_flags(args, value_flags=("--hours", "--height"))
+        hours = float(flags.get("hours", 24))
+        height = int(flags.get("height", 8))
+        if hours <= 0 or not 1 <= height <= 50:
+            console.print("[bold red] Usage: battery history [--hours H > 0] [--height 1-50][/bold red]")
+            return None
+        end = time.time()
+        start = end - hours * 3600
+        samples = battery.load_history(since=start)
+        if not samples:
+            console.print("[bold yellow] No battery samples yet. Run `battery` or `battery log &` to record some.[/bold yellow]")
+            return None
+        width = max(console.width - 8, 10)
+        rows, states = battery.chart(samples, start, end, width, height)
+        colours = {"plugged": "green", "discharging": "yellow", None: ""}
+        console.print(f"[bold blue] Battery Level, last {hours:g}h ({len(samples):,} samples)[/bold blue]")
+        for i, row in enumerate(rows):
+            label = "100%" if i == 0 else ("  0%" if i == height - 1 else (" 50%" if i == height // 2 else ""))
+            line = Text(f"{label:>5} ", style="grey50")
+            for cell, state in zip(row, states):
+                line.append(cell, style=colours[state])
+            console.print(line, no_wrap=True, crop=True)
+        fmt = "%H:%M" if hours <= 24 else "%m-%d %H:%M"
+        left, right = datetime.fromtimestamp(start).strftime(fmt), datetime.fromtimestamp(end).strftime(fmt)
+        console.print(Text(" " * 6 + left + right.rjust(width - len(left)), style="grey50"), no_wrap=True, crop=True)
+        window = get_setting("battery.window") * 60
+        fit = battery.estimate(samples, window)
+        latest = samples[-1]
+        summary = f" Now {latest.percent:.1f}%, range {min(s.percent for s in samples):.1f}-{max(s.percent for s in samples):.1f}%"
+        if fit:
+            summary += f", {fit.rate:+.1f}%/h"
+        console.print(f"[bold green]{summary}[/bold green]")
+    except Exception as e:
+        console.print(f"[bold red] Error: {e}[/bold red]")
+    return None
+
+@command("network", help="Show interfaces, gateway, IP and Wi-Fi name", example="network", category="System Information",
+         subcommands={
+             "rates": ("Per-interface receive/transmit rates", "network rates --interval 1 --count 10"),
+             "ping": ("TCP connect latency to hosts (port 443 by default)", "network ping github.com 1.1.1.1:53 --count 5"),
+             "scan": ("Open ports on one of your hosts (--banner, --json)", "network scan 192.168.1.10 1-1024 --banner"),
+             "check": ("Are these services up? (fails if any is down)", "network check db:5432,web:443"),
+         })
+def cmd_network(args):
+    """Network diagnostics from /proc (interfaces, routes, counters) plus TCP latency probes"""
+    import netdiag
+
+    action = args[0].lower() if args else ""
+    try:
+        if action == "rates":
+            rest, flags = parse_flags(args[1:], value_flags=("--interval", "--count"))
+            interval = float(flags.get("interval", 1.0))
+            count = int(flags.get("count", 5))
+            if interval <= 0 or count < 1:
+                console.print("[bold red] Usage: network rates [--interval seconds > 0] [--count N >= 1] [interface...][/bold red]")
+                return None
+            wanted = set(rest)
+            for rates in netdiag.sample_rates(interval, count, sleep=job_sleep):
+                shown = {name: rate for name, rate in rates.items() if name in wanted or (not wanted and name != "lo")}
+                console.print(f"[bold white]{get_time()}[/bold white]  " + "  ".join(
+                    f"[cyan]{escape(name)}[/cyan] rx [green]{_format_bytes(rx)}/s[/green] tx [yellow]{_format_bytes(tx)}/s[/yellow]"
+                    for name, (rx, tx) in sorted(shown.items())))
+            return None
+
+        if action == "ping":
+            rest, flags = parse_flags(args[1:], value_flags=("--count", "--timeout", "--port"))
+            if not rest:
+                console.print("[bold red] Usage: network ping <host[:port]>... [--count N] [--timeout s] [--port P][/bold red]")
+                return None
+            port = int(flags.get("port", netdiag.DEFAULT_PROBE_PORT))
+            targets = [netdiag.parse_target(target, port) for target in rest]
+            results = netdiag.run_probes(targets, int(flags.get("count", 4)), float(flags.get("timeout", 2.0)))
+            table = DataTable(title=" TCP Connect Latency")
+            table.add_column("Target", style="cyan")
+            table.add_column("Address", style="white")
+            table.add_column("Min", style="green", justify="right")
+            table.add_column("Avg", style="yellow", justify="right")
+            table.add_column("Max", style="red", justify="right")
+            table.add_column("Loss", style="magenta", justify="right")
+            table.add_column("Error", style="grey50")
+            for result in results:
+                times = result.times
+                attempts = len(times) + len(result.errors)
+                host = f"[{result.host}]" if ":" in result.host else result.host
+                table.add_row(f"{host}:{result.port}", result.address or "-",
+                              *(f"{t * 1000:.1f} ms" for t in (min(times), sum(times) / len(times), max(times))) if times else ("-",) * 3,
+                              f"{len(result.errors) / attempts:.0%}" if attempts else "-",
+                              result.errors[-1] if result.errors else "")
+            table.print(console)
+            return None
+
+        if action in ("scan", "check"):
+            return _network_scan(action, args[1:])
+
+        if action:
+            console.print(f"[bold red] Unknown network action: {action}. Use rates, ping, scan or check[/bold red]")
+            return None
+
+        info = get_network_info()
+        rprint(Panel(
+            f"[bold cyan]IP Address (Local):[/bold cyan] [white]{info.get('IP Address')}[/white]\n"
+            f"[bold cyan]Wi-Fi Name (SSID):[/bold cyan] [white]{escape(info.get('Wi-Fi Name'))}[/white]\n"
+            f"[bold cyan]Default Gateway:[/bold cyan] [white]{info.get('Gateway')}[/white]",
+            title="[bold blue] Network Info[/bold blue]"
+        ))
+        table = DataTable(title=" Interfaces")
+        table.add_column("Name", style="cyan")
+        table.add_column("State", style="green")
+        table.add_column("Addresses", style="white")
+        table.add_column("MAC", style="grey50")
+        table.add_column("MTU", justify="right")
+        table.add_column("Received", style="yellow", justify="right")
+        table.add_column("Sent", style="yellow", justify="right")
+        for link in netdiag.interfaces():
+            state = link.state + (f" {link.speed} Mb/s" if link.speed else "") + (" wifi" if link.wireless else "")
+            c = link.counters
+            table.add_row(link.name, state, " ".join(link.ipv4 + link.ipv6) or "-", link.mac or "-",
+                          str(link.mtu or "-"), _format_bytes(c.rx_bytes) if c else "-", _format_bytes(c.tx_bytes) if c else "-")
+        table.print(console)
+    except Exception as e:
+        console.print(f"[bold red] Error: {e}[/bold red]")
     return None
     
+PORT_STATES = ("open", "closed", "filtered", "error")
+
+def _network_scan(action, args):
+    """`network scan <host> <ports>` and `network check <host:port,...>`."""
+    import netdiag
+
+    rest, flags = parse_flags(args, value_flags=("--timeout", "--concurrency", "--out"),
+                              bool_flags=("--banner", "--json", "--all"))
+    if action == "scan":
+        if len(rest) != 2:
+            console.print("[bold red] Usage: network scan <host> <ports e.g. 1-1024,8080> [--timeout s] [--concurrency N] [--banner] [--all] [--json] [--out file][/bold red]")
+            return None
+        targets = [(rest[0], port) for port in netdiag.parse_ports(rest[1])]
+    else:
+        if not rest:
+            console.print("[bold red] Usage: network check <host:port>[,<host:port>...] [--timeout s] [--banner] [--json] [--out file][/bold red]")
+            return None
+        targets = netdiag.parse_services(rest)
+    timeout = float(flags.get("timeout", 1.0))
+    concurrency = int(flags.get("concurrency", netdiag.DEFAULT_SCAN_CONCURRENCY))
+    if timeout <= 0 or concurrency < 1:
+        console.print("[bold red] --timeout must be > 0 and --concurrency >= 1[/bold red]")
+        return None
+
+    started = time.perf_counter()
+    results = netdiag.run_scan(targets, timeout, concurrency, bool(flags.get("banner")))
+    elapsed = time.perf_counter() - started
+    counts = Counter(result.state for result in results)
+    down = [result for result in results if result.state != "open"]
+
+    if flags.get("json"):
+        text = json.dumps([result._asdict() for result in results], indent=2)
+        if "out" in flags:
+            with open(flags["out"], "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+            console.print(f"[bold green] {len(results)} result(s) written to {escape(flags['out'])}[/bold green]")
+        else:
+            sys.stdout.write(text + "\n")
+    else:
+        shown = results if action == "check" or flags.get("all") else [r for r in results if r.state == "open"]
+        table = DataTable(title=f" {'Port Scan: ' + rest[0] if action == 'scan' else 'Service Check'}")
+        table.add_column("Target", style="cyan")
+        table.add_column("Address", style="white")
+        table.add_column("State")
+        table.add_column("Connect", style="yellow", justify="right")
+        table.add_column("Banner / Error", style="grey50")
+        for result in shown:
+            host = f"[{result.host}]" if ":" in result.host else result.host
+            table.add_row(f"{host}:{result.port}", result.address or "-", result.state,
+                          f"{result.seconds * 1000:.1f} ms" if result.seconds is not None else "-",
+                          result.error or result.banner or "")
+        if shown:
+            table.print(console)
+    summary = ", ".join(f"{counts[state]} {state}" for state in PORT_STATES if counts[state])
+    if flags.get("json") and "out" not in flags:
+        if action == "check" and down:
+            mark_failed()  # keep stdout valid JSON
+    elif action == "check" and down:
+        console.print(f"[bold red] {len(down)} of {len(results)} service(s) down ({summary}, {elapsed:.2f}s)[/bold red]")
+    else:
+        console.print(f"[bold green] {len(results)} {'service(s)' if action == 'check' else 'port(s)'}: {summary} ({elapsed:.2f}s)[/bold green]")
+    return None
+
 # --- FUN COMMANDS ---
 
+@command("fun", category="Entertainment", subcommands={
+    "quote": ("Get a random quote (--tag to filter)", "fun quote --tag python"),
+    "joke": ("Get a local joke (--tag to filter)", "fun joke --tag networking"),
+    "tags": ("Tags in the quote or joke corpus", "fun tags joke"),
+    "import": ("Add quotes/jokes from a JSON, NDJSON or text file (duplicates skipped)", "fun import quote quotes.json --tag imported"),
+    "refresh": ("Fetch the configured source (or a URL) into the local corpus now", "fun refresh quote"),
+    "dedup": ("Remove repeated entries from a corpus", "fun dedup joke"),
+})
 def cmd_fun(args):
     if not args:
-        console.print("[bold red] Usage: fun quote or fun joke[/bold red]")
+        console.print("[bold red] Usage: fun quote or fun joke [--tag t[,t]] | fun tags|import|refresh|dedup <quote|joke>[/bold red]")
         return None
         
     sub = args[0].lower()
+    try:
+        rest, flags = parse_flags(args[1:], value_flags=("--tag",))
+    except ValueError as e:
+        console.print(f"[bold red] Error: {e}. Usage: fun quote|joke [--tag t[,t]][/bold red]")
+        return None
+    tags = [tag for tag in flags.get("tag", "").split(",") if tag.strip()]
     
     if sub == "quote":
-        quote = get_fun_quote()
-        rprint(Panel(quote, title="[bold magenta] Random Quote[/bold magenta]"))
+        quote = get_fun_quote(tags)
+        if quote is None:
+            console.print(f"[bold yellow] No quote tagged {', '.join(tags)}. See `fun tags quote`.[/bold yellow]")
+            return None
+        rprint(Panel(escape(quote), title="[bold magenta] Random Quote[/bold magenta]"))
     elif sub == "joke":
-        joke = get_fun_joke()
-        rprint(Panel(joke, title="[bold yellow] Moroccan Joke[/bold yellow]"))
+        joke = get_fun_joke(tags)
+        if joke is None:
+            console.print(f"[bold yellow] No joke tagged {', '.join(tags)}. See `fun tags joke`.[/bold yellow]")
+            return None
+        rprint(Panel(escape(joke), title="[bold yellow] Moroccan Joke[/bold yellow]"))
+    elif sub in ("tags", "import", "refresh", "dedup"):
+        return _fun_corpus(sub, rest, tags)
     else:
         console.print(f"[bold red] Unknown fun command: '{sub}'.[/bold red]")
     return None
+
+def _fun_corpus(action, args, tags):
+    """`fun tags|import|refresh|dedup <quote|joke> ...`: maintenance of data/quotes.jsonl and data/jokes.jsonl."""
+    import corpus
+
+    kind = args[0].lower().rstrip("s") if args else ""
+    if kind not in corpus.KINDS or (action == "import" and len(args) != 2):
+        usage = {"import": "fun import <quote|joke> <file> [--tag t[,t]]", "refresh": "fun refresh <quote|joke> [url]"}
+        console.print(f"[bold red] Usage: {usage.get(action, f'fun {action} <quote|joke>')}[/bold red]")
+        return None
+    try:
+        if action == "tags":
+            counts = corpus.tag_counts(kind)
+            table = DataTable(title=f" {kind.title()} Tags ({corpus.entry_count(kind):,} entries)")
+            table.add_column("Tag", style="cyan")
+            table.add_column("Entries", style="yellow", justify="right")
+            for tag, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+                table.add_row(tag, f"{count:,}")
+            table.print(console)
+        elif action == "import":
+            with open(args[1], "r", encoding="utf-8") as f:
+                entries = corpus.parse_entries(f.read(), tags)
+            added, duplicates = corpus.add_entries(kind, entries)
+            console.print(f"[bold green] Added {added:,} {kind}(s) to {corpus.corpus_path(kind)} ({duplicates:,} duplicate(s) skipped)[/bold green]")
+        elif action == "refresh":
+            url = args[1] if len(args) > 1 else get_setting(f"fun.{kind}_source")
+            if not url:
+                console.print(f"[bold red] No source: pass a URL or `settings set fun.{kind}_source <url>`[/bold red]")
+                return None
+            added, duplicates = corpus.refresh(kind, url)
+            console.print(f"[bold green] Fetched {escape(url)}: {added:,} new {kind}(s), {duplicates:,} already known[/bold green]")
+        else:
+            removed = corpus.dedup(kind)
+            console.print(f"[bold green] Removed {removed:,} repeated or unreadable line(s) from {corpus.corpus_path(kind)}[/bold green]")
+    except Exception as e:
+        console.print(f"[bold red] Error: {e}[/bold red]")
+    return None
     
+@command("remind", help="Set a desktop notification reminder", example="remind 60 \"Check code commit\"",
+         category="Entertainment", requires=("plyer",))
 def cmd_remind(args):
     if len(args) < 2 or not args[0].isdigit():
         console.print("[bold red] Usage: remind <seconds> \"message\"[/bold red]")
@@ -406,7 +799,8 @@ def cmd_remind(args):
         console.print(f"[bold red] Error setting reminder (Check if plyer is installed): {e}[/bold red]")
     return None
 
-def cmd_clear():
+@command("clear", aliases=("cls",), help="Clear the screen", example="clear", category="System Commands")
+def cmd_clear(_args):
     import os, platform
     if platform.system() == "Windows":
         os.system("cls")
@@ -416,6 +810,13 @@ def cmd_clear():
 
 # --- ADVANCED COMMANDS ---
 
+@command("file", aliases=("files",), category="File Management", subcommands={
+    "list": ("List directory contents", "file list C:\\Users"),
+    "copy": ("Copy files/directories", "file copy source.txt dest.txt"),
+    "move": ("Move files/directories", "file move old.txt new.txt"),
+    "delete": ("Delete files/directories", "file delete temp.txt"),
+    "search": ("Find files by name pattern", "file search \"*.log\" C:\\Logs"),
+})
 def cmd_file_manager(args):
     """Advanced file management system"""
     if not args:
@@ -427,21 +828,19 @@ def cmd_file_manager(args):
     if action == "list":
         path = args[1] if len(args) > 1 else "."
         try:
-            items = os.listdir(path)
-            table = Table(title=f"[bold blue] Directory Contents: {path}[/bold blue]")
+            table = DataTable(title=f" Directory Contents: {path}")
             table.add_column("Name", style="cyan")
             table.add_column("Type", style="green")
             table.add_column("Size", style="yellow")
             
-            for item in items:
-                item_path = os.path.join(path, item)
-                if os.path.isdir(item_path):
-                    table.add_row(item, " Directory", "N/A")
-                else:
-                    size = os.path.getsize(item_path)
-                    table.add_row(item, " File", f"{size} bytes")
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        table.add_row(entry.name, " Directory", "N/A")
+                    else:
+                        table.add_row(entry.name, " File", f"{entry.stat().st_size} bytes")
             
-            rprint(table)
+            table.print(console)
         except Exception as e:
             console.print(f"[bold red] Error: {e}[/bold red]")
     
@@ -479,57 +878,264 @@ def cmd_file_manager(args):
         except Exception as e:
             console.print(f"[bold red] Error: {e}[/bold red]")
     
+    elif action == "search":
+        if len(args) < 2:
+            console.print("[bold red] Usage: file search <pattern> [root][/bold red]")
+            return None
+        try:
+            found = print_lines(console, iter_file_search(args[1].strip('"'), args[2] if len(args) > 2 else "."))
+            console.print(f"[bold green] {found} match(es)[/bold green]")
+        except Exception as e:
+            console.print(f"[bold red] Error: {e}[/bold red]")
+    
     else:
         console.print(f"[bold red] Unknown file action: {action}[/bold red]")
     
     return None
 
+def iter_file_search(pattern: str, root: str = "."):
+    """Lazily yields paths under root whose name matches a glob pattern (case-insensitive).
+    Uses a watched index (`watch add`) instead of walking when one covers root."""
+    from fs_index import tree_index
+
+    if not os.path.isdir(root):
+        raise FileNotFoundError(f"Directory not found: {root}")
+    pattern = pattern.lower()
+    index = tree_index(root, create=False)
+    if index is not None:
+        top = os.path.abspath(root)
+        for directory, files in index.walk(top):
+            check_cancelled()
+            relative = os.path.relpath(directory, top)
+            dirpath = root if relative == "." else os.path.join(root, relative)
+            for name in sorted(files):
+                if fnmatch.fnmatchcase(name.lower(), pattern):
+                    yield os.path.join(dirpath, name)
+        return
+    for dirpath, dirnames, filenames in os.walk(root):
+        check_cancelled()
+        dirnames.sort()
+        for name in sorted(filenames):
+            if fnmatch.fnmatchcase(name.lower(), pattern):
+                yield os.path.join(dirpath, name)
+
+@command("watch", help="Keep file indexes current with filesystem events", example="watch add ~/Documents",
+         category="File Management", subcommands={
+             "list": ("Watched directories, backend and index sizes", "watch list"),
+             "add": ("Index a directory and keep it current", "watch add ~/Documents"),
+             "remove": ("Stop watching an indexed directory", "watch remove ~/Documents"),
+         })
+def cmd_watch(args):
+    """Filesystem watch service: indexed trees used by `disk tree`, `file search` and `backup`"""
+    from fs_index import drop_index, indexes, tree_index
+    from watcher import watch_service
+
+    action = args[0].lower() if args else "list"
+    try:
+        if action == "add":
+            if len(args) < 2:
+                console.print("[bold red] Usage: watch add <directory>[/bold red]")
+                return None
+            if not get_setting("watch.enabled"):
+                console.print("[bold red] Watching is off (settings set watch.enabled true)[/bold red]")
+                return None
+            started = time.perf_counter()
+            index = tree_index(args[1].strip('"'))
+            size, files = index.totals()
+            console.print(f"[bold green] Watching {escape(index.root)} via {watch_service.backend}: {files:,} files, "
+                          f"{_format_bytes(size)} (indexed in {time.perf_counter() - started:.2f}s)[/bold green]")
+        elif action == "remove":
+            if len(args) < 2:
+                console.print("[bold red] Usage: watch remove <directory>[/bold red]")
+                return None
+            path = args[1].strip('"')
+            if drop_index(path):
+                console.print(f"[bold green] Stopped watching {escape(os.path.abspath(path))}[/bold green]")
+            else:
+                console.print(f"[bold red] Not an indexed directory: {escape(args[1])}[/bold red]")
+        elif action == "list":
+            if not watch_service.roots():
+                console.print("[bold yellow] Nothing is watched yet. Try 'watch add <directory>'[/bold yellow]")
+                return None
+            table = DataTable(title=f" Watched Directories ({watch_service.backend or 'not started'}, "
+                                    f"{watch_service.events:,} events)")
+            table.add_column("Directory", style="cyan")
+            table.add_column("Files", style="green", justify="right")
+            table.add_column("Size", style="yellow", justify="right")
+            table.add_column("Updates", style="magenta", justify="right")
+            table.add_column("Backend", style="blue")
+            backends = {root: backend for root, backend, _count in watch_service.roots()}
+            for index in indexes():
+                size, files = index.totals()
+                table.add_row(index.root, f"{files:,}", _format_bytes(size), f"{index.updates:,}",
+                              backends.get(index.root, ""))
+            for root, backend, _count in watch_service.roots():
+                if not any(index.root == root for index in indexes()):
+                    table.add_row(root, "", "", "", backend)  # e.g. data/ for the note index
+            table.print(console)
+            for error in watch_service.errors[-5:]:
+                console.print(f"[bold yellow] {escape(error)}[/bold yellow]")
+        else:
+            console.print(f"[bold red] Unknown watch action: {action}. Use list, add or remove[/bold red]")
+    except Exception as e:
+        console.print(f"[bold red] Error: {e}[/bold red]")
+    return None
+
+PasswordArgs = namedtuple("PasswordArgs", "mode count size style classes min_per_class sep out")
+
+def _password_args(args):
+    """Parses `password` arguments, for the command and its pipeline stage. mode is
+    phrase/token/uuid/bench or "" for passwords; size is the word count, token bytes or
+    password length. Raises ValueError for bad numbers."""
+    rest, flags = parse_flags(args, value_flags=("--count", "--out", "--min", "--sep"), bool_flags=("--hex",))
+    mode = rest[0].lower() if rest and rest[0].lower() in ("phrase", "token", "uuid", "bench") else ""
+    count = int(flags.get("count", 100000 if mode == "bench" else 1))
+    if count < 1:
+        raise ValueError("--count must be at least 1")
+    style, classes = None, list(CHARSETS)
+    if mode == "phrase":
+        size = int(rest[1]) if len(rest) > 1 else 6
+    elif mode in ("token", "uuid"):
+        size = int(rest[1]) if mode == "token" and len(rest) > 1 else 32
+        style = "uuid" if mode == "uuid" else ("hex" if flags.get("hex") else "urlsafe")
+    elif mode == "bench":
+        size = int(rest[1]) if len(rest) > 1 else 16
+    else:
+        if rest and rest[0].isdigit():
+            size, options = int(rest[0]), rest[1:]
+        else:
+            size, options = get_setting("password.default_length"), rest
+        option_map = {"-l": "lower", "-u": "upper", "-n": "digits", "-s": "symbols"}
+        classes = [name for opt, name in option_map.items() if opt in options] or classes
+    return PasswordArgs(mode, count, size, style, classes, int(flags.get("min", 1)), flags.get("sep", "-"), flags.get("out"))
+
+@command("password", help="Generate secure passwords (bulk, entropy report)",
+         example="password 16 -u -n -s / password 24 --count 100000 --out pw.txt", category="Security & Encryption",
+         subcommands=("phrase", "token", "uuid", "bench"),
+         usage=[("password phrase/token/uuid", "Generate passphrases and random tokens", "password phrase 6 / password token 32 --hex")])
 def cmd_password_gen(args):
-    """Advanced password generator"""
+    """Cryptographically secure password, passphrase and token generator"""
     if not args:
-        console.print("[bold red] Usage: password <length> [options][/bold red]")
-        console.print("[bold yellow]Options: -u (uppercase), -l (lowercase), -n (numbers), -s (symbols)[/bold yellow]")
+        console.print("[bold red] Usage: password <length> [-u -l -n -s] [--count N] [--out file] [--min N][/bold red]")
+        console.print("[bold yellow]Modes: password phrase [words] [--sep -] | password token [bytes] [--hex] | password uuid [--count N] | password bench [length][/bold yellow]")
         return None
     
     try:
-        length = int(args[0])
-        options = args[1:] if len(args) > 1 else []
-        
-        chars = ""
-        if "-l" in options or not options:
-            chars += "abcdefghijklmnopqrstuvwxyz"
-        if "-u" in options or not options:
-            chars += "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-        if "-n" in options or not options:
-            chars += "0123456789"
-        if "-s" in options or not options:
-            chars += "!@#$%^&*()_+-=[]{}|;:,.<>?"
-        
-        password = ''.join(random.choice(chars) for _ in range(length))
-        
+        request = _password_args(args)
+        mode, count = request.mode, request.count
+
+        if mode == "phrase":
+            phrase, bits, source = generate_passphrase(request.size, request.sep)
+            rprint(Panel(
+                f"[bold green]Passphrase:[/bold green]\n[bold white]{escape(phrase)}[/bold white]\n"
+                f"[bold cyan]Entropy:[/bold cyan] {bits:.1f} bits (words: {source})",
+                title="[bold blue]Password Generator[/bold blue]"
+            ))
+            return None
+
+        if mode in ("token", "uuid"):
+            tokens = [generate_token(request.size, request.style) for _ in range(count)]
+            bits = tokens[0][1]
+            if request.out:
+                with open(request.out, "w", encoding="ascii") as f:
+                    f.writelines(t + "\n" for t, _ in tokens)
+                console.print(f"[bold green] Wrote {count} {mode}s to {request.out} ({bits:.0f} bits each)[/bold green]")
+                return None
+            rprint(Panel(
+                "\n".join(f"[bold white]{t}[/bold white]" for t, _ in tokens) + f"\n[bold cyan]Entropy:[/bold cyan] {bits:.0f} bits",
+                title="[bold blue]Token Generator[/bold blue]"
+            ))
+            return None
+
+        if mode == "bench":
+            rate = benchmark_passwords(request.size, count)
+            console.print(f"[bold green] {rate:,.0f} passwords/second (length {request.size}, all classes)[/bold green]")
+            return None
+
+        length, classes, min_per_class = request.size, request.classes, request.min_per_class
+        bits = password_entropy(length, classes, min_per_class)
+
+        if request.out:
+            elapsed = write_passwords(request.out, length, count, classes, min_per_class)
+            console.print(f"[bold green] Wrote {count:,} passwords to {request.out} "
+                          f"({count / max(elapsed, 1e-9):,.0f}/s, {bits:.1f} bits each)[/bold green]")
+            return None
+
+        passwords = list(iter_passwords(length, count, classes, min_per_class))
         rprint(Panel(
-            f"[bold green]Generated Password:[/bold green]\n[bold white]{password}[/bold white]",
+            f"[bold green]Generated Password{'s' if count > 1 else ''}:[/bold green]\n"
+            + "\n".join(f"[bold white]{escape(pw)}[/bold white]" for pw in passwords)
+            + f"\n[bold cyan]Entropy:[/bold cyan] {bits:.1f} bits",
             title="[bold blue]Password Generator[/bold blue]"
         ))
         
-    except ValueError:
-        console.print("[bold red]Invalid length. Please provide a number.[/bold red]")
+    except ValueError as e:
+        console.print(f"[bold red]Invalid input: {e}[/bold red]")
     
     return None
 
+def _cipher_file(flags, password, encrypt):
+    """Streams --file through the chunked cipher format into --out ('-' for stdin/stdout)."""
+    src_path = flags["file"]
+    if "out" in flags:
+        dst_path = flags["out"]
+    elif src_path == "-":
+        dst_path = "-"
+    elif encrypt:
+        dst_path = src_path + ".enc"
+    else:
+        dst_path = src_path[:-4] if src_path.endswith(".enc") else src_path + ".dec"
+    workers = int(flags.get("parallel", 1))
+    # Write to a side file so a failed decryption never leaves unauthenticated output behind.
+    # Stdout cannot be staged: a failure there is reported after the chunks before it.
+    tmp_path = dst_path + ".part" if dst_path != "-" else "-"
+    start = time.perf_counter()
+    try:
+        with _open_stream(src_path, "rb") as src, _open_stream(tmp_path, "wb") as dst:
+            if encrypt:
+                written = encrypt_stream(src, dst, password, flags.get("cipher"), workers=workers)
+            else:
+                written = decrypt_stream(src, dst, password, workers=workers)
+            dst.flush()
+        if tmp_path != "-":
+            os.replace(tmp_path, dst_path)
+    finally:
+        if tmp_path != "-" and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    if dst_path == "-":
+        return
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    size = os.path.getsize(src_path) if src_path != "-" else None
+    rprint(Panel(
+        (f"[bold green]Input:[/bold green] {src_path} ({size} bytes)\n" if size is not None else "[bold green]Input:[/bold green] stdin\n")
+        + f"[bold green]Output:[/bold green] {dst_path} ({written} bytes)\n"
+        f"[bold green]Workers:[/bold green] {workers}\n"
+        f"[bold green]Throughput:[/bold green] {(size if size is not None else written) / elapsed / (1024 * 1024):.1f} MB/s",
+        title="[bold blue] Encryption[/bold blue]" if encrypt else "[bold blue] Decryption[/bold blue]"
+    ))
+
+@command("encrypt", help="Encrypt text or a file (authenticated, key-derived)",
+         example="encrypt \"secret text\" key123 / encrypt --file big.tar --parallel 4 key123", category="Security & Encryption")
 def cmd_encrypt(args):
-    """Simple text encryption"""
+    """Authenticated encryption of text or files (scrypt/PBKDF2 key + AES-GCM/ChaCha20)"""
     if len(args) < 2:
-        console.print("[bold red] Usage: encrypt <text> <key>[/bold red]")
+        console.print("[bold red] Usage: encrypt <text> <key> | encrypt --file <path> [--out <path>] [--cipher aes-gcm|chacha20|shake-hmac] [--parallel N] <key>[/bold red]")
         return None
     
-    text = " ".join(args[:-1])
-    key = args[-1]
-    
     try:
-        encrypted = base64.b64encode(text.encode()).decode()
+        rest, flags = parse_flags(args, value_flags=("--file", "--out", "--cipher", "--parallel"))
+        if not rest:
+            console.print("[bold red] Missing key.[/bold red]")
+            return None
+        key = rest[-1]
+        if "file" in flags:
+            _cipher_file(flags, key, encrypt=True)
+            return None
+
+        text = " ".join(rest[:-1]).strip('"')
+        token = b64_encode_bytes(encrypt_bytes(text.encode(), key, flags.get("cipher")), "url").decode()
         rprint(Panel(
-            f"[bold green]Encrypted Text:[/bold green]\n[bold white]{encrypted}[/bold white]",
+            f"[bold green]Encrypted Text:[/bold green]\n[bold white]{token}[/bold white]",
             title="[bold blue] Encryption[/bold blue]"
         ))
     except Exception as e:
@@ -537,19 +1143,28 @@ def cmd_encrypt(args):
     
     return None
 
+@command("decrypt", help="Decrypt text or a file", example="decrypt \"encrypted_text\" key123 / decrypt --file big.tar.enc key123",
+         category="Security & Encryption")
 def cmd_decrypt(args):
-    """Simple text decryption"""
+    """Verify and decrypt text or files produced by `encrypt`"""
     if len(args) < 2:
-        console.print("[bold red] Usage: decrypt <encrypted_text> <key>[/bold red]")
+        console.print("[bold red] Usage: decrypt <encrypted_text> <key> | decrypt --file <path> [--out <path>] [--parallel N] <key>[/bold red]")
         return None
     
-    encrypted_text = " ".join(args[:-1])
-    key = args[-1]
-    
     try:
-        decrypted = base64.b64decode(encrypted_text.encode()).decode()
+        rest, flags = parse_flags(args, value_flags=("--file", "--out", "--parallel"))
+        if not rest:
+            console.print("[bold red] Missing key.[/bold red]")
+            return None
+        key = rest[-1]
+        if "file" in flags:
+            _cipher_file(flags, key, encrypt=False)
+            return None
+
+        encrypted_text = " ".join(rest[:-1]).strip('"')
+        decrypted = decrypt_bytes(b64_decode_bytes(encrypted_text.encode(), "url"), key).decode("utf-8", errors="replace")
         rprint(Panel(
-            f"[bold green]Decrypted Text:[/bold green]\n[bold white]{decrypted}[/bold white]",
+            f"[bold green]Decrypted Text:[/bold green]\n[bold white]{escape(decrypted)}[/bold white]",
             title="[bold blue] Decryption[/bold blue]"
         ))
     except Exception as e:
@@ -557,28 +1172,28 @@ def cmd_decrypt(args):
     
     return None
 
+HASH_ALGORITHMS = ("md5", "sha1", "sha256", "sha512")
+
+def _hash_algorithm(name: str):
+    """name, lowercased, if `hash` supports it (the command and its pipeline stage)."""
+    algorithm = name.lower()
+    if algorithm not in HASH_ALGORITHMS:
+        raise ValueError(f"Unsupported algorithm. Use: {', '.join(HASH_ALGORITHMS)}")
+    return algorithm
+
+@command("hash", help="Generate hash (MD5, SHA1, SHA256, SHA512)", example="hash \"text\" sha256", category="Security & Encryption")
 def cmd_hash_generator(args):
     """Generate hash for text"""
     if len(args) < 2:
         console.print("[bold red] Usage: hash <text> <algorithm>[/bold red]")
-        console.print("[bold yellow]Algorithms: md5, sha1, sha256, sha512[/bold yellow]")
+        console.print(f"[bold yellow]Algorithms: {', '.join(HASH_ALGORITHMS)}[/bold yellow]")
         return None
     
     text = " ".join(args[:-1])
-    algorithm = args[-1].lower()
     
     try:
-        if algorithm == "md5":
-            hash_value = hashlib.md5(text.encode()).hexdigest()
-        elif algorithm == "sha1":
-            hash_value = hashlib.sha1(text.encode()).hexdigest()
-        elif algorithm == "sha256":
-            hash_value = hashlib.sha256(text.encode()).hexdigest()
-        elif algorithm == "sha512":
-            hash_value = hashlib.sha512(text.encode()).hexdigest()
-        else:
-            console.print("[bold red] Unsupported algorithm. Use: md5, sha1, sha256, sha512[/bold red]")
-            return None
+        algorithm = _hash_algorithm(args[-1])
+        hash_value = hashlib.new(algorithm, text.encode()).hexdigest()
         
         rprint(Panel(
             f"[bold green]{algorithm.upper()} Hash:[/bold green]\n[bold white]{hash_value}[/bold white]",
@@ -589,17 +1204,68 @@ def cmd_hash_generator(args):
     
     return None
 
+def _open_stream(path, mode):
+    """Opens a binary file, or stdin/stdout when path is '-' (pipe mode)."""
+    if path == "-":
+        stream = sys.stdin.buffer if "r" in mode else sys.stdout.buffer
+        return contextlib.nullcontext(stream)
+    if "w" in mode:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return open(path, mode)
+
+def _b64_args(args):
+    """(text args, flags) for base64/decode64 and their pipeline stages."""
+    return parse_flags(args, value_flags=("--in", "--out"), bool_flags=("--url", "--mime"))
+
+def _b64_variant(flags):
+    if flags.get("url"):
+        return "url"
+    if flags.get("mime"):
+        return "mime"
+    return "standard"
+
+def _b64_stream(flags, stream_func, title):
+    """Runs a streaming base64 transform between --in and --out (default stdout)."""
+    src_path = flags.get("in", "-")
+    dst_path = flags.get("out", "-")
+    variant = _b64_variant(flags)
+    start = time.perf_counter()
+    with _open_stream(src_path, "rb") as src, _open_stream(dst_path, "wb") as dst:
+        bytes_in, bytes_out = stream_func(src, dst, variant)
+        dst.flush()
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    if dst_path != "-":
+        rprint(Panel(
+            f"[bold green]Input:[/bold green] {src_path} ({bytes_in} bytes)\n"
+            f"[bold green]Output:[/bold green] {dst_path} ({bytes_out} bytes)\n"
+            f"[bold green]Variant:[/bold green] {variant}\n"
+            f"[bold green]Throughput:[/bold green] {bytes_in / elapsed / (1024 * 1024):.1f} MB/s",
+            title=title
+        ))
+
+@command("base64", help="Base64 encode text or stream a file (--url, --mime)",
+         example="base64 \"Hello World\" / base64 --in big.iso --out big.b64", category="Data Processing")
 def cmd_base64_encode(args):
-    """Base64 encode text"""
+    """Base64 encode text or stream a file (--in/--out, '-' for stdin/stdout)"""
     if not args:
-        console.print("[bold red] Usage: base64 <text>[/bold red]")
+        console.print("[bold red] Usage: base64 <text> | base64 --in <file|-> [--out <file|->] [--url|--mime][/bold red]")
         return None
     
-    text = " ".join(args)
     try:
-        encoded = base64.b64encode(text.encode()).decode()
+        text_args, flags = _b64_args(args)
+        if "in" in flags:
+            _b64_stream(flags, b64_encode_stream, "[bold blue] Base64 Encode[/bold blue]")
+            return None
+
+        text = " ".join(text_args)
+        encoded = b64_encode_bytes(text.encode(), _b64_variant(flags))
+        if "out" in flags:
+            with _open_stream(flags["out"], "wb") as dst:
+                dst.write(encoded)
+            console.print(f"[bold green] Encoded {len(text.encode())} bytes to {flags['out']}[/bold green]")
+            return None
         rprint(Panel(
-            f"[bold green]Base64 Encoded:[/bold green]\n[bold white]{encoded}[/bold white]",
+            f"[bold green]Base64 Encoded:[/bold green]\n[bold white]{encoded.decode().rstrip()}[/bold white]",
             title="[bold blue] Base64 Encode[/bold blue]"
         ))
     except Exception as e:
@@ -607,17 +1273,33 @@ def cmd_base64_encode(args):
     
     return None
 
+@command("decode64", help="Base64 decode text or stream a file",
+         example="decode64 \"SGVsbG8gV29ybGQ=\" / decode64 --in big.b64 --out big.iso", category="Data Processing")
 def cmd_base64_decode(args):
-    """Base64 decode text"""
+    """Base64 decode text or stream a file (--in/--out, '-' for stdin/stdout)"""
     if not args:
-        console.print("[bold red] Usage: decode64 <encoded_text>[/bold red]")
+        console.print("[bold red] Usage: decode64 <encoded_text> | decode64 --in <file|-> [--out <file|->] [--url|--mime][/bold red]")
         return None
     
-    encoded_text = " ".join(args)
     try:
-        decoded = base64.b64decode(encoded_text.encode()).decode()
+        text_args, flags = _b64_args(args)
+        if "in" in flags:
+            _b64_stream(flags, b64_decode_stream, "[bold blue] Base64 Decode[/bold blue]")
+            return None
+
+        encoded_text = " ".join(text_args)
+        decoded = b64_decode_bytes(encoded_text.encode(), _b64_variant(flags))
+        if "out" in flags:
+            with _open_stream(flags["out"], "wb") as dst:
+                dst.write(decoded)
+            console.print(f"[bold green] Decoded {len(decoded)} bytes to {flags['out']}[/bold green]")
+            return None
+        try:
+            shown = decoded.decode("utf-8")
+        except UnicodeDecodeError:
+            shown = f"<binary data, {len(decoded)} bytes: {decoded[:32].hex()}{'...' if len(decoded) > 32 else ''}>\nUse --out <file> to save it."
         rprint(Panel(
-            f"[bold green]Base64 Decoded:[/bold green]\n[bold white]{decoded}[/bold white]",
+            f"[bold green]Base64 Decoded:[/bold green]\n[bold white]{escape(shown)}[/bold white]",
             title="[bold blue] Base64 Decode[/bold blue]"
         ))
     except Exception as e:
@@ -625,33 +1307,214 @@ def cmd_base64_decode(args):
     
     return None
 
+def _json_args(args):
+    """(text args, flags) for `json` and its pipeline stage."""
+    return parse_flags(args, value_flags=("--file", "--query", "--out"), bool_flags=("--minify", "--validate", "--ndjson"))
+
+def _json_file_matches(src, path, query, ndjson=False):
+    """Matches of query streamed from an open JSON or NDJSON (flagged or detected) file."""
+    if ndjson or is_ndjson(path):
+        steps = parse_query(query)
+        return (match for _, record in iter_ndjson(src) for match in apply_query(record, steps))
+    return query_stream(src, query)
+
+def _json_file(flags):
+    """Streams a JSON/NDJSON file through validate, pretty/minify or a path query."""
+    path = flags["file"]
+    ndjson = flags.get("ndjson") or is_ndjson(path)
+    indent = 0 if flags.get("minify") else 2
+    validate_only = flags.get("validate") and "query" not in flags
+    start = time.perf_counter()
+    count = 0
+
+    with contextlib.ExitStack() as stack:
+        src = stack.enter_context(open(path, "r", encoding="utf-8-sig"))
+        if validate_only:
+            out = None
+        elif "out" in flags:
+            out = stack.enter_context(open(flags["out"], "w", encoding="utf-8", buffering=1024 * 1024))
+        else:
+            out = sys.stdout
+
+        if "query" in flags:
+            for match in _json_file_matches(src, path, flags["query"], ndjson):
+                out.write(dump_value(match, indent) + "\n")
+                count += 1
+        elif ndjson:
+            for _, record in iter_ndjson(src):
+                if out:
+                    # NDJSON stays one record per line, so records are always written compact.
+                    out.write(dump_value(record, 0) + "\n")
+                count += 1
+        else:
+            format_stream(src, out.write if out else None, indent)
+            count = 1
+
+    if out is sys.stdout:
+        sys.stdout.flush()
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    unit = "matches" if "query" in flags else ("records" if ndjson else "document")
+    console.print(f"[bold green] {'Valid' if validate_only else 'Processed'} {escape(path)}: "
+                  f"{count} {unit}, {size_mb:.1f} MB in {elapsed:.2f}s ({size_mb / elapsed:.1f} MB/s)[/bold green]")
+
+@command("json", help="Format JSON text", example="json '{\"key\":\"value\"}'", category="Data Processing",
+         usage=[("json --file", "Stream-format, validate or query large (ND)JSON files", "json --file big.json --query .items[].id")])
 def cmd_json_formatter(args):
-    """Format JSON text"""
+    """Format, validate and query JSON text or (ND)JSON files in bounded memory"""
     if not args:
-        console.print("[bold red] Usage: json <json_text>[/bold red]")
+        console.print("[bold red] Usage: json <json_text> | json --file <path> [--query .items[].id] [--minify|--validate] [--ndjson] [--out <path>][/bold red]")
         return None
     
-    json_text = " ".join(args)
     try:
+        rest, flags = _json_args(args)
+        if "file" in flags:
+            _json_file(flags)
+            return None
+
+        json_text = " ".join(rest).strip()
+        # shlex (posix=False) keeps the user's outer quotes: json '{"a": 1}'
+        if len(json_text) >= 2 and json_text[0] == json_text[-1] == "'":
+            json_text = json_text[1:-1]
         parsed = json.loads(json_text)
-        formatted = json.dumps(parsed, indent=2)
+        indent = 0 if flags.get("minify") else 2
+        if "query" in flags:
+            formatted = "\n".join(dump_value(m, indent) for m in apply_query(parsed, parse_query(flags["query"])))
+        elif flags.get("validate"):
+            formatted = "Valid JSON"
+        else:
+            formatted = dump_value(parsed, indent)
         rprint(Panel(
-            f"[bold green]Formatted JSON:[/bold green]\n[bold white]{formatted}[/bold white]",
+            f"[bold green]Formatted JSON:[/bold green]\n[bold white]{escape(formatted)}[/bold white]",
             title="[bold blue] JSON Formatter[/bold blue]"
         ))
     except Exception as e:
-        console.print(f"[bold red] Error: {e}[/bold red]")
+        console.print(f"[bold red] Error: {escape(str(e))}[/bold red]")
     
     return None
 
+class _StdoutLines:
+    """Binary line sink over sys.stdout, so `&` jobs and `|` pipelines capture the lines
+    (sys.stdout.buffer is the real stream, not the per-thread route)."""
+
+    def write(self, line: bytes):
+        return sys.stdout.write(line.decode("utf-8", "replace"))
+
+    def flush(self):
+        sys.stdout.flush()
+
+TEXT_FILE_ACTIONS = ("stats", "top-words", "find", "replace", "uniq", "sort-unique")
+
+def _text_file_args(args):
+    """(args, flags) for the `text` file actions and `text find` in pipelines."""
+    return parse_flags(args, value_flags=("--file", "--out", "--mem", "--workers"), bool_flags=("--ignore-case",))
+
+def _text_file(action, rest, flags):
+    """File-backed text analytics: streaming stats, word frequency, regex and dedup."""
+    rest = [r.strip('"') for r in rest]
+    ignore_case = flags.get("ignore-case", False)
+
+    if action in ("stats", "top-words"):
+        n = 10
+        if action == "top-words" and rest and rest[0].isdigit():
+            n = int(rest.pop(0))
+        paths = ([flags["file"]] if "file" in flags else []) + rest
+        if not paths:
+            console.print(f"[bold red] Usage: text {action} {'[N] ' if action == 'top-words' else ''}--file <path> [more files...][/bold red]")
+            return
+        workers = int(flags["workers"]) if "workers" in flags else None
+        if action == "stats":
+            table = Table(title="[bold blue] Text Stats[/bold blue]")
+            for column, style in (("File", "cyan"), ("Lines", "yellow"), ("Words", "yellow"), ("Chars", "yellow"), ("Bytes", "yellow")):
+                table.add_column(column, style=style, justify="left" if column == "File" else "right")
+            results = map_files(file_stats, paths, workers)
+            for r in results:
+                table.add_row(r["path"], f"{r['lines']:,}", f"{r['words']:,}", f"{r['chars']:,}", f"{r['bytes']:,}")
+            if len(results) > 1:
+                table.add_row("[bold]total[/bold]", *(f"{sum(r[k] for r in results):,}" for k in ("lines", "words", "chars", "bytes")))
+            rprint(table)
+        else:
+            counts = Counter()
+            for partial in map_files(word_counts, paths, workers):
+                counts.update(partial)
+            table = Table(title=f"[bold blue] Top {n} Words ({len(counts):,} distinct)[/bold blue]")
+            table.add_column("Rank", style="cyan", justify="right")
+            table.add_column("Word", style="white")
+            table.add_column("Count", style="yellow", justify="right")
+            for rank, (word, count) in enumerate(top_words(counts, n), 1):
+                table.add_row(str(rank), escape(word), f"{count:,}")
+            rprint(table)
+        return
+
+    if "file" not in flags:
+        console.print(f"[bold red] Usage: text {action} ... --file <path> [--out <path>][/bold red]")
+        return
+    path = flags["file"]
+    out_path = flags.get("out", "-")
+    if out_path != "-" and os.path.exists(out_path) and os.path.exists(path) and os.path.samefile(path, out_path):
+        # Opening --out truncates it before a single line of --file is read
+        console.print("[bold red] --out must not be the input file; write elsewhere and move it over[/bold red]")
+        return
+
+    if action == "find":
+        if not rest:
+            console.print("[bold red] Usage: text find <regex> --file <path> [--ignore-case][/bold red]")
+            return
+        count = 0
+        with contextlib.ExitStack() as stack:
+            out = stack.enter_context(open(flags["out"], "w", encoding="utf-8")) if "out" in flags else sys.stdout
+            for line_number, line in iter_matches(path, rest[0], ignore_case):
+                out.write(f"{line_number}: {line}\n")
+                count += 1
+        console.print(f"[bold green] {count:,} matching lines[/bold green]")
+        return
+
+    if action == "replace":
+        if len(rest) < 2:
+            console.print("[bold red] Usage: text replace <regex> <replacement> --file <path> [--out <path>][/bold red]")
+            return
+        with contextlib.ExitStack() as stack:
+            out = stack.enter_context(open(flags["out"], "w", encoding="utf-8", newline="")) if "out" in flags else sys.stdout
+            total = replace_stream(path, rest[0], rest[1], out, ignore_case)
+        console.print(f"[bold green] {total:,} replacements[/bold green]")
+        return
+
+    # uniq / sort-unique
+    dst_path = flags.get("out", "-")
+    with (_open_stream(dst_path, "wb") if dst_path != "-" else contextlib.nullcontext(_StdoutLines())) as out:
+        if action == "uniq":
+            lines_in, lines_out = dedup_stream(path, out)
+            detail = ""
+        else:
+            lines_in, lines_out, runs = sort_unique(path, out, int(flags.get("mem", SORT_MEMORY_MB)))
+            detail = f", external merge of {runs} runs" if runs else ""
+        out.flush()
+    console.print(f"[bold green] {lines_in:,} lines in, {lines_out:,} unique lines out{detail}[/bold green]")
+
+@command("text", help="Text manipulation tools", example="text upper \"hello world\"", category="Data Processing",
+         subcommands=("upper", "lower", "reverse", "count", "words") + TEXT_FILE_ACTIONS,
+         usage=[("text (files)", "File stats, top words, regex find/replace, uniq, sort-unique",
+                 "text stats --file log.txt / text top-words 20 --file log.txt")])
 def cmd_text_tools(args):
     """Text manipulation tools"""
     if len(args) < 2:
-        console.print("[bold red] Usage: text <action> <text>[/bold red]")
+        console.print("[bold red] Usage: text <action> <text> | text <file action> --file <path>[/bold red]")
         console.print("[bold yellow]Actions: upper, lower, reverse, count, words[/bold yellow]")
+        console.print("[bold yellow]File actions: stats, top-words [N], find <regex>, replace <regex> <repl>, uniq, sort-unique [--mem MB][/bold yellow]")
         return None
     
     action = args[0].lower()
+
+    if action in TEXT_FILE_ACTIONS:
+        try:
+            rest, flags = _text_file_args(args[1:])
+            _text_file(action, rest, flags)
+        except re.error as e:
+            console.print(f"[bold red] Invalid regex: {e}[/bold red]")
+        except Exception as e:
+            console.print(f"[bold red] Error: {escape(str(e))}[/bold red]")
+        return None
+
     text = " ".join(args[1:])
     
     try:
@@ -667,7 +1530,7 @@ def cmd_text_tools(args):
             words = text.split()
             result = f"Words: {words}"
         else:
-            console.print("[bold red] Unknown action. Use: upper, lower, reverse, count, words[/bold red]")
+            console.print("[bold red] Unknown action. Use: upper, lower, reverse, count, words, stats, top-words, find, replace, uniq, sort-unique[/bold red]")
             return None
         
         rprint(Panel(
@@ -679,6 +1542,8 @@ def cmd_text_tools(args):
     
     return None
 
+@command("process", help="List running processes", example="process list", category="System Information",
+         subcommands=("list", "kill"))
 def cmd_process_manager(args):
     """Process management tools"""
     if not args:
@@ -697,7 +1562,7 @@ def cmd_process_manager(args):
                 except (psutil.NoSuchProcess, psutil.AccessDenied):
                     pass
             
-            table = Table(title="[bold blue] Running Processes[/bold blue]")
+            table = DataTable(title=" Running Processes")
             table.add_column("PID", style="cyan")
             table.add_column("Name", style="green")
             table.add_column("CPU %", style="yellow")
@@ -706,12 +1571,12 @@ def cmd_process_manager(args):
             for proc in sorted(processes, key=lambda x: x['cpu_percent'], reverse=True)[:20]:
                 table.add_row(
                     str(proc['pid']),
-                    proc['name'],
+                    proc['name'] or "",
                     f"{proc['cpu_percent']:.1f}%",
                     f"{proc['memory_percent']:.1f}%"
                 )
             
-            rprint(table)
+            table.print(console)
         except Exception as e:
             console.print(f"[bold red] Error: {e}[/bold red]")
     
@@ -731,8 +1596,13 @@ def cmd_process_manager(args):
     
     return None
 
+@command("disk", help="Analyze disk usage", example="disk", category="System Information", subcommands={
+    "tree": ("Largest directories under a path (kept current by `watch`)", "disk tree ~/Documents --top 20"),
+})
 def cmd_disk_analyzer(args):
     """Disk usage analyzer"""
+    if args and args[0].lower() == "tree":
+        return _disk_tree(args[1:])
     try:
         import psutil
         
@@ -747,6 +1617,7 @@ def cmd_disk_analyzer(args):
         table.add_column("Usage %", style="red")
         
         for partition in partitions:
+            check_cancelled()
             try:
                 usage = psutil.disk_usage(partition.mountpoint)
                 total_gb = usage.total / (1024**3)
@@ -772,6 +1643,36 @@ def cmd_disk_analyzer(args):
     
     return None
 
+def _disk_tree(args):
+    """Biggest directories below a path, from a watched TreeIndex (or a one-shot scan)."""
+    from fs_index import scan_index
+
+    try:
+        rest, flags = parse_flags(args, value_flags=("--top",))
+        path = rest[0].strip('"') if rest else "."
+        limit = int(flags.get("top", 20))
+        started = time.perf_counter()
+        index = scan_index(path)
+        size, files = index.totals(path)
+        rows = index.largest(limit, path)
+        elapsed = time.perf_counter() - started
+    except Exception as e:
+        console.print(f"[bold red] Error: {e}[/bold red]")
+        return None
+
+    table = DataTable(title=f" Largest Directories: {path}")
+    table.add_column("Directory", style="cyan")
+    table.add_column("Size", style="yellow", justify="right")
+    table.add_column("Files", style="green", justify="right")
+    top = os.path.abspath(path)
+    for directory, dir_size, dir_files in rows:
+        table.add_row(os.path.relpath(directory, top), _format_bytes(dir_size), f"{dir_files:,}")
+    table.print(console)
+    source = f"index, {index.updates:,} updates" if index.watched and index.updates else ("index" if index.watched else "scan")
+    console.print(f"[bold green] {files:,} files, {_format_bytes(size)} ({source}, {elapsed * 1000:.0f} ms)[/bold green]")
+    return None
+
+@command("monitor", help="Real-time system monitoring", example="monitor", category="System Information")
 def cmd_system_monitor(args):
     """Real-time system monitoring"""
     try:
@@ -779,9 +1680,12 @@ def cmd_system_monitor(args):
         import time
         
         console.print("[bold yellow] Starting system monitor (Press Ctrl+C to stop)...[/bold yellow]")
+        psutil.cpu_percent(interval=None)  # prime the counter; later calls measure since the last one
         
         while True:
-            cpu_percent = psutil.cpu_percent(interval=1)
+            # Re-read every tick so `settings set monitor.interval` applies to a running monitor.
+            job_sleep(get_setting("monitor.interval"))
+            cpu_percent = psutil.cpu_percent(interval=None)
             memory = psutil.virtual_memory()
             disk = psutil.disk_usage('/')
             
@@ -792,8 +1696,6 @@ def cmd_system_monitor(args):
                 title="[bold blue] System Monitor[/bold blue]"
             ))
             
-            time.sleep(2)
-            
     except KeyboardInterrupt:
         console.print("\n[bold green] Monitoring stopped[/bold green]")
     except Exception as e:
@@ -801,104 +1703,98 @@ def cmd_system_monitor(args):
     
     return None
 
+PRIORITY_STYLES = {1: "bold red", 2: "red", 3: "yellow", 4: "green", 5: "grey50"}
+
+@command("tasks", category="Task Management", subcommands={
+    "add": ("Add a new task (--priority, --due, --tag)", "tasks add \"Complete project\" --priority high --due +2d --tag work"),
+    "list": ("List tasks (--due today|overdue|week, --tag, --sort, --all)", "tasks list --due today --tag work --sort priority"),
+    "history": ("List completed tasks", "tasks history"),
+    "complete": ("Mark task as complete", "tasks complete 1"),
+    "delete": ("Delete a task", "tasks delete 1"),
+    "reopen": ("Reopen a completed or deleted task", "tasks reopen 1"),
+})
 def cmd_task_manager(args):
-    """Task management system"""
+    """Task management system (SQLite-backed, stable IDs, priorities, due dates, tags)"""
     if not args:
-        console.print("[bold red] Usage: tasks add/list/complete/delete <task>[/bold red]")
+        console.print("[bold red] Usage: tasks add/list/complete/delete/reopen <task>[/bold red]")
         return None
     
     action = args[0].lower()
     
-    # Simple file-based task storage
-    tasks_file = "data/tasks.txt"
-    os.makedirs(os.path.dirname(tasks_file), exist_ok=True)
-    
+    try:
+        rest, flags = parse_flags(args[1:], value_flags=("--priority", "--due", "--tag", "--sort", "--status", "--limit"),
+                                  bool_flags=("--all",))
+    except ValueError as e:
+        console.print(f"[bold red] {e}[/bold red]")
+        return None
+
     if action == "add":
-        if len(args) < 2:
-            console.print("[bold red] Usage: tasks add <task_description>[/bold red]")
+        if not rest:
+            console.print("[bold red] Usage: tasks add <task_description> [--priority 1-5|high|low] [--due YYYY-MM-DD|today|+3d] [--tag a,b][/bold red]")
             return None
         
-        task = " ".join(args[1:])
-        with open(tasks_file, "a", encoding="utf-8") as f:
-            f.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {task}\n")
-        
-        console.print(f"[bold green] Task added: {task}[/bold green]")
+        task = " ".join(rest).strip().strip('"')
+        try:
+            task_id = add_task(task, flags.get("priority"), flags.get("due"), flags.get("tag"))
+            console.print(f"[bold green] Task #{task_id} added: {escape(task)}[/bold green]")
+        except ValueError as e:
+            console.print(f"[bold red] {e}[/bold red]")
     
-    elif action == "list":
+    elif action in ("list", "history"):
+        status = "done" if action == "history" else ("all" if flags.get("all") else flags.get("status", "open"))
         try:
-            with open(tasks_file, "r", encoding="utf-8") as f:
-                tasks = f.readlines()
-            
-            if not tasks:
-                console.print("[bold yellow] No tasks found[/bold yellow]")
-                return None
-            
-            table = Table(title="[bold blue] Task List[/bold blue]")
-            table.add_column("ID", style="cyan")
-            table.add_column("Task", style="white")
-            table.add_column("Created", style="yellow")
-            
-            for i, task in enumerate(tasks, 1):
-                parts = task.split("] ", 1)
-                timestamp = parts[0] + "]"
-                task_text = parts[1].strip()
-                table.add_row(str(i), task_text, timestamp)
-            
-            rprint(table)
-        except FileNotFoundError:
+            tasks, total = list_tasks(status, flags.get("due"), flags.get("tag"), flags.get("sort", "priority"),
+                                      int(flags.get("limit", 100)))
+        except ValueError as e:
+            console.print(f"[bold red] {e}[/bold red]")
+            return None
+
+        if not tasks:
             console.print("[bold yellow] No tasks found[/bold yellow]")
-    
-    elif action == "complete":
-        if len(args) < 2:
-            console.print("[bold red] Usage: tasks complete <task_id>[/bold red]")
             return None
-        
-        try:
-            task_id = int(args[1])
-            with open(tasks_file, "r", encoding="utf-8") as f:
-                tasks = f.readlines()
-            
-            if 1 <= task_id <= len(tasks):
-                completed_task = tasks.pop(task_id - 1)
-                with open(tasks_file, "w", encoding="utf-8") as f:
-                    f.writelines(tasks)
-                
-                console.print(f"[bold green] Task completed: {completed_task.strip()}[/bold green]")
-            else:
-                console.print(f"[bold red] Task ID {task_id} not found[/bold red]")
-        except ValueError:
-            console.print("[bold red] Invalid task ID[/bold red]")
-        except Exception as e:
-            console.print(f"[bold red] Error: {e}[/bold red]")
+
+        table = Table(title=f"[bold blue] Task List ({len(tasks)} of {total})[/bold blue]")
+        table.add_column("ID", style="cyan", justify="right")
+        table.add_column("Task", style="white")
+        table.add_column("Pri", justify="center")
+        table.add_column("Due", style="magenta")
+        table.add_column("Tags", style="green")
+        table.add_column("Status", style="blue")
+        table.add_column("Created", style="yellow")
+
+        for task in tasks:
+            table.add_row(
+                str(task["id"]), escape(task["text"]),
+                f"[{PRIORITY_STYLES.get(task['priority'], 'white')}]{task['priority']}[/]",
+                task["due"] or "", task["tags"] or "", task["status"], task["created"],
+            )
+
+        rprint(table)
     
-    elif action == "delete":
-        if len(args) < 2:
-            console.print("[bold red] Usage: tasks delete <task_id>[/bold red]")
+    elif action in ("complete", "delete", "reopen"):
+        if not rest:
+            console.print(f"[bold red] Usage: tasks {action} <task_id>[/bold red]")
             return None
         
         try:
-            task_id = int(args[1])
-            with open(tasks_file, "r", encoding="utf-8") as f:
-                tasks = f.readlines()
-            
-            if 1 <= task_id <= len(tasks):
-                deleted_task = tasks.pop(task_id - 1)
-                with open(tasks_file, "w", encoding="utf-8") as f:
-                    f.writelines(tasks)
-                
-                console.print(f"[bold green] Task deleted: {deleted_task.strip()}[/bold green]")
-            else:
-                console.print(f"[bold red] Task ID {task_id} not found[/bold red]")
+            task_id = int(rest[0])
         except ValueError:
             console.print("[bold red] Invalid task ID[/bold red]")
-        except Exception as e:
-            console.print(f"[bold red] Error: {e}[/bold red]")
+            return None
+        operation = {"complete": complete_task, "delete": delete_task, "reopen": reopen_task}[action]
+        verb = {"complete": "completed", "delete": "deleted", "reopen": "open"}[action]
+        task = operation(task_id)
+        if task:
+            console.print(f"[bold green] Task #{task_id} {'reopened' if action == 'reopen' else verb}: {escape(task['text'])}[/bold green]")
+        else:
+            console.print(f"[bold red] Task ID {task_id} not found (or already {verb})[/bold red]")
     
     else:
         console.print(f"[bold red] Unknown action: {action}[/bold red]")
     
     return None
 
+@command("weather", help="Get weather information", example="weather London", category="Web Tools")
 def cmd_weather(args):
     """Weather information (requires API key)"""
     if not args:
@@ -907,15 +1803,17 @@ def cmd_weather(args):
         return None
     
     city = " ".join(args)
-    api_key = "YOUR_API_KEY"  # User needs to set this
+    api_key = get_setting("weather.api_key") or os.environ.get("WEATHER_API_KEY", "")
+    units = get_setting("weather.units")
     
-    if api_key == "YOUR_API_KEY":
-        console.print("[bold yellow] Please set your OpenWeatherMap API key in the code[/bold yellow]")
+    if not api_key:
+        console.print("[bold yellow] Please set your OpenWeatherMap API key: settings set weather.api_key <key>[/bold yellow]")
         return None
     
     try:
-        url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=metric"
-        response = requests.get(url)
+        import requests  # imported on first use: it adds ~80ms to startup
+        url = "http://api.openweathermap.org/data/2.5/weather"
+        response = requests.get(url, params={"q": city, "appid": api_key, "units": units}, timeout=10)
         data = response.json()
         
         if response.status_code == 200:
@@ -924,11 +1822,12 @@ def cmd_weather(args):
             humidity = data['main']['humidity']
             wind_speed = data['wind']['speed']
             
+            temp_unit, speed_unit = {"metric": ("C", "m/s"), "imperial": ("F", "mph")}.get(units, ("K", "m/s"))
             rprint(Panel(
-                f"[bold cyan]Temperature:[/bold cyan] {temp}C\n"
+                f"[bold cyan]Temperature:[/bold cyan] {temp}{temp_unit}\n"
                 f"[bold cyan]Description:[/bold cyan] {description.title()}\n"
                 f"[bold cyan]Humidity:[/bold cyan] {humidity}%\n"
-                f"[bold cyan]Wind Speed:[/bold cyan] {wind_speed} m/s",
+                f"[bold cyan]Wind Speed:[/bold cyan] {wind_speed} {speed_unit}",
                 title=f"[bold blue] Weather in {city.title()}[/bold blue]"
             ))
         else:
@@ -938,6 +1837,7 @@ def cmd_weather(args):
     
     return None
 
+@command("url", help="Shorten URLs", example="url https://example.com", category="Web Tools")
 def cmd_url_shortener(args):
     """URL shortener (using TinyURL)"""
     if not args:
@@ -947,6 +1847,7 @@ def cmd_url_shortener(args):
     long_url = args[0]
     
     try:
+        import requests
         response = requests.get(f"http://tinyurl.com/api-create.php?url={long_url}")
         if response.status_code == 200:
             short_url = response.text.strip()
@@ -961,31 +1862,67 @@ def cmd_url_shortener(args):
     
     return None
 
+QrOptions = namedtuple("QrOptions", "fmt ec box_size border mask")
+
+def _qr_args(args, default_format: str):
+    """(payload args, flags, QrOptions) for `qr` and its pipeline stage."""
+    from qrtools import DEFAULT_BOX_SIZE, DEFAULT_BORDER
+    rest, flags = parse_flags(args, value_flags=("--batch", "--out", "--format", "--ec", "--box", "--border", "--mask", "--workers"))
+    options = QrOptions(flags.get("format", default_format).lower(), flags.get("ec", "M").upper(),
+                        int(flags.get("box", DEFAULT_BOX_SIZE)), int(flags.get("border", DEFAULT_BORDER)),
+                        int(flags["mask"]) if "mask" in flags else None)
+    return rest, flags, options
+
+@command("qr", help="Generate QR codes (png/svg/ascii, --ec L|M|Q|H)", example="qr \"https://example.com\" --format svg",
+         category="Web Tools", requires=("qrcode",),
+         usage=[("qr --batch", "Generate QR codes from a CSV (text[,name])", "qr --batch codes.csv --out qr_codes/")])
 def cmd_qr_generator(args):
-    """QR Code generator"""
+    """QR Code generator (single payloads or CSV batches, PNG/SVG/terminal output)"""
     if not args:
-        console.print("[bold red] Usage: qr <text_or_url>[/bold red]")
+        console.print("[bold red] Usage: qr <text_or_url> [--format png|svg|ascii] [--ec L|M|Q|H] [--out <file>][/bold red]")
+        console.print("[bold yellow]Batch: qr --batch codes.csv --out <dir> [--format svg] [--workers N] [--mask 0-7 (skip mask search, faster)][/bold yellow]")
         return None
     
-    text = " ".join(args)
-    
     try:
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(text)
-        qr.make(fit=True)
-        
-        # Create QR code image
-        img = qr.make_image(fill_color="black", back_color="white")
-        filename = f"qr_code_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-        img.save(filename)
-        
-        console.print(f"[bold green] QR Code generated: {filename}[/bold green]")
-        console.print(f"[bold cyan]Content: {text}[/bold cyan]")
+        from qrtools import generate_cached, generate_batch, read_batch_csv, place_output
+        rest, flags, options = _qr_args(args, "png")
+
+        if "batch" in flags:
+            items = read_batch_csv(flags["batch"])
+            if not items:
+                console.print(f"[bold yellow] No rows found in {flags['batch']}[/bold yellow]")
+                return None
+            out_dir = flags.get("out", "qr_codes")
+            workers = int(flags["workers"]) if "workers" in flags else None
+            stats = generate_batch(items, out_dir, *options, workers)
+            rprint(Panel(
+                f"[bold green]Codes:[/bold green] {stats['items']:,} -> {out_dir}\n"
+                f"[bold green]Encoded:[/bold green] {stats['encoded']:,} (cache hits: {stats['cache_hits']:,})\n"
+                + (f"[bold yellow]Renamed:[/bold yellow] {stats['renamed']:,} (name already used by another code)\n"
+                   if stats["renamed"] else "")
+                + f"[bold green]Time:[/bold green] {stats['seconds']:.2f}s ([yellow]{stats['codes_per_second']:,.0f} codes/s[/yellow])",
+                title="[bold blue] QR Batch[/bold blue]"
+            ))
+            return None
+
+        text = " ".join(rest)
+        cached, hit = generate_cached(text, *options)
+        if options.fmt == "ascii" and "out" not in flags:
+            with open(cached, "r", encoding="utf-8") as f:
+                console.file.write(f.read())
+        else:
+            # Content-addressed default name: repeated payloads reuse one file instead of
+            # timestamped names that collide within the same second.
+            filename = flags.get("out") or f"qr_code_{os.path.basename(cached)}"
+            place_output(cached, filename)
+            console.print(f"[bold green] QR Code generated: {filename}{' (cached)' if hit else ''}[/bold green]")
+        console.print(f"[bold cyan]Content: {escape(text)}[/bold cyan]")
     except Exception as e:
         console.print(f"[bold red] Error: {e}[/bold red]")
     
     return None
 
+@command("backup", help="Backup files/directories", example="backup C:\\Important backup_folder", category="Backup & Restore")
 def cmd_backup(args):
     """Backup system"""
     if not args:
@@ -1000,8 +1937,16 @@ def cmd_backup(args):
             shutil.copy2(source, destination)
             console.print(f"[bold green] File backed up: {source} -> {destination}[/bold green]")
         elif os.path.isdir(source):
-            shutil.copytree(source, destination)
-            console.print(f"[bold green] Directory backed up: {source} -> {destination}[/bold green]")
+            manifest_path = os.path.join(destination, BACKUP_MANIFEST)
+            if os.path.isfile(manifest_path):
+                copied, removed, unchanged = _update_backup(source, destination, manifest_path)
+                console.print(f"[bold green] Backup updated: {source} -> {destination} "
+                              f"({copied} copied, {removed} removed, {unchanged} unchanged)[/bold green]")
+            else:
+                files = _backup_listing(source)
+                shutil.copytree(source, destination, copy_function=cancellable_copy)
+                _write_backup_manifest(manifest_path, source, files)
+                console.print(f"[bold green] Directory backed up: {source} -> {destination}[/bold green]")
         else:
             console.print(f"[bold red] Source not found: {source}[/bold red]")
     except Exception as e:
@@ -1009,6 +1954,47 @@ def cmd_backup(args):
     
     return None
 
+def _backup_listing(source: str):
+    """{relative path: [size, mtime_ns]} for the files under source, from its watched
+    index or a one-shot scan."""
+    from fs_index import scan_index
+
+    top = os.path.abspath(source)
+    listing = {}
+    for directory, files in scan_index(source).walk(top):
+        relative = os.path.relpath(directory, top)
+        for name, (size, mtime) in files.items():
+            listing[name if relative == "." else os.path.join(relative, name)] = [size, mtime]
+    listing.pop(BACKUP_MANIFEST, None)
+    return listing
+
+def _write_backup_manifest(path: str, source: str, files):
+    atomic_write(path, json.dumps({"version": BACKUP_MANIFEST_VERSION, "source": os.path.abspath(source), "files": files}))
+
+def _update_backup(source: str, destination: str, manifest_path: str):
+    """Brings an existing backup up to date: copies files that are new or changed since
+    its manifest and deletes the ones that are gone. Returns (copied, removed, unchanged)."""
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    previous = manifest.get("files", {}) if manifest.get("version") == BACKUP_MANIFEST_VERSION else {}
+    current = _backup_listing(source)
+    copied = 0
+    for relative, state in current.items():
+        if previous.get(relative) == state:
+            continue
+        target = os.path.join(destination, relative)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        cancellable_copy(os.path.join(source, relative), target)
+        copied += 1
+    removed = 0
+    for relative in previous.keys() - current.keys():
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(destination, relative))
+            removed += 1
+    _write_backup_manifest(manifest_path, source, current)
+    return copied, removed, len(current) - copied
+
+@command("restore", help="Restore from backup", example="restore backup_folder restored", category="Backup & Restore")
 def cmd_restore(args):
     """Restore from backup"""
     if not args:
@@ -1023,7 +2009,8 @@ def cmd_restore(args):
             shutil.copy2(backup_path, destination)
             console.print(f"[bold green] File restored: {backup_path} -> {destination}[/bold green]")
         elif os.path.isdir(backup_path):
-            shutil.copytree(backup_path, destination)
+            shutil.copytree(backup_path, destination, copy_function=cancellable_copy,
+                            ignore=shutil.ignore_patterns(BACKUP_MANIFEST))
             console.print(f"[bold green] Directory restored: {backup_path} -> {destination}[/bold green]")
         else:
             console.print(f"[bold red] Backup not found: {backup_path}[/bold red]")
@@ -1032,66 +2019,513 @@ def cmd_restore(args):
     
     return None
 
+@command("settings", aliases=("config",), help="Manage application settings", example="settings show", category="Settings",
+         subcommands={
+             "show": None,
+             "set": ("Set a configuration value", "settings set monitor.interval 0.5"),
+             "reset": ("Restore a setting's default", "settings reset theme"),
+         })
 def cmd_settings(args):
-    """Settings management"""
+    """Settings management (typed schema, nested keys such as monitor.interval)"""
     if not args:
-        console.print("[bold red] Usage: settings show/set <key> <value>[/bold red]")
+        console.print("[bold red] Usage: settings show [key|section] / set <key> <value> / reset <key>[/bold red]")
         return None
     
     action = args[0].lower()
-    settings_file = "data/settings.json"
-    os.makedirs(os.path.dirname(settings_file), exist_ok=True)
     
-    # Load existing settings
-    settings = {}
     try:
-        with open(settings_file, "r", encoding="utf-8") as f:
-            settings = json.load(f)
-    except FileNotFoundError:
-        pass
-    
-    if action == "show":
-        if len(args) > 1:
+        if action == "show":
+            rows = settings.snapshot()
+            if len(args) > 1:
+                prefix = args[1]
+                rows = {k: v for k, v in rows.items() if k == prefix or k.startswith(prefix + ".")}
+                if not rows:
+                    console.print(f"[bold red] Setting '{escape(prefix)}' not found[/bold red]")
+                    return None
+            table = Table(title="[bold blue] Settings[/bold blue]")
+            table.add_column("Key", style="cyan")
+            table.add_column("Value", style="white")
+            table.add_column("Description", style="grey50")
+            for key, (value, is_default) in sorted(rows.items()):
+                shown = escape(json.dumps(value) if not isinstance(value, str) else value)
+                if key == "weather.api_key" and value:
+                    shown = value[:4] + "…"
+                description = SCHEMA[key].description if key in SCHEMA else "(unknown key)"
+                table.add_row(key, f"[grey50]{shown} (default)[/grey50]" if is_default else shown, escape(description))
+            rprint(table)
+        
+        elif action == "set":
+            if len(args) < 3:
+                console.print("[bold red] Usage: settings set <key> <value>[/bold red]")
+                return None
             key = args[1]
-            if key in settings:
-                console.print(f"[bold green]{key}: {settings[key]}[/bold green]")
+            value = settings.set(key, " ".join(args[2:]).strip('"'))
+            console.print(f"[bold green] Setting '{key}' set to '{value}'[/bold green]")
+        
+        elif action == "reset":
+            if len(args) < 2:
+                console.print("[bold red] Usage: settings reset <key>[/bold red]")
+                return None
+            value = settings.reset(args[1])
+            if value is None:
+                console.print(f"[bold green] Setting '{args[1]}' removed[/bold green]")
             else:
-                console.print(f"[bold red] Setting '{key}' not found[/bold red]")
+                console.print(f"[bold green] Setting '{args[1]}' reset to default '{value}'[/bold green]")
+        
         else:
-            if settings:
-                table = Table(title="[bold blue] Settings[/bold blue]")
-                table.add_column("Key", style="cyan")
-                table.add_column("Value", style="white")
-                
-                for key, value in settings.items():
-                    table.add_row(key, str(value))
-                
-                rprint(table)
-            else:
-                console.print("[bold yellow] No settings found[/bold yellow]")
+            console.print(f"[bold red] Unknown action: {action}[/bold red]")
+    except (KeyError, ValueError) as e:
+        console.print(f"[bold red] {escape(str(e.args[0]))}[/bold red]")
+    except Exception as e:
+        console.print(f"[bold red] Error: {e}[/bold red]")
     
-    elif action == "set":
-        if len(args) < 3:
-            console.print("[bold red] Usage: settings set <key> <value>[/bold red]")
+    return None
+
+@command("history", help="Show recent commands (!N, !!, !prefix replay; Ctrl-R searches)", example="history 20",
+         category="History & Scripts", subcommands={"search": ("Find earlier commands", "history search note"), "clear": None})
+def cmd_history(args):
+    """Persistent command history (numbers work with !N)"""
+    try:
+        action = args[0].lower() if args else ""
+        if action == "clear":
+            command_history.clear()
+            console.print("[bold green] History cleared[/bold green]")
             return None
-        
-        key = args[1]
-        value = " ".join(args[2:])
-        
-        # Try to parse as JSON if possible
-        try:
-            value = json.loads(value)
-        except:
-            pass
-        
-        settings[key] = value
-        
-        with open(settings_file, "w", encoding="utf-8") as f:
-            json.dump(settings, f, indent=2)
-        
-        console.print(f"[bold green] Setting '{key}' set to '{value}'[/bold green]")
+        if action == "search":
+            if len(args) < 2:
+                console.print("[bold red] Usage: history search <text>[/bold red]")
+                return None
+            rows = command_history.search(" ".join(args[1:]).strip('"'))
+        else:
+            count = int(action) if action.isdigit() else 20
+            entries = command_history.entries
+            start = max(len(entries) - count, 0)
+            rows = list(zip(range(start + 1, len(entries) + 1), entries[start:]))
+        if not rows:
+            console.print("[bold yellow] No matching history[/bold yellow]")
+            return None
+        table = Table(title="[bold blue] Command History[/bold blue]")
+        table.add_column("#", style="cyan", justify="right")
+        table.add_column("Command", style="white")
+        for number, line in rows:
+            table.add_row(str(number), escape(line))
+        rprint(table)
+    except Exception as e:
+        console.print(f"[bold red] Error: {e}[/bold red]")
     
-    else:
-        console.print(f"[bold red] Unknown action: {action}[/bold red]")
+    return None
+
+@command("record", help="Record commands to a script for main.py --batch", example="record start session.txt",
+         category="History & Scripts", subcommands=("start", "stop", "status"))
+def cmd_record(args):
+    """Records entered commands to a script replayable with `main.py --batch <file>`"""
+    action = args[0].lower() if args else ""
+    try:
+        if action == "start" and len(args) > 1:
+            path = args[1].strip('"')
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(f"# recorded {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            command_history.recording = path
+            console.print(f"[bold green] Recording commands to {escape(path)} (record stop to finish)[/bold green]")
+        elif action == "stop":
+            if not command_history.recording:
+                console.print("[bold yellow] Not recording[/bold yellow]")
+                return None
+            path, command_history.recording = command_history.recording, None
+            console.print(f"[bold green] Saved script {escape(path)}. Replay with: python main.py --batch {escape(path)}[/bold green]")
+        elif action == "status":
+            state = f"recording to {escape(command_history.recording)}" if command_history.recording else "not recording"
+            console.print(f"[bold cyan] {state}[/bold cyan]")
+        else:
+            console.print("[bold red] Usage: record start <file> / record stop / record status[/bold red]")
+    except Exception as e:
+        console.print(f"[bold red] Error: {e}[/bold red]")
     
     return None
+
+@command("plugins", help="List plugin commands (plugins/ and installed packages)", example="plugins", category="Settings")
+def cmd_plugins(_args):
+    """Lists plugin commands, where they come from and whether they are loaded yet"""
+    from plugin_loader import PLUGIN_DIR, PROBLEMS
+    specs = [spec for spec in COMMANDS.specs() if spec.module]
+    if not specs:
+        console.print(f"[bold yellow] No plugins installed. Add modules to {PLUGIN_DIR}[/bold yellow]")
+    else:
+        table = Table(title="[bold blue] Plugins[/bold blue]")
+        table.add_column("Command", style="cyan")
+        table.add_column("Source", style="white")
+        table.add_column("State")
+        for spec in specs:
+            missing = spec.missing_requirements()
+            if missing:
+                state = f"[red]needs {', '.join(missing)}[/red]"
+            else:
+                state = "[green]loaded[/green]" if spec.loaded else "[grey50]not imported yet[/grey50]"
+            table.add_row(escape(spec.name), escape(f"{spec.source} ({spec.module})"), state)
+        rprint(table)
+    for problem in PROBLEMS:
+        console.print(f"[bold yellow] Skipped {escape(problem)}[/bold yellow]")
+    return None
+
+def _format_seconds(seconds: float):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.0f}µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f}ms"
+    return f"{seconds:.2f}s"
+
+def _format_bytes(size: float):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+
+@command("stats", help="Per-command latency percentiles, CPU time and I/O (--json, --prometheus)",
+         example="stats / stats sysinfo / stats --prometheus --out metrics.prom", category="Diagnostics",
+         subcommands=("reset",))
+def cmd_stats(args):
+    """Shows timings recorded around every command (data/stats.json plus this session)"""
+    from stats import command_stats, to_json, to_prometheus
+    try:
+        rest, flags = parse_flags(args, value_flags=("--out",), bool_flags=("--json", "--prometheus"))
+        if rest and rest[0].lower() == "reset":
+            command_stats.reset()
+            console.print("[bold green] Command statistics cleared[/bold green]")
+            return None
+        snapshot = command_stats.snapshot()
+        if rest:
+            wanted = " ".join(rest).lower()
+            snapshot = {label: m for label, m in snapshot.items() if label == wanted or label.startswith(wanted + " ")}
+        if flags.get("json") or flags.get("prometheus"):
+            text = to_prometheus(snapshot) if flags.get("prometheus") else json.dumps(to_json(snapshot), indent=2)
+            if "out" in flags:
+                with open(flags["out"], "w", encoding="utf-8") as f:
+                    f.write(text)
+                console.print(f"[bold green] Statistics written to {escape(flags['out'])}[/bold green]")
+            else:
+                sys.stdout.write(text if text.endswith("\n") else text + "\n")
+            return None
+        if not snapshot:
+            console.print("[bold yellow] No commands recorded yet[/bold yellow]")
+            return None
+
+        traced = any(m.peak_memory.count for m in snapshot.values())
+        table = Table(title="[bold blue] Command Statistics (slowest p95 first)[/bold blue]")
+        table.add_column("Command", style="cyan")
+        table.add_column("Runs", justify="right")
+        for column in ("p50", "p95", "p99", "Max"):
+            table.add_column(column, style="yellow", justify="right")
+        table.add_column("CPU avg", justify="right")
+        table.add_column("I/O avg (r/w)", justify="right")
+        if traced:
+            table.add_column("Peak mem p95", justify="right")
+        for label, m in sorted(snapshot.items(), key=lambda item: -item[1].wall.percentile(95)):
+            runs = m.wall.count
+            row = [
+                escape(label) + (f" [red]({m.failures} failed)[/red]" if m.failures else ""),
+                f"{runs:,}",
+                *(_format_seconds(m.wall.percentile(q)) for q in (50, 95, 99)),
+                _format_seconds(m.wall.maximum),
+                _format_seconds(m.cpu.mean()),
+                f"{_format_bytes(m.read_bytes / runs)} / {_format_bytes(m.write_bytes / runs)}",
+            ]
+            if traced:
+                row.append(_format_bytes(m.peak_memory.percentile(95)) if m.peak_memory.count else "-")
+            table.add_row(*row)
+        rprint(table)
+    except Exception as e:
+        console.print(f"[bold red] Error: {escape(str(e))}[/bold red]")
+    return None
+
+PROFILE_USAGE = "[bold red] Usage: profile [--sample] [--interval ms] [--top N] [--sort cumulative|self|calls] [--save] <command ...>[/bold red]"
+
+@command("profile", help="Profile a command (cProfile, or --sample for a sampling profiler)",
+         example="profile disk / profile --sample --save backup Documents bak", category="Diagnostics")
+def cmd_profile(args):
+    """Runs one command under a profiler and shows its top functions"""
+    from profiler import DEFAULT_INTERVAL, SORT_KEYS, DeterministicProfiler, SamplingProfiler, profile_path
+    # Options come before the command so they never clash with the command's own flags
+    options = {"sample": False, "save": False, "top": 20, "sort": "cumulative", "interval": DEFAULT_INTERVAL * 1000}
+    while args and args[0].startswith("--"):
+        option = args.pop(0)[2:]
+        if option in ("sample", "save"):
+            options[option] = True
+        elif option in ("top", "sort", "interval") and args:
+            options[option] = args.pop(0)
+        else:
+            console.print(PROFILE_USAGE)
+            return None
+    line = " ".join(args)
+    path, handler, handler_args = COMMANDS.resolve(args)
+    if handler is None:
+        console.print(PROFILE_USAGE if not args else f"[bold red] Unknown command: {escape(args[0])}[/bold red]")
+        return None
+    try:
+        top, sort = int(options["top"]), options["sort"]
+        if sort not in SORT_KEYS:
+            raise ValueError(f"--sort must be one of: {', '.join(SORT_KEYS)}")
+        profiler = SamplingProfiler(float(options["interval"]) / 1000) if options["sample"] else DeterministicProfiler()
+        started = time.perf_counter()
+        try:
+            profiler.run(handler, handler_args)
+        except KeyboardInterrupt:
+            console.print("[bold yellow] Interrupted; showing the profile so far[/bold yellow]")
+        elapsed = time.perf_counter() - started
+    except Exception as e:
+        console.print(f"[bold red] Error: {escape(str(e))}[/bold red]")
+        return None
+
+    sampling = options["sample"]
+    table = Table(title=f"[bold blue] Profile: {escape(line)} ({elapsed:.3f}s, "
+                        f"{f'{profiler.samples} samples' if sampling else 'cProfile'})[/bold blue]")
+    table.add_column("Function", style="cyan")
+    table.add_column("Samples" if sampling else "Calls", justify="right")
+    table.add_column("Self", style="yellow", justify="right")
+    table.add_column("Cumulative", style="yellow", justify="right")
+    for label, self_time, cumulative, calls in profiler.top(top, sort):
+        table.add_row(escape(label), f"{calls:,}", _format_seconds(self_time), _format_seconds(cumulative))
+    rprint(table)
+    if options["save"]:
+        if sampling:
+            target = profile_path(line, "folded")
+            profiler.write_collapsed(target)
+            hint = "flamegraph.pl, speedscope or inferno"
+        else:
+            target = profile_path(line, "pstats")
+            profiler.write_pstats(target)
+            hint = "python -m pstats or snakeviz"
+        console.print(f"[bold green] Profile saved to {escape(target)} (open with {hint})[/bold green]")
+    return None
+
+JOB_STATE_STYLES = {"pending": "grey50", "running": "yellow", "done": "green", "cancelled": "magenta", "failed": "red"}
+
+def _job_id(arg):
+    return int(arg.lstrip("%"))
+
+def _job_summary(job):
+    style = JOB_STATE_STYLES.get(job.state, "white")
+    summary = f"[{style}][{job.id}] {job.state}[/{style}] {escape(job.line)} ({job.elapsed():.1f}s)"
+    if job.error is not None:
+        summary += f"\n[bold red] Error: {escape(str(job.error))}[/bold red]"
+    return summary
+
+def show_finished_jobs():
+    """Prints jobs that ended since the last prompt, with their buffered output."""
+    for job in jobs.take_finished():
+        text = job.output.text()
+        if text:
+            sys.stdout.write(text)
+        console.print(_job_summary(job))
+
+@command("jobs", help="List background jobs", example="jobs", category="Background Jobs")
+def cmd_jobs(_args):
+    """Lists background jobs"""
+    job_list = jobs.list()
+    if not job_list:
+        console.print("[bold yellow] No background jobs[/bold yellow]")
+        return None
+    table = Table(title="[bold blue] Background Jobs[/bold blue]")
+    table.add_column("Job", style="cyan", justify="right")
+    table.add_column("State")
+    table.add_column("Time", style="yellow", justify="right")
+    table.add_column("Command", style="white")
+    for job in job_list:
+        style = JOB_STATE_STYLES.get(job.state, "white")
+        table.add_row(f"%{job.id}", f"[{style}]{job.state}[/{style}]", f"{job.elapsed():.1f}s", escape(job.line))
+    rprint(table)
+    return None
+
+@command("fg", help="Show a job's output and wait for it (Ctrl+C cancels)", example="fg 1", category="Background Jobs")
+def cmd_fg(args):
+    """Brings a background job to the foreground"""
+    try:
+        job_list = jobs.list()
+        if not args and not job_list:
+            console.print("[bold yellow] No background jobs[/bold yellow]")
+            return None
+        job = jobs.wait(_job_id(args[0]) if args else job_list[-1].id)
+        console.print(_job_summary(job))
+    except (LookupError, ValueError) as e:
+        console.print(f"[bold red] {escape(str(e))}[/bold red]")
+    return None
+
+@command("kill", help="Cancel a background job", example="kill %1", category="Background Jobs")
+def cmd_kill(args):
+    """Cancels a background job (cooperatively, at its next cancellation point)"""
+    if not args:
+        console.print("[bold red] Usage: kill %<job>[/bold red]")
+        return None
+    try:
+        job = jobs.cancel(_job_id(args[0]))
+        if job.state == "cancelled":
+            console.print(f"[bold green] Job %{job.id} cancelled[/bold green]")
+        else:
+            console.print(f"[bold yellow] Cancelling job %{job.id}; it stops at its next checkpoint[/bold yellow]")
+    except (LookupError, ValueError) as e:
+        console.print(f"[bold red] {escape(str(e))}[/bold red]")
+    return None
+
+# --- PIPELINE STAGES ---
+# stage(args, upstream) -> iterator of values. upstream is the previous stage's iterator,
+# or None when the stage starts the pipeline. Values stay Python objects between stages.
+
+def _pipe_password(args, upstream):
+    request = _password_args(args)
+    if request.mode == "bench" or request.out:
+        raise PipelineError("Pipelines support: password [length], password phrase/token/uuid (without --out)")
+    if request.mode == "phrase":
+        return (generate_passphrase(request.size, request.sep)[0] for _ in range(request.count))
+    if request.mode in ("token", "uuid"):
+        return (generate_token(request.size, request.style)[0] for _ in range(request.count))
+    return iter_passwords(request.size, request.count, request.classes, request.min_per_class)
+
+def _pipe_sysinfo(_args, _upstream):
+    yield get_sysinfo()
+
+def _pipe_file(args, upstream):
+    action = args[0].lower() if args else ""
+    if action == "search" and len(args) > 1:
+        roots = [as_text(v) for v in upstream] if upstream is not None else [args[2] if len(args) > 2 else "."]
+        for root in roots:
+            yield from iter_file_search(args[1].strip('"'), root)
+    elif action == "list":
+        path = args[1] if len(args) > 1 else "."
+        for name in sorted(os.listdir(path)):
+            yield os.path.join(path, name)
+    else:
+        raise PipelineError("Pipelines support: file search <pattern> [root], file list [path]")
+
+def _file_digest(path, algorithm):
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _pipe_hash(args, upstream):
+    rest, flags = parse_flags(args, bool_flags=("--file",))
+    if upstream is None:
+        # Same form as the command: hash <text> <algorithm>
+        algorithm = _hash_algorithm(rest[-1] if len(rest) > 1 else "sha256")
+        values = iter([" ".join(rest[:-1] if len(rest) > 1 else rest).strip('"')])
+    else:
+        algorithm = _hash_algorithm(rest[0] if rest else "sha256")
+        values = upstream
+    for value in values:
+        if flags.get("file"):
+            path = value["path"] if isinstance(value, dict) else as_text(value)
+            yield {"path": path, "algorithm": algorithm, "digest": _file_digest(path, algorithm)}
+        else:
+            data = value if isinstance(value, bytes) else as_text(value).encode("utf-8")
+            yield hashlib.new(algorithm, data).hexdigest()
+
+def _pipe_json(args, upstream):
+    rest, flags = _json_args(args)
+    if "out" in flags:
+        raise PipelineError("json --out writes a file; in a pipeline the values go to the next stage")
+    steps = parse_query(flags.get("query", "."))
+    if upstream is None and "file" in flags:
+        # Streams matches straight from the file, so `| head` stops reading early.
+        with open(flags["file"], "r", encoding="utf-8-sig") as f:
+            yield from _json_file_matches(f, flags["file"], flags.get("query", "."), flags.get("ndjson"))
+        return
+    for value in values_or_args(rest, upstream):
+        if isinstance(value, (str, bytes)):
+            value = json.loads(value)
+        yield from apply_query(value, steps)
+
+def _pipe_base64(args, upstream, decode=False):
+    rest, flags = _b64_args(args)
+    if "in" in flags or "out" in flags:
+        raise PipelineError("--in/--out stream files; in a pipeline the values come from the other stages")
+    variant = _b64_variant(flags)
+    for value in values_or_args(rest, upstream):
+        data = value if isinstance(value, bytes) else as_text(value).encode("utf-8")
+        if decode:
+            decoded = b64_decode_bytes(data.strip(), variant)
+            try:
+                yield decoded.decode("utf-8")
+            except UnicodeDecodeError:
+                yield decoded
+        else:
+            yield b64_encode_bytes(data, variant).decode("ascii")
+
+TEXT_PIPE_ACTIONS = {
+    "upper": str.upper,
+    "lower": str.lower,
+    "reverse": lambda text: text[::-1],
+    "count": lambda text: {"characters": len(text), "words": len(text.split())},
+    "words": str.split,
+}
+
+def _pipe_text(args, upstream):
+    action = args[0].lower() if args else ""
+    if action == "find" and upstream is None:
+        rest, flags = _text_file_args(args[1:])
+        if not rest or "file" not in flags or "out" in flags:
+            raise PipelineError("Usage: text find <regex> --file <path> | ...")
+        for line_number, line in iter_matches(flags["file"], rest[0].strip('"'), flags.get("ignore-case", False)):
+            yield {"line": line_number, "text": line}
+        return
+    if action not in TEXT_PIPE_ACTIONS:
+        raise PipelineError(f"Pipelines support: text {', '.join(TEXT_PIPE_ACTIONS)}, text find")
+    for value in values_or_args(args[1:], upstream):
+        yield TEXT_PIPE_ACTIONS[action](as_text(value))
+
+def _pipe_note(args, upstream):
+    action = args[0].lower() if args else ""
+    if action == "add":
+        for value in values_or_args(args[1:], upstream):
+            text = " ".join(as_text(value).split())  # notes are one line each
+            if text:
+                append_note(NOTES_FILE, text)
+                yield text
+    elif action in ("show", "search") and upstream is None:
+        if action == "search":
+            keyword = " ".join(args[1:]).strip('"')
+            notes = (note for _index, note in search_notes(keyword))
+        else:
+            notes = (note.strip() for note in read_all_notes(NOTES_FILE))
+        yield from notes
+    else:
+        raise PipelineError("Pipelines support: ... | note add, note show, note search <keyword>")
+
+def _pipe_qr(args, upstream):
+    from qrtools import generate_cached, place_output
+    rest, flags, options = _qr_args(args, "ascii")
+    if "batch" in flags:
+        raise PipelineError("qr --batch reads a CSV; in a pipeline the payloads come from the other stages")
+    out_dir = flags.get("out")
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    for value in values_or_args(rest, upstream):
+        text = as_text(value)
+        cached, _hit = generate_cached(text, *options)
+        if out_dir:
+            dest = os.path.join(out_dir, os.path.basename(cached))
+            place_output(cached, dest)
+            yield dest
+        elif options.fmt == "ascii":
+            with open(cached, "r", encoding="utf-8") as f:
+                yield f.read()
+        else:
+            yield cached
+
+def _pipe_calc(args, upstream):
+    for value in values_or_args(args, upstream):
+        yield safe_eval(as_text(value))
+
+PIPE_STAGES = {
+    "password": _pipe_password,
+    "sysinfo": _pipe_sysinfo,
+    "file": _pipe_file,
+    "files": _pipe_file,
+    "hash": _pipe_hash,
+    "json": _pipe_json,
+    "base64": _pipe_base64,
+    "decode64": lambda args, upstream: _pipe_base64(args, upstream, decode=True),
+    "text": _pipe_text,
+    "note": _pipe_note,
+    "qr": _pipe_qr,
+    "calc": _pipe_calc,
+}
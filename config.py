@@ -0,0 +1,296 @@
+import json
+import os
+import sys
+import threading
+from collections import namedtuple
+
+import storage
+from storage import read_json, update_json
+
+# --- CONSTANTS ---
+SETTINGS_FILE = "data/settings.json"
+
+Setting = namedtuple("Setting", "type default description choices minimum maximum")
+
+def _setting(type_, default, description, choices=None, minimum=None, maximum=None):
+    return Setting(type_, default, description, choices, minimum, maximum)
+
+# Every known key, dotted for nesting. Stored on disk as nested JSON objects.
+SCHEMA = {
+    "theme": _setting(str, "dark", "Colour theme", choices=("dark", "light")),
+    "auto_save": _setting(bool, True, "Save results automatically where supported"),
+    "notification_sound": _setting(bool, True, "Play a sound for reminders"),
+    "password.default_length": _setting(int, 16, "Length used when `password` gets no length", minimum=4, maximum=4096),
+    "weather.api_key": _setting(str, "", "OpenWeatherMap API key (falls back to $WEATHER_API_KEY)"),
+    "weather.units": _setting(str, "metric", "Units for weather reports", choices=("metric", "imperial", "standard")),
+    "history.calc_size": _setting(int, 10, "Calculations kept in calc history", minimum=1, maximum=100000),
+    "history.size": _setting(int, 1000, "Command lines kept in REPL history", minimum=10, maximum=1000000),
+    "monitor.interval": _setting(float, 2.0, "Seconds between monitor refreshes", minimum=0.1, maximum=3600),
+    "jobs.workers": _setting(int, 4, "Background jobs (cmd &) that run at once", minimum=1, maximum=64),
+    "server.workers": _setting(int, 8, "Requests `--serve` runs at once", minimum=1, maximum=256),
+    "server.max_pending": _setting(int, 256, "Queued `--serve` requests before answering busy", minimum=0, maximum=100000),
+    "server.timeout": _setting(float, 30.0, "Default per-request timeout for `--serve` (seconds)", minimum=0.1, maximum=86400),
+    "stats.enabled": _setting(bool, True, "Record per-command timings for `stats`"),
+    "stats.tracemalloc": _setting(bool, False, "Also record peak memory per command (slows Python code ~2x)"),
+    "watch.enabled": _setting(bool, True, "Keep file indexes current with filesystem events (`watch`)"),
+    "watch.backend": _setting(str, "auto", "How to watch directories", choices=("auto", "inotify", "watchdog", "polling")),
+    "watch.poll_interval": _setting(float, 2.0, "Seconds between rescans for the polling watch backend", minimum=0.1, maximum=3600),
+    "battery.interval": _setting(float, 60.0, "Seconds between samples for `battery log`", minimum=1, maximum=86400),
+    "battery.window": _setting(float, 30.0, "Minutes of samples behind the battery rate estimate", minimum=2, maximum=1440),
+    "battery.history_days": _setting(float, 7.0, "Days of battery samples kept in data/battery.csv", minimum=0.1, maximum=3650),
+    "fun.quote_source": _setting(str, "", "URL whose quotes (JSON/NDJSON/text) are merged into data/quotes.jsonl"),
+    "fun.joke_source": _setting(str, "", "URL whose jokes (JSON/NDJSON/text) are merged into data/jokes.jsonl"),
+    "fun.refresh_hours": _setting(float, 24.0, "Hours between background fetches of the fun sources", minimum=0.01, maximum=87600),
+    "open.roots": _setting(str, "", f"Directories `open --index` indexes for `open <name>` (separated by '{os.pathsep}')"),
+    "storage.fsync": _setting(str, os.environ.get("ASSISTANT_FSYNC", "data"), "Durability of data/ writes",
+                              choices=storage.FSYNC_POLICIES),
+    # Map settings hold arbitrary sub-keys: `settings set aliases.ll note show`.
+    "aliases": _setting(dict, {}, "Command aliases (name -> command line)"),
+}
+# Flat keys written by earlier versions.
+LEGACY_KEYS = {
+    "default_password_length": "password.default_length",
+    "weather_api_key": "weather.api_key",
+}
+_TRUE = ("true", "yes", "on", "1")
+_FALSE = ("false", "no", "off", "0")
+
+# --- CONVERSION ---
+
+def flatten(data, prefix: str = ""):
+    """{"a": {"b": 1}} -> {"a.b": 1}. Flat dotted keys are kept as they are."""
+    flat = {}
+    for key, value in (data or {}).items():
+        full = f"{prefix}{key}"
+        if isinstance(value, dict) and value and not _is_map(full):
+            flat.update(flatten(value, full + "."))
+        else:
+            flat[LEGACY_KEYS.get(full, full)] = value
+    return flat
+
+def _is_map(key: str):
+    spec = SCHEMA.get(key)
+    return spec is not None and spec.type is dict
+
+def _split_map_key(key: str):
+    """'aliases.ll' -> ('aliases', 'll') for map settings, else (key, None)."""
+    parent, _, sub = key.partition(".")
+    if sub and _is_map(parent):
+        return parent, sub
+    return key, None
+
+def unflatten(flat):
+    nested = {}
+    for key in sorted(flat):
+        node = nested
+        *parents, leaf = key.split(".")
+        for part in parents:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                child = node[part] = {}
+            node = child
+        node[leaf] = flat[key]
+    return nested
+
+def coerce(key: str, value):
+    """Validates `value` (a string from the CLI or a JSON value) against the schema."""
+    spec = SCHEMA.get(key)
+    if spec is None:
+        raise KeyError(f"Unknown setting '{key}'. Known settings: {', '.join(sorted(SCHEMA))}")
+    if spec.type is dict:
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                raise ValueError(f"'{key}' must be a JSON object.")
+        if not isinstance(value, dict) or not all(isinstance(v, str) for v in value.values()):
+            raise ValueError(f"'{key}' must be an object of strings.")
+        return {str(k): v for k, v in value.items()}
+    if spec.type is bool:
+        if isinstance(value, str):
+            lowered = value.lower()
+            if lowered not in _TRUE + _FALSE:
+                raise ValueError(f"'{key}' must be true or false.")
+            value = lowered in _TRUE
+        elif not isinstance(value, bool):
+            raise ValueError(f"'{key}' must be true or false.")
+    elif spec.type in (int, float):
+        if isinstance(value, bool):
+            raise ValueError(f"'{key}' must be a number.")
+        try:
+            value = spec.type(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{key}' must be {'an integer' if spec.type is int else 'a number'}.")
+        if spec.minimum is not None and value < spec.minimum:
+            raise ValueError(f"'{key}' must be at least {spec.minimum}.")
+        if spec.maximum is not None and value > spec.maximum:
+            raise ValueError(f"'{key}' must be at most {spec.maximum}.")
+    else:
+        value = str(value)
+    if spec.choices and value not in spec.choices:
+        raise ValueError(f"'{key}' must be one of: {', '.join(spec.choices)}")
+    return value
+
+# --- SERVICE ---
+
+class SettingsService:
+    """Settings parsed once and kept in memory.
+
+    Every read stats the file and reloads only when its mtime or size changed, so edits
+    from another instance (or by hand) are picked up without re-parsing on each access.
+    Subscribers are called with (key, old, new) whenever an effective value changes.
+    """
+
+    def __init__(self, path: str = SETTINGS_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._signature = None
+        self._values = {}  # explicitly set, validated values
+        self._extra = {}   # keys outside the schema, kept untouched on disk
+        self._subscribers = []
+        self._warned = None  # signature of the unreadable file already warned about
+
+    def _read(self):
+        """The settings file as a dict; {} (all defaults) if it is missing or not valid
+        JSON, with one warning per broken version of the file."""
+        try:
+            return read_json(self.path, default={}) or {}
+        except ValueError as e:
+            signature = self._stat_signature()
+            if signature != self._warned:
+                self._warned = signature
+                print(f"Warning: ignoring {self.path} ({e}); using default settings", file=sys.stderr)
+            return {}
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self, raw):
+        values, extra = {}, {}
+        for key, value in flatten(raw).items():
+            if key in SCHEMA:
+                try:
+                    values[key] = coerce(key, value)
+                except ValueError:
+                    pass  # an invalid hand edit falls back to the default
+            else:
+                extra[key] = value
+        return values, extra
+
+    def _refresh(self):
+        signature = self._stat_signature()
+        if signature == self._signature:
+            return
+        before = self.effective()
+        self._values, self._extra = self._load(self._read() if signature else {})
+        self._signature = signature
+        self._notify(before)
+
+    def _notify(self, before):
+        after = self.effective()
+        for key in SCHEMA:
+            if before.get(key) != after.get(key):
+                for prefix, callback in list(self._subscribers):
+                    if key == prefix or key.startswith(prefix + ".") or not prefix:
+                        callback(key, before.get(key), after.get(key))
+
+    def effective(self):
+        return {key: self._values.get(key, spec.default) for key, spec in SCHEMA.items()}
+
+    def get(self, key: str):
+        key = LEGACY_KEYS.get(key, key)
+        if key not in SCHEMA:
+            raise KeyError(f"Unknown setting '{key}'")
+        with self._lock:
+            self._refresh()
+            return self._values.get(key, SCHEMA[key].default)
+
+    def snapshot(self):
+        """Returns {key: (value, is_default)} for every schema key plus unknown keys."""
+        with self._lock:
+            self._refresh()
+            rows = {key: (self._values.get(key, spec.default), key not in self._values)
+                    for key, spec in SCHEMA.items()}
+            rows.update({key: (value, False) for key, value in self._extra.items()})
+            return rows
+
+    def _write(self, change):
+        """Applies change(flat_dict) to the file under its lock, then refreshes the cache."""
+        def mutate(current):
+            flat = flatten(current)
+            change(flat)
+            return unflatten(flat), None
+
+        with self._lock:
+            self._refresh()
+            before = self.effective()
+            storage.fsync_policy()  # resolve now: looking it up inside update_json would re-lock this file
+            update_json(self.path, mutate, default={})
+            self._values, self._extra = self._load(self._read())
+            self._signature = self._stat_signature()
+            self._notify(before)
+
+    def set(self, key: str, value):
+        key = LEGACY_KEYS.get(key, key)
+        parent, sub = _split_map_key(key)
+        if sub is not None:
+            value = str(value)
+
+            def change(flat):
+                flat[parent] = {**coerce(parent, flat.get(parent, {})), sub: value}
+        else:
+            value = coerce(key, value)
+
+            def change(flat):
+                flat[key] = value
+        self._write(change)
+        return value
+
+    def reset(self, key: str):
+        key = LEGACY_KEYS.get(key, key)
+        parent, sub = _split_map_key(key)
+        if sub is not None:
+            if sub not in self.get(parent):
+                raise KeyError(f"Unknown setting '{key}'")
+            self._write(lambda flat: flat.get(parent, {}).pop(sub, None))
+            return None
+        if key not in SCHEMA and key not in self._extra:
+            raise KeyError(f"Unknown setting '{key}'")
+        self._write(lambda flat: flat.pop(key, None))
+        return SCHEMA[key].default if key in SCHEMA else None
+
+    def subscribe(self, prefix: str, callback):
+        """Calls callback(key, old, new) for changes to `prefix` or keys below it ('' = all).
+        Returns a function that removes the subscription."""
+        entry = (prefix, callback)
+        with self._lock:
+            self._subscribers.append(entry)
+
+        def unsubscribe():
+            with self._lock:
+                if entry in self._subscribers:
+                    self._subscribers.remove(entry)
+        return unsubscribe
+
+settings = SettingsService()
+
+def get_setting(key: str):
+    return settings.get(key)
+
+def set_setting(key: str, value):
+    return settings.set(key, value)
+
+def subscribe(prefix: str, callback):
+    return settings.subscribe(prefix, callback)
+
+# --- BUILT-IN SUBSCRIBERS ---
+
+def _apply_fsync(_key, _old, new):
+    storage.FSYNC_POLICY = new
+
+subscribe("storage.fsync", _apply_fsync)
+storage.POLICY_SOURCE = lambda: get_setting("storage.fsync")
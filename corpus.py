@@ -0,0 +1,326 @@
+import json
+import os
+import random
+import re
+import struct
+import threading
+import time
+from collections import namedtuple
+
+import storage
+from storage import atomic_write, locked, read_json, update_json
+
+# --- CONSTANTS ---
+CORPUS_DIR = "data"
+KINDS = ("quote", "joke")
+REFRESH_STATE_FILE = "data/fun_refresh.json"
+FETCH_TIMEOUT = 10  # seconds; a dead source must not hang `fun quote`
+INDEX_MAGIC = b"FUNIDX01"
+INDEX_HEADER = struct.Struct("<8sQQQ")  # magic, corpus size, corpus mtime_ns, entries
+OFFSET = struct.Struct("<Q")
+TEXT_KEYS = ("text", "quote", "content", "en", "q", "joke", "body")
+TAG_KEYS = ("tags", "tag", "category", "categories", "type")
+
+Entry = namedtuple("Entry", "text author tags")
+
+# --- FILES ---
+
+def corpus_path(kind: str):
+    """data/quotes.jsonl or data/jokes.jsonl: one {"text", "author", "tags"} object per line."""
+    return os.path.join(CORPUS_DIR, f"{kind}s.jsonl")
+
+def _index_path(kind: str):
+    return os.path.join(CORPUS_DIR, f"{kind}s.idx")
+
+def _tags_path(kind: str):
+    return os.path.join(CORPUS_DIR, f"{kind}s.tags.json")
+
+# --- ENTRIES ---
+
+def normalize(text: str):
+    """Dedup key: case, punctuation and spacing do not make an entry new."""
+    return " ".join(re.findall(r"\w+", text.casefold()))
+
+def _tag_list(value):
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)):
+        return []
+    return [str(tag).strip().lower() for tag in value if str(tag).strip()]
+
+def to_entry(item, tags=()):
+    """Entry from a corpus line or an item of an imported file: a plain string, or an
+    object with the text under a common key ("text", "quote", "content", ...) or as a
+    setup/punchline pair. None if there is no text."""
+    if isinstance(item, str):
+        text, author, found = item, "", []
+    elif isinstance(item, dict):
+        text = next((item[key] for key in TEXT_KEYS if isinstance(item.get(key), str)), "")
+        if not text and isinstance(item.get("setup"), str):
+            text = f"{item['setup']} {item.get('punchline', '')}"
+        author = item.get("author") or item.get("a") or ""
+        found = next((_tag_list(item[key]) for key in TAG_KEYS if key in item), [])
+    else:
+        return None
+    text = " ".join(text.split())
+    if not text:
+        return None
+    merged = list(dict.fromkeys(found + _tag_list(list(tags))))
+    return Entry(text, " ".join(str(author).split()), merged)
+
+def _line(entry):
+    data = {"text": entry.text}
+    if entry.author:
+        data["author"] = entry.author
+    if entry.tags:
+        data["tags"] = entry.tags
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+def _parse_line(raw: bytes):
+    try:
+        return to_entry(json.loads(raw))
+    except ValueError:
+        return None
+
+def parse_entries(data: str, tags=()):
+    """Entries from an imported file or fetched response: a JSON array (or an object
+    holding one), NDJSON, or plain text with one entry per line."""
+    try:
+        value = json.loads(data)
+    except ValueError:
+        value = None
+        items = []
+        for line in data.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(line)
+    if value is not None:
+        if isinstance(value, dict):
+            value = next((v for v in value.values() if isinstance(v, list)), [value])
+        items = value if isinstance(value, list) else [value]
+    return [entry for entry in (to_entry(item, tags) for item in items) if entry is not None]
+
+# --- INDEX ---
+
+_tag_cache = {}  # kind -> ((size, mtime_ns), {tag: [entry number]})
+
+def build_index(kind: str):
+    """Writes the offset index (entry number -> byte offset of its line) and the tag
+    index for a corpus. Returns the number of entries."""
+    path = corpus_path(kind)
+    with locked(path):
+        offsets, tags = [], {}
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return 0
+        with f:
+            st = os.fstat(f.fileno())
+            offset = 0
+            for raw in f:
+                entry = _parse_line(raw)
+                if entry is not None:
+                    for tag in entry.tags:
+                        tags.setdefault(tag, []).append(len(offsets))
+                    offsets.append(offset)
+                offset += len(raw)
+        header = INDEX_HEADER.pack(INDEX_MAGIC, st.st_size, st.st_mtime_ns, len(offsets))
+        # Derived files: rebuilt from the corpus whenever they are lost, so never fsynced.
+        atomic_write(_index_path(kind), header + struct.pack(f"<{len(offsets)}Q", *offsets), fsync="none")
+        atomic_write(_tags_path(kind), json.dumps({"size": st.st_size, "mtime_ns": st.st_mtime_ns, "tags": tags}), fsync="none")
+        _tag_cache.pop(kind, None)
+        return len(offsets)
+
+def _index_count(kind: str, st):
+    """Entries in the offset index, or None if it is missing or was built from another
+    version of the corpus. Caller holds the corpus lock."""
+    try:
+        with open(_index_path(kind), "rb") as f:
+            magic, size, mtime_ns, count = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+    except (OSError, struct.error):
+        return None
+    return count if magic == INDEX_MAGIC and (size, mtime_ns) == (st.st_size, st.st_mtime_ns) else None
+
+def _tag_index(kind: str, st):
+    key = (st.st_size, st.st_mtime_ns)
+    cached = _tag_cache.get(kind)
+    if cached and cached[0] == key:
+        return cached[1]
+    data = read_json(_tags_path(kind), {}) or {}
+    if (data.get("size"), data.get("mtime_ns")) != key:
+        return None
+    _tag_cache[kind] = (key, data["tags"])
+    return data["tags"]
+
+def _with_index(kind: str, use, tags: bool = False):
+    """use(stat, count) under the shared corpus lock with the offset index (and with
+    `tags`, the tag index) current, rebuilding them first if the corpus changed since
+    they were written."""
+    path = corpus_path(kind)
+    while True:
+        with locked(path, exclusive=False):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                return use(None, 0)
+            count = _index_count(kind, st)
+            if count is not None and (not tags or _tag_index(kind, st) is not None):
+                return use(st, count)
+        build_index(kind)
+
+def _read_entry(kind: str, number: int):
+    """Entry number `number`: one seek into the index, one into the corpus."""
+    with open(_index_path(kind), "rb") as f:
+        f.seek(INDEX_HEADER.size + number * OFFSET.size)
+        (offset,) = OFFSET.unpack(f.read(OFFSET.size))
+    with open(corpus_path(kind), "rb") as f:
+        f.seek(offset)
+        return _parse_line(f.readline())
+
+def random_entry(kind: str, tags=(), rng=random):
+    """A random entry carrying all of `tags`, or None if none does."""
+    wanted = _tag_list(list(tags))
+
+    def pick(st, count):
+        if not count:
+            return None
+        if not wanted:
+            return _read_entry(kind, rng.randrange(count))
+        index = _tag_index(kind, st)
+        numbers = set(index.get(wanted[0], ()))
+        for tag in wanted[1:]:
+            numbers.intersection_update(index.get(tag, ()))
+        return _read_entry(kind, rng.choice(sorted(numbers))) if numbers else None
+
+    return _with_index(kind, pick, tags=bool(wanted))
+
+def tag_counts(kind: str):
+    """{tag: entries} for a corpus."""
+    return _with_index(kind, lambda st, count: {tag: len(numbers) for tag, numbers in
+                                                (_tag_index(kind, st) if st else {}).items()}, tags=True)
+
+def entry_count(kind: str):
+    return _with_index(kind, lambda st, count: count)
+
+# --- UPDATES ---
+
+def add_entries(kind: str, entries, fsync: str = None):
+    """Appends the entries whose text is not in the corpus yet (nor earlier in
+    `entries`). Returns (added, duplicates). The indexes are rebuilt on next read."""
+    path = corpus_path(kind)
+    with locked(path):
+        seen = set()
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                seen.update(normalize(entry.text) for entry in map(_parse_line, f) if entry is not None)
+        lines, duplicates = [], 0
+        for entry in entries:
+            key = normalize(entry.text)
+            if not key or key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            lines.append(_line(entry))
+        if lines:
+            with open(path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+                f.flush()
+                if (fsync or storage.fsync_policy()) != "none":
+                    os.fsync(f.fileno())
+        return len(lines), duplicates
+
+def dedup(kind: str):
+    """Rewrites the corpus without repeated entries (a repeat's tags are merged into the
+    first copy) or unreadable lines. Returns how many lines were dropped."""
+    path = corpus_path(kind)
+    with locked(path):
+        if not os.path.exists(path):
+            return 0
+        kept, lines = {}, 0
+        with open(path, "rb") as f:
+            for raw in f:
+                lines += 1
+                entry = _parse_line(raw)
+                if entry is None:
+                    continue
+                key = normalize(entry.text)
+                first = kept.get(key)
+                if first is None:
+                    kept[key] = entry
+                else:
+                    kept[key] = first._replace(tags=list(dict.fromkeys(first.tags + entry.tags)),
+                                               author=first.author or entry.author)
+        if len(kept) < lines:
+            atomic_write(path, "".join(map(_line, kept.values())))
+        return lines - len(kept)
+
+# --- REFRESH ---
+
+_refreshing = set()
+_refresh_lock = threading.Lock()
+
+def refresh(kind: str, url: str, timeout: float = FETCH_TIMEOUT):
+    """Fetches `url` (JSON, NDJSON or text; conditional on the last ETag) and adds its
+    new entries to the local corpus, which is what later calls read. Returns (added,
+    duplicates)."""
+    import requests  # imported on first use to keep startup fast
+
+    state = (read_json(REFRESH_STATE_FILE, {}) or {}).get(kind, {})
+    headers = {}
+    if state.get("url") == url:
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+    try:
+        response = requests.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304:
+            added, duplicates = 0, 0
+        else:
+            response.raise_for_status()
+            added, duplicates = add_entries(kind, parse_entries(response.text, tags=("fetched",)))
+    except Exception as e:
+        _save_state(kind, {"url": url, "fetched_at": time.time(), "error": str(e)})
+        raise
+    _save_state(kind, {"url": url, "fetched_at": time.time(), "added": added,
+                       "etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")})
+    return added, duplicates
+
+def _save_state(kind: str, values):
+    def mutate(data):
+        data = data or {}
+        data[kind] = values
+        return data, None
+    update_json(REFRESH_STATE_FILE, mutate, default={})
+
+def refresh_in_background(kind: str, url: str, max_age: float):
+    """Starts a daemon thread running refresh() if `url` is set and was last fetched
+    (or tried) more than max_age seconds ago. Returns True if one was started."""
+    if not url:
+        return False
+    state = (read_json(REFRESH_STATE_FILE, {}) or {}).get(kind, {})
+    if state.get("url") == url and time.time() - state.get("fetched_at", 0) < max_age:
+        return False
+    with _refresh_lock:
+        if kind in _refreshing:
+            return False
+        _refreshing.add(kind)
+
+    def run():
+        try:
+            refresh(kind, url)
+        except Exception:
+            pass  # recorded in the refresh state; the local corpus still answers
+        finally:
+            with _refresh_lock:
+                _refreshing.discard(kind)
+
+    threading.Thread(target=run, name=f"{kind}-refresh", daemon=True).start()
+    return True
+
+def refresh_state(kind: str):
+    return (read_json(REFRESH_STATE_FILE, {}) or {}).get(kind, {})
@@ -0,0 +1,269 @@
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+
+from config import get_setting
+from jobs import check_cancelled
+from watcher import is_under, watch_service
+
+# --- CONSTANTS ---
+MAX_INDEXES = 8  # watched trees kept in memory; the least recently used is dropped
+
+# --- TREE INDEX ---
+
+class TreeIndex:
+    """Size and mtime of every file under a directory, plus recursive byte and file
+    totals per directory.
+
+    Built by one scan; after that the watch service's ChangeEvents update just the
+    entries that changed (and their ancestors' totals), so `disk tree`, `file search`
+    and `backup` can reuse it instead of walking the tree again. Directories are
+    entered like os.walk does: symlinks to directories are not followed.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self._lock = threading.RLock()
+        self._files = {}    # directory -> {name: (size, mtime_ns)}
+        self._subdirs = {}  # directory -> {name}
+        self._totals = {}   # directory -> [bytes, files] below it
+        self._unsubscribe = None
+        self.scanned_at = None
+        self.updates = 0
+
+    def start(self):
+        """Subscribes to changes, then scans (events that race the scan are applied after it)."""
+        if not os.path.isdir(self.root):
+            raise FileNotFoundError(f"Directory not found: {self.root}")
+        self._unsubscribe = watch_service.subscribe(self.root, self.apply)
+        try:
+            self.rescan()
+        except BaseException:
+            self.stop()
+            raise
+
+    def stop(self):
+        if self._unsubscribe:
+            self._unsubscribe()
+            self._unsubscribe = None
+
+    def rescan(self):
+        if not os.path.isdir(self.root):
+            raise FileNotFoundError(f"Directory not found: {self.root}")
+        with self._lock:
+            self._files, self._subdirs, self._totals = {}, {}, {}
+            self._add_tree(self.root)
+            self.scanned_at = time.time()
+
+    # --- updates ---
+
+    def apply(self, events):
+        """Applies ChangeEvents from the watch service."""
+        with self._lock:
+            for event in events:
+                if event.kind == "rescan" or (event.path == self.root and event.kind == "created"):
+                    self.rescan()
+                    return
+                if event.path == self.root:
+                    if event.kind == "deleted":
+                        self._files, self._subdirs, self._totals = {self.root: {}}, {self.root: set()}, {self.root: [0, 0]}
+                    continue
+                parent, name = os.path.split(event.path)
+                if parent not in self._files:  # below a directory we do not index
+                    continue
+                self.updates += 1
+                if event.kind == "deleted":
+                    self._remove(parent, name)
+                else:
+                    self._update(parent, name)
+
+    def _add_tree(self, directory: str):
+        """Indexes directory and everything below it; returns its [bytes, files]."""
+        check_cancelled()
+        files, subdirs = {}, set()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            entries = []
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        subdirs.add(entry.name)
+                    continue
+                st = entry.stat()
+            except OSError:
+                try:
+                    st = entry.stat(follow_symlinks=False)  # dangling symlink
+                except OSError:
+                    continue
+            files[entry.name] = (st.st_size, st.st_mtime_ns)
+        self._files[directory] = files
+        self._subdirs[directory] = subdirs
+        total = [sum(size for size, _mtime in files.values()), len(files)]
+        for name in subdirs:
+            below = self._add_tree(os.path.join(directory, name))
+            total[0] += below[0]
+            total[1] += below[1]
+        self._totals[directory] = total
+        return total
+
+    def _update(self, parent: str, name: str):
+        path = os.path.join(parent, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            try:
+                st = os.lstat(path)
+            except OSError:
+                self._remove(parent, name)
+                return
+        if stat.S_ISDIR(st.st_mode):
+            if name in self._subdirs[parent]:
+                return
+            self._remove(parent, name)  # may have been a file of the same name
+            if not os.path.islink(path):
+                self._subdirs[parent].add(name)
+                self._propagate(parent, *self._add_tree(path))
+            return
+        if name in self._subdirs[parent]:
+            self._remove(parent, name)
+        old = self._files[parent].get(name)
+        self._files[parent][name] = (st.st_size, st.st_mtime_ns)
+        self._propagate(parent, st.st_size - (old[0] if old else 0), 0 if old else 1)
+
+    def _remove(self, parent: str, name: str):
+        old = self._files[parent].pop(name, None)
+        if old:
+            self._propagate(parent, -old[0], -1)
+        if name in self._subdirs[parent]:
+            self._subdirs[parent].discard(name)
+            path = os.path.join(parent, name)
+            size, count = self._totals.get(path, (0, 0))
+            self._drop_tree(path)
+            self._propagate(parent, -size, -count)
+
+    def _drop_tree(self, directory: str):
+        for name in self._subdirs.pop(directory, ()):
+            self._drop_tree(os.path.join(directory, name))
+        self._files.pop(directory, None)
+        self._totals.pop(directory, None)
+
+    def _propagate(self, directory: str, size: int, count: int):
+        while True:
+            total = self._totals[directory]
+            total[0] += size
+            total[1] += count
+            if directory == self.root:
+                return
+            directory = os.path.dirname(directory)
+
+    # --- queries ---
+
+    @property
+    def watched(self):
+        return bool(self._unsubscribe)
+
+    def __contains__(self, directory: str):
+        with self._lock:
+            return os.path.abspath(directory) in self._files
+
+    def totals(self, directory: str = None):
+        """(bytes, files) below directory (default: the root)."""
+        with self._lock:
+            size, count = self._totals.get(os.path.abspath(directory) if directory else self.root, (0, 0))
+            return size, count
+
+    def walk(self, top: str = None):
+        """[(directory, {name: (size, mtime_ns)})] below top in os.walk order (sorted),
+        copied under the lock so the watch thread can keep updating meanwhile."""
+        top = os.path.abspath(top) if top else self.root
+        result = []
+        with self._lock:
+            if top not in self._files:
+                return result
+            stack = [top]
+            while stack:
+                directory = stack.pop()
+                result.append((directory, dict(self._files[directory])))
+                stack.extend(os.path.join(directory, name) for name in sorted(self._subdirs[directory], reverse=True))
+        return result
+
+    def largest(self, limit: int, top: str = None):
+        """[(directory, bytes, files)] for the biggest directories strictly below top."""
+        top = os.path.abspath(top) if top else self.root
+        with self._lock:
+            rows = [(d, size, count) for d, (size, count) in self._totals.items() if d != top and is_under(d, top)]
+        rows.sort(key=lambda row: row[1], reverse=True)
+        return rows[:limit]
+
+# --- REGISTRY ---
+
+_indexes = OrderedDict()  # root -> TreeIndex, least recently used first
+_lock = threading.Lock()
+
+def _find(root: str):
+    for indexed, index in _indexes.items():
+        if is_under(root, indexed) and root in index:
+            _indexes.move_to_end(indexed)
+            return index
+    return None
+
+def tree_index(root: str, create: bool = True):
+    """The TreeIndex covering root (an index of a parent directory covers it too), with
+    pending watch events applied. Builds and watches a new one if `create` is set, or
+    returns None. With `watch.enabled` off, indexes are built per call and not kept."""
+    root = os.path.abspath(root)
+    if not get_setting("watch.enabled"):
+        if not create:
+            return None
+        index = TreeIndex(root)
+        index.rescan()
+        return index
+    with _lock:
+        index = _find(root)
+    if index is not None:
+        watch_service.sync()
+        return index
+    if not create:
+        return None
+    index = TreeIndex(root)
+    index.start()
+    with _lock:
+        existing = _find(root)  # another thread may have built one meanwhile
+        if existing is None:
+            for indexed in [r for r in _indexes if is_under(r, root)]:  # now covered by this one
+                _indexes.pop(indexed).stop()
+            _indexes[root] = index
+            while len(_indexes) > MAX_INDEXES:
+                _indexes.popitem(last=False)[1].stop()
+    if existing is not None:
+        index.stop()
+        return existing
+    return index
+
+def scan_index(root: str):
+    """The watched TreeIndex covering root if there is one, else a one-shot scan that is
+    neither kept nor watched. For commands that read a tree without being asked to
+    watch it: a watch per `disk tree` or `backup` source would pile up, and fall back
+    to polling whole trees once inotify runs out of watches."""
+    index = tree_index(root, create=False)
+    if index is None:
+        index = TreeIndex(root)
+        index.rescan()
+    return index
+
+def drop_index(root: str):
+    """Stops watching an indexed root. Returns False if it was not indexed."""
+    with _lock:
+        index = _indexes.pop(os.path.abspath(root), None)
+    if index is None:
+        return False
+    index.stop()
+    return True
+
+def indexes():
+    with _lock:
+        return list(_indexes.values())
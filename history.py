@@ -0,0 +1,183 @@
+import os
+import re
+
+from config import get_setting
+from storage import append_line, update_lines
+
+try:
+    import readline
+except ImportError:  # Windows without pyreadline
+    readline = None
+
+# --- CONSTANTS ---
+HISTORY_FILE = "data/history.txt"
+TAIL_BLOCK_SIZE = 64 * 1024
+_BANG = re.compile(r"^!(!|-?\d+|\S+)(.*)$")
+
+# --- FILE HELPERS ---
+
+def tail_lines(path: str, count: int, block_size: int = TAIL_BLOCK_SIZE):
+    """Returns (last `count` lines, reached_start). Reads backwards from the end in blocks,
+    so the cost depends on `count`, not on the size of the file."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return [], True
+    with f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        data = b""
+        # count + 1 newlines guarantee `count` complete lines before the last one.
+        while pos > 0 and data.count(b"\n") <= count:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    lines = data.decode("utf-8", errors="replace").splitlines()
+    if pos > 0:
+        lines = lines[1:]  # first line may be cut in half
+    return lines[-count:] if count else [], pos == 0 and len(lines) <= count
+
+def _dedup_keep_last(lines):
+    seen = set()
+    kept = []
+    for line in reversed(lines):
+        if line and line not in seen:
+            seen.add(line)
+            kept.append(line)
+    kept.reverse()
+    return kept
+
+# --- HISTORY ---
+
+class CommandHistory:
+    """REPL history persisted to data/history.txt.
+
+    Nothing is read until the history is first needed, and then only the newest
+    `history.size` lines are read. Older or duplicate lines left in the file are
+    compacted away when the session closes. Entries also feed readline, so up-arrow
+    and Ctrl-R reverse search work.
+    """
+
+    def __init__(self, path: str = HISTORY_FILE):
+        self.path = path
+        self._entries = None
+        self._needs_compact = False
+        self.recording = None  # script path while `record start` is active
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            self._load()
+        return self._entries
+
+    def _load(self):
+        size = get_setting("history.size")
+        raw, complete = tail_lines(self.path, size)
+        self._entries = _dedup_keep_last(raw)
+        self._needs_compact = not complete or len(self._entries) != len(raw)
+        if readline:
+            readline.clear_history()
+            for line in self._entries:
+                readline.add_history(line)
+
+    def attach_readline(self):
+        """Loads history into readline and turns off its automatic recording,
+        since entries are added (expanded and de-duplicated) by add()."""
+        if readline:
+            readline.set_auto_history(False)
+        self.entries
+
+    def add(self, line: str):
+        line = line.strip()
+        if not line:
+            return
+        entries = self.entries
+        if entries and entries[-1] == line:
+            return
+        if line in entries:
+            # Earlier duplicates are dropped from memory now and from the file on compaction.
+            entries.remove(line)
+            self._needs_compact = True
+            if readline:
+                self._rebuild_readline()
+        entries.append(line)
+        if readline:
+            readline.add_history(line)
+        size = get_setting("history.size")
+        if len(entries) > size:
+            del entries[:len(entries) - size]
+            self._needs_compact = True
+        append_line(self.path, line)
+
+    def _rebuild_readline(self):
+        readline.clear_history()
+        for entry in self._entries:
+            readline.add_history(entry)
+
+    def expand(self, line: str):
+        """Expands `!!`, `!N`, `!-N` and `!prefix` at the start of a line.
+        Returns the line unchanged when it is not a history reference."""
+        m = _BANG.match(line.strip())
+        if not m:
+            return line
+        ref, rest = m.groups()
+        entries = self.entries
+        if ref == "!":
+            if not entries:
+                raise LookupError("!!: history is empty")
+            return entries[-1] + rest
+        if ref.lstrip("-").isdigit():
+            n = int(ref)
+            index = n - 1 if n > 0 else len(entries) + n
+            if n == 0 or not 0 <= index < len(entries):
+                raise LookupError(f"!{ref}: event not found")
+            return entries[index] + rest
+        for entry in reversed(entries):
+            if entry.startswith(ref):
+                return entry + rest
+        raise LookupError(f"!{ref}: event not found")
+
+    def search(self, text: str, limit: int = 20):
+        """Newest-first (number, entry) pairs containing `text`."""
+        text = text.lower()
+        found = []
+        for number in range(len(self.entries), 0, -1):
+            if text in self.entries[number - 1].lower():
+                found.append((number, self.entries[number - 1]))
+                if len(found) == limit:
+                    break
+        return found
+
+    def clear(self):
+        self._entries = []
+        self._needs_compact = False
+        if readline:
+            readline.clear_history()
+        update_lines(self.path, lambda lines: ([], None))
+
+    def record(self, line: str):
+        if self.recording:
+            append_line(self.recording, line)
+
+    def close(self):
+        """Rewrites the file as the newest `history.size` unique lines if it has grown past that."""
+        if not self._needs_compact:
+            return
+        size = get_setting("history.size")
+        # Re-read under the lock so lines appended by other sessions are kept.
+        update_lines(self.path, lambda lines: (
+            [line + "\n" for line in _dedup_keep_last([l.rstrip("\n") for l in lines])[-size:]], None))
+        self._needs_compact = False
+
+command_history = CommandHistory()
+
+# --- BATCH SCRIPTS ---
+
+def iter_script(lines):
+    """Yields (line_number, command) for a recorded or hand-written script, skipping blank
+    lines and # comments."""
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line_number, line
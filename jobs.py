@@ -0,0 +1,261 @@
+import contextlib
+import io
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import get_setting
+
+# --- CONSTANTS ---
+OUTPUT_LIMIT = 1024 * 1024  # characters of buffered output kept per job (oldest dropped first)
+
+class JobCancelled(BaseException):
+    """Raised inside a job at its next cancellation point. Derives from BaseException so
+    handlers' `except Exception` blocks do not swallow it."""
+
+# --- OUTPUT ROUTING ---
+
+class _JobOutput:
+    """Buffers a job's output; once the job is in the foreground, writes go straight through."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._chunks = []
+        self._size = 0
+        self._lock = threading.Lock()
+        self.live = False
+        self.truncated = False
+
+    def write(self, text):
+        with self._lock:
+            if self.live:
+                self._stream.write(text)
+                self._stream.flush()
+                return len(text)
+            self._chunks.append(text)
+            self._size += len(text)
+            while self._size > OUTPUT_LIMIT and len(self._chunks) > 1:
+                self._size -= len(self._chunks.pop(0))
+                self.truncated = True
+        return len(text)
+
+    def text(self):
+        with self._lock:
+            text = "".join(self._chunks)
+            return ("... (earlier output truncated)\n" + text) if self.truncated else text
+
+    def go_live(self):
+        """Flushes what was buffered and switches to pass-through."""
+        with self._lock:
+            if self.truncated:
+                self._stream.write("... (earlier output truncated)\n")
+            self._stream.write("".join(self._chunks))
+            self._stream.flush()
+            self._chunks, self._size = [], 0
+            self.live = True
+
+class _ThreadRoutedStream:
+    """Stands in for sys.stdout: threads running a job write to that job's buffer,
+    everything else (the REPL) writes to the real stream."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+
+    def _target(self):
+        return getattr(self._local, "output", None) or self._stream
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        if getattr(self._local, "output", None) is None:
+            self._stream.flush()
+
+    def __getattr__(self, name):
+        # isatty, encoding, fileno, ... come from the real stream so Rich keeps colours.
+        return getattr(self._stream, name)
+
+_router = None
+
+def routed_stdout():
+    """Installs the per-thread stdout router once and returns it."""
+    global _router
+    if _router is None:
+        _router = _ThreadRoutedStream(sys.stdout)
+        sys.stdout = _router
+    return _router
+
+@contextlib.contextmanager
+def captured_output():
+    """Sends this thread's stdout to a buffer while the block runs; other threads, such as
+    the REPL or other jobs, are unaffected. Yields the buffer."""
+    router = routed_stdout()
+    previous = getattr(router._local, "output", None)
+    buffer = io.StringIO()
+    router._local.output = buffer
+    try:
+        yield buffer
+    finally:
+        router._local.output = previous
+
+# --- JOBS ---
+
+class Job:
+    def __init__(self, job_id, line):
+        self.id = job_id
+        self.line = line
+        self.state = "pending"
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.output = None
+        self.reported = False
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+class JobManager:
+    """Runs command lines on a thread pool so the REPL stays responsive."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._pool = None
+        self._local = threading.local()
+
+    def _ensure_started(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=get_setting("jobs.workers"), thread_name_prefix="job")
+
+    def submit(self, line: str, run):
+        """Schedules run(line) in the background and returns the Job."""
+        with self._lock:
+            self._ensure_started()
+            job = Job(self._next_id, line)
+            self._next_id += 1
+            job.output = _JobOutput(routed_stdout()._stream)
+            self._jobs[job.id] = job
+        job.future = self._pool.submit(self._run, job, run)
+        return job
+
+    def _run(self, job, run):
+        if job.cancel_event.is_set():
+            job.state = "cancelled"
+            return
+        job.state = "running"
+        job.started = time.monotonic()
+        self._local.job = job
+        routed_stdout()._local.output = job.output
+        try:
+            run(job.line)
+            job.state = "done"
+        except JobCancelled:
+            job.state = "cancelled"
+        except BaseException as e:  # a job must never take the worker thread down
+            job.state = "failed"
+            job.error = e
+        finally:
+            job.finished = time.monotonic()
+            routed_stdout()._local.output = None
+            self._local.job = None
+
+    def current(self):
+        """The job running in this thread, or None in the REPL thread."""
+        return getattr(self._local, "job", None)
+
+    @contextlib.contextmanager
+    def context(self, job):
+        """Makes check_cancelled()/sleep() in this thread follow `job`, for work that runs
+        on another pool (e.g. server requests) but should cancel the same way."""
+        previous = self.current()
+        self._local.job = job
+        try:
+            yield job
+        finally:
+            self._local.job = previous
+
+    def get(self, job_id: int):
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise LookupError(f"No such job: %{job_id}")
+        return job
+
+    def list(self):
+        return sorted(self._jobs.values(), key=lambda j: j.id)
+
+    def cancel(self, job_id: int):
+        job = self.get(job_id)
+        job.cancel_event.set()
+        if job.future.cancel():  # never started
+            job.state = "cancelled"
+        return job
+
+    def wait(self, job_id: int):
+        """Brings a job to the foreground: shows its output live until it ends.
+        Ctrl+C cancels it."""
+        job = self.get(job_id)
+        job.output.go_live()
+        try:
+            while not job.future.done():
+                time.sleep(0.05)
+        except KeyboardInterrupt:
+            self.cancel(job_id)
+            deadline = time.monotonic() + 2
+            while not job.future.done() and time.monotonic() < deadline:
+                time.sleep(0.05)
+        with self._lock:
+            if job.future.done():
+                job.reported = True
+                self._jobs.pop(job.id, None)
+        return job
+
+    def take_finished(self):
+        """Finished jobs not reported yet; they are removed from the table."""
+        finished = []
+        with self._lock:
+            for job in sorted(self._jobs.values(), key=lambda j: j.id):
+                if job.future is not None and job.future.done() and not job.reported:
+                    job.reported = True
+                    finished.append(job)
+                    del self._jobs[job.id]
+        return finished
+
+    def shutdown(self):
+        for job in self.list():
+            job.cancel_event.set()
+            if job.future is not None:
+                job.future.cancel()  # drops it if it never started (no cancel_futures= before 3.9)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+jobs = JobManager()
+
+# --- COOPERATIVE CANCELLATION ---
+
+def check_cancelled():
+    """Cancellation point for long-running handlers: raises JobCancelled if the current
+    background job was killed. A no-op in the foreground."""
+    job = jobs.current()
+    if job is not None and job.cancel_event.is_set():
+        raise JobCancelled()
+
+def sleep(seconds: float):
+    """time.sleep() that wakes up as soon as the current job is cancelled."""
+    job = jobs.current()
+    if job is None:
+        time.sleep(seconds)
+    elif job.cancel_event.wait(seconds):
+        raise JobCancelled()
+
+def cancellable_copy(src, dst, *, follow_symlinks=True):
+    """shutil copy_function that checks for cancellation before each file."""
+    import shutil
+    check_cancelled()
+    return shutil.copy2(src, dst, follow_symlinks=follow_symlinks)
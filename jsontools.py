@@ -0,0 +1,349 @@
+import json
+import re
+
+# --- CONSTANTS ---
+CHUNK_SIZE = 1024 * 1024  # characters read from the file per refill
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+
+_WS = re.compile(r"[ \t\n\r]*")
+# Consumes strings and everything that is not a bracket in one C-level match.
+_SKIP_RUN = re.compile(r'(?:[^"\[\]{}]+|"[^"\\]*(?:\\.[^"\\]*)*")*', re.S)
+_STRING_TAIL = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_DELIMITERS = " \t\n\r,]}:"
+_IDENTIFIER = re.compile(r"[A-Za-z_$][\w$-]*")
+_DECODER = json.JSONDecoder()
+# Anything that fails to parse this close to the end of the buffer may just be cut off mid-token.
+_TAIL_SLACK = 32
+_INCOMPLETE = object()
+# Reused encoders avoid rebuilding encoder state for every streamed element.
+_COMPACT_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+_PRETTY_ENCODERS = {}
+
+class JsonStreamError(ValueError):
+    """Raised for malformed JSON, with the character offset where parsing failed."""
+
+# --- INCREMENTAL READER ---
+
+class _Reader:
+    """Pull parser over a text stream that keeps only a window of the input in memory.
+
+    Small subtrees are handed to the C decoder (json.raw_decode) in one call; containers
+    that do not fit the current window are walked token by token instead.
+    """
+
+    def __init__(self, stream, chunk_size: int = CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.base = 0  # offset of buf[0] in the whole input
+        self.eof = False
+
+    def _fill(self, size: int = None):
+        if self.eof:
+            return False
+        data = self.stream.read(size or self.chunk_size)
+        if self.pos:
+            # Drop the consumed prefix so the window does not grow with the file.
+            self.base += self.pos
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        if not data:
+            self.eof = True
+            return False
+        self.buf += data
+        return True
+
+    def offset(self):
+        return self.base + self.pos
+
+    def error(self, message: str, pos: int = None):
+        at = self.offset() if pos is None else self.base + pos
+        raise JsonStreamError(f"{message} at offset {at}")
+
+    def peek(self):
+        """Skips whitespace and returns the next character ('' at end of input)."""
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch: str):
+        found = self.peek()
+        if found != ch:
+            self.error(f"Expecting '{ch}'" + (f", found '{found}'" if found else " before end of input"))
+        self.pos += 1
+
+    def _decode_here(self):
+        """Decodes the value at pos from the current window only. Returns value or _INCOMPLETE."""
+        try:
+            value, end = _DECODER.raw_decode(self.buf, self.pos)
+        except json.JSONDecodeError as e:
+            if not self.eof and (e.msg.startswith("Unterminated string") or e.pos >= len(self.buf) - _TAIL_SLACK):
+                return _INCOMPLETE
+            self.error(e.msg, e.pos)
+        if not self.eof and self.buf[self.pos] not in '"[{':
+            # A number or literal touching the window edge may continue in the next chunk.
+            if end >= len(self.buf) or (self.buf[end] not in _DELIMITERS and end >= len(self.buf) - _TAIL_SLACK):
+                return _INCOMPLETE
+        self.pos = end
+        return value
+
+    def read_value(self):
+        """Materializes the next complete value, growing the window as needed."""
+        if not self.peek():
+            self.error("Expecting value before end of input")
+        grow = self.chunk_size
+        while True:
+            value = self._decode_here()
+            if value is not _INCOMPLETE:
+                return value
+            self._fill(grow)
+            grow *= 2  # geometric growth keeps retries linear in the value size
+
+    def try_read_container(self):
+        """Decodes a container only if it is complete in the current window."""
+        return self._decode_here()
+
+    def _skip_string_tail(self):
+        while True:
+            m = _STRING_TAIL.match(self.buf, self.pos)
+            if m:
+                self.pos = m.end()
+                return
+            if not self._fill():
+                self.error("Unterminated string")
+
+    def skip_value(self):
+        """Skips the next value without building it (structure is not fully validated)."""
+        c = self.peek()
+        if c == '"':
+            self.pos += 1
+            self._skip_string_tail()
+        elif c in ("[", "{"):
+            depth = 0
+            while True:
+                self.pos = _SKIP_RUN.match(self.buf, self.pos).end()
+                if self.pos >= len(self.buf) or self.buf[self.pos] == '"':
+                    # Window ends inside a string or between tokens: slide it forward.
+                    if not self._fill():
+                        self.error("Unexpected end of input inside container")
+                    continue
+                ch = self.buf[self.pos]
+                self.pos += 1
+                if ch in "[{":
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        return
+        else:
+            self.read_value()
+
+    def iter_array(self):
+        """Yields element indices; the caller consumes exactly one value per index."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            c = self.peek()
+            self.pos += 1
+            if c == "]":
+                return
+            if c != ",":
+                self.pos -= 1
+                self.error("Expecting ',' or ']'")
+
+    def iter_object(self):
+        """Yields keys; the caller consumes exactly one value per key."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                self.error("Expecting property name enclosed in double quotes")
+            key = self.read_value()
+            self.expect(":")
+            yield key
+            c = self.peek()
+            self.pos += 1
+            if c == "}":
+                return
+            if c != ",":
+                self.pos -= 1
+                self.error("Expecting ',' or '}'")
+
+    def expect_end(self):
+        if self.peek():
+            self.error("Extra data after JSON document")
+
+# --- QUERY PATHS ---
+
+def parse_query(query: str):
+    """Parses a jq-like path such as `.items[].id`, `.a["b c"][0]` or `.` into steps."""
+    query = query.strip()
+    if not query.startswith("."):
+        raise ValueError("Query must start with '.'")
+    steps = []
+    i = 0
+    while i < len(query):
+        if query.startswith("[]", i):
+            steps.append(("iter", None))
+            i += 2
+        elif query[i] == "[":
+            close = query.find("]", i)
+            if close == -1:
+                raise ValueError(f"Unclosed '[' in query: {query}")
+            inner = query[i + 1:close].strip()
+            if inner.startswith('"'):
+                steps.append(("key", json.loads(inner)))
+            else:
+                try:
+                    steps.append(("index", int(inner)))
+                except ValueError:
+                    raise ValueError(f"Invalid index '{inner}' in query")
+            i = close + 1
+        elif query[i] == ".":
+            m = _IDENTIFIER.match(query, i + 1)
+            if m:
+                steps.append(("key", m.group()))
+                i = m.end()
+            else:
+                i += 1
+        else:
+            raise ValueError(f"Unexpected '{query[i]}' in query at position {i}")
+    return steps
+
+def _stream_query(reader, steps, i=0):
+    if i == len(steps):
+        yield reader.read_value()
+        return
+    c = reader.peek()
+    if c in ("[", "{"):
+        # Subtrees that fit the window are decoded in C and queried in memory.
+        value = reader.try_read_container()
+        if value is not _INCOMPLETE:
+            yield from apply_query(value, steps, i)
+            return
+    kind, arg = steps[i]
+    if kind == "key":
+        if c != "{":
+            reader.skip_value()
+            return
+        for key in reader.iter_object():
+            if key == arg:
+                yield from _stream_query(reader, steps, i + 1)
+            else:
+                reader.skip_value()
+    elif c == "[":
+        for index in reader.iter_array():
+            if kind == "iter" or index == arg:
+                yield from _stream_query(reader, steps, i + 1)
+            else:
+                reader.skip_value()
+    elif c == "{" and kind == "iter":
+        for _key in reader.iter_object():
+            yield from _stream_query(reader, steps, i + 1)
+    else:
+        reader.skip_value()
+
+def apply_query(value, steps, i=0):
+    """In-memory counterpart of the streaming query, used for NDJSON records and CLI text."""
+    if i == len(steps):
+        yield value
+        return
+    kind, arg = steps[i]
+    if kind == "key":
+        if isinstance(value, dict) and arg in value:
+            yield from apply_query(value[arg], steps, i + 1)
+    elif kind == "index":
+        if isinstance(value, list) and -len(value) <= arg < len(value):
+            yield from apply_query(value[arg], steps, i + 1)
+    elif isinstance(value, list):
+        for item in value:
+            yield from apply_query(item, steps, i + 1)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from apply_query(item, steps, i + 1)
+
+# --- FORMATTING ---
+
+def dump_value(value, indent: int = 2, depth: int = 0):
+    """Serializes a value pretty (indent > 0) or minified, nested at `depth` levels."""
+    if not indent:
+        return _COMPACT_ENCODER.encode(value)
+    encoder = _PRETTY_ENCODERS.get(indent)
+    if encoder is None:
+        encoder = _PRETTY_ENCODERS[indent] = json.JSONEncoder(ensure_ascii=False, indent=indent)
+    text = encoder.encode(value)
+    if not isinstance(value, (dict, list)):
+        return text
+    return text.replace("\n", "\n" + " " * (indent * depth)) if depth else text
+
+def _stream_format(reader, write, indent, depth=0):
+    c = reader.peek()
+    if c not in ("[", "{"):
+        value = reader.read_value()
+        if write:
+            write(dump_value(value, indent))
+        return
+    value = reader.try_read_container()
+    if value is not _INCOMPLETE:
+        if write:
+            write(dump_value(value, indent, depth))
+        return
+
+    # Too big for the window: emit the container incrementally.
+    newline = "\n" + " " * (indent * (depth + 1)) if indent else ""
+    closing = "\n" + " " * (indent * depth) if indent else ""
+    if c == "{":
+        items, open_ch, close_ch, colon = reader.iter_object(), "{", "}", ": " if indent else ":"
+    else:
+        items, open_ch, close_ch, colon = reader.iter_array(), "[", "]", None
+    if write:
+        write(open_ch)
+    empty = True
+    for item in items:
+        if write:
+            prefix = newline if empty else "," + newline
+            write((prefix + json.dumps(item, ensure_ascii=False) + colon) if colon else prefix)
+        empty = False
+        _stream_format(reader, write, indent, depth + 1)
+    if write:
+        write(close_ch if empty else closing + close_ch)
+
+def is_ndjson(path: str):
+    return path.lower().endswith(NDJSON_EXTENSIONS)
+
+def format_stream(src, write, indent: int = 2, chunk_size: int = CHUNK_SIZE):
+    """Pretty-prints/minifies (write given) or validates (write=None) one JSON document."""
+    reader = _Reader(src, chunk_size)
+    _stream_format(reader, write, indent)
+    reader.expect_end()
+    if write:
+        write("\n")
+    return reader.offset()
+
+def query_stream(src, query: str, chunk_size: int = CHUNK_SIZE):
+    """Yields values matching `query` from one JSON document without building the whole tree."""
+    steps = parse_query(query)
+    reader = _Reader(src, chunk_size)
+    yield from _stream_query(reader, steps)
+    reader.expect_end()
+
+def iter_ndjson(src):
+    """Yields (line_number, value) for each non-blank NDJSON line."""
+    for line_number, line in enumerate(src, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            raise JsonStreamError(f"{e.msg} on line {line_number}, column {e.colno}")
@@ -1,98 +1,68 @@
 import shlex
 import os
+import sys
+import itertools
 from rich.console import Console
 from rich.panel import Panel
 from rich import print as rprint
-from commands import (
-    cmd_help, cmd_time, cmd_open, cmd_note, cmd_calc, cmd_sysinfo, cmd_clear,
-    cmd_calc_history, cmd_convert, cmd_random, cmd_clean, cmd_battery, 
-    cmd_network, cmd_fun, cmd_remind, cmd_file_manager, cmd_password_gen,
-    cmd_weather, cmd_encrypt, cmd_decrypt, cmd_backup, cmd_restore,
-    cmd_process_manager, cmd_disk_analyzer, cmd_system_monitor, cmd_task_manager,
-    cmd_url_shortener, cmd_qr_generator, cmd_hash_generator, cmd_base64_encode,
-    cmd_base64_decode, cmd_json_formatter, cmd_text_tools, cmd_settings
+from commands import show_finished_jobs, PIPE_STAGES
+from rich.markup import escape
+from rich.text import Text
+from config import get_setting
+from history import command_history, iter_script
+from jobs import jobs
+from pipeline import (
+    BUILTIN_STAGES, PipelineError, split_chain, split_stages, run_pipeline, iter_pipeline, text_stage, pipe_only,
+    reset_status, command_failed
 )
+from plugin_loader import load_plugins
+from registry import COMMANDS, CommandSpec, PluginError, install_completion
+from stats import command_stats
 
 console = Console()
 
 # --- COMMAND MAP ---
-COMMAND_MAP = {
-    # Basic Commands
-    "help": lambda args: cmd_help(),
-    "time": lambda args: cmd_time(args),
-    "open": lambda args: cmd_open(args),
-    "note": lambda args: cmd_note(args),
-    "calc": lambda args: cmd_calc(args),
-    "sysinfo": lambda args: cmd_sysinfo(args),
-    "clean": lambda args: cmd_clean(args),
-    "battery": lambda args: cmd_battery(args),
-    "network": lambda args: cmd_network(args),
-    "convert": lambda args: cmd_convert(args),
-    "random": lambda args: cmd_random(args),
-    "remind": lambda args: cmd_remind(args),
-    
-    # File Management
-    "file": lambda args: cmd_file_manager(args),
-    "files": lambda args: cmd_file_manager(args),
-    
-    # Security & Encryption
-    "password": lambda args: cmd_password_gen(args),
-    "encrypt": lambda args: cmd_encrypt(args),
-    "decrypt": lambda args: cmd_decrypt(args),
-    "hash": lambda args: cmd_hash_generator(args),
-    
-    # Data Processing
-    "base64": lambda args: cmd_base64_encode(args),
-    "decode64": lambda args: cmd_base64_decode(args),
-    "json": lambda args: cmd_json_formatter(args),
-    "text": lambda args: cmd_text_tools(args),
-    
-    # System Management
-    "process": lambda args: cmd_process_manager(args),
-    "disk": lambda args: cmd_disk_analyzer(args),
-    "monitor": lambda args: cmd_system_monitor(args),
-    "tasks": lambda args: cmd_task_manager(args),
-    
-    # Web Tools
-    "weather": lambda args: cmd_weather(args),
-    "url": lambda args: cmd_url_shortener(args),
-    "qr": lambda args: cmd_qr_generator(args),
-    
-    # Backup & Restore
-    "backup": lambda args: cmd_backup(args),
-    "restore": lambda args: cmd_restore(args),
-    
-    # Settings
-    "settings": lambda args: cmd_settings(args),
-    "config": lambda args: cmd_settings(args),
-    
-    # Aliases
-    "calc history": lambda args: cmd_calc_history(args),
-    "clear": lambda args: cmd_clear(),
-    "cls": lambda args: cmd_clear(), 
-    "fun": lambda args: cmd_fun(args),
-    "fun joke": lambda args: cmd_fun(["joke"]),
-    "fun quote": lambda args: cmd_fun(["quote"]),
-}
+# Built-in commands register themselves with @command in commands.py; plugins are read from
+# the cached manifest of plugins/ and `assistant.plugins` entry points and imported on first use.
+for _stage_name in BUILTIN_STAGES:
+    # Pipeline stages (only valid after `|`)
+    COMMANDS.add(CommandSpec(_stage_name, pipe_only(_stage_name), category="Pipelines & Chaining", hidden=True))
+PLUGIN_PROBLEMS = load_plugins(COMMANDS)
+
+REGISTRY = COMMANDS
+COMMAND_MAP = REGISTRY.command_map()
+STAGES = {**BUILTIN_STAGES, **PIPE_STAGES, **REGISTRY.stages()}
+
+BUILTIN_WORDS = ("exit", "quit")
+# Not written to `record` scripts: they manage the session rather than do work.
+UNRECORDED_COMMANDS = ("history", "record", "exit", "quit")
 
 # --- PARSING ---
 def parse_command(line: str):
-    # Handle multi-word commands (like "calc history", "fun quote")
-    
-    # Try two-word commands first
-    parts = shlex.split(line, posix=False)
-    if len(parts) >= 2:
-        cmd_two_word = parts[0].lower() + " " + parts[1].lower()
-        if cmd_two_word in COMMAND_MAP:
-            return cmd_two_word, parts[2:]
-            
-    # Fall back to single-word commands
-    if not parts:
-        return None, []
-    cmd = parts[0].lower()
-    args = parts[1:]
+    # Multi-word commands (like "calc history", "fun quote") resolve through the registry trie
+    return resolve_command(shlex.split(line, posix=False))
+
+def expand_alias(parts):
+    """Replaces a leading user alias (setting `aliases.<name>`) with its command line.
+    Built-in commands always win, and expansion is not recursive."""
+    if parts and parts[0] not in REGISTRY:
+        line = get_setting("aliases").get(parts[0].lower())
+        if line:
+            return shlex.split(line, posix=False) + parts[1:]
+    return parts
+
+def resolve_command(parts):
+    """Maps already-split tokens to (command, args)."""
+    cmd, _handler, args = REGISTRY.resolve(expand_alias(parts))
     return cmd, args
 
+def unknown_command_message(line: str, cmd: str):
+    message = f"[bold red]❌ Unknown command: '{line}'. Type 'help' to see available commands.[/bold red]"
+    suggestions = REGISTRY.suggest(cmd or "", extra=list(get_setting("aliases")) + list(BUILTIN_WORDS))
+    if suggestions:
+        message += f"\n[bold yellow] Did you mean: {', '.join(suggestions)}?[/bold yellow]"
+    return message
+
 # --- MAIN LOOP ---
 
 def display_banner():
@@ -112,31 +82,243 @@ def display_banner():
     rprint("[bold cyan]Pro Tip: Use 'help' to see all available commands![/bold cyan]")
 
 
-def main():
-    display_banner()
-    while True:
+def run_once(argv):
+    """Runs a single command given on the command line (pipe mode), e.g. `main.py base64 --in - < file`."""
+    if any(token in ("|", ";", "&&") for token in argv):
+        return 0 if execute_line(" ".join(argv))[1] else 1
+    cmd, args = resolve_command(argv)
+    handler = COMMAND_MAP.get(cmd)
+    if handler is None:
+        rprint(unknown_command_message(" ".join(argv), cmd), file=sys.stderr)
+        return 1
+    reset_status()
+    with command_stats.measure(cmd) as run:
         try:
-            line = console.input("[bold magenta]>> [/bold magenta]").strip()
-        except (EOFError, KeyboardInterrupt):
-            rprint("\n[bold red]Exiting. Goodbye![/bold red]")
-            break
-        
-        if not line:
-            continue
-        
-        cmd, args = parse_command(line)
-        
-        if cmd in ("exit", "quit"):
-            rprint("[bold red]Goodbye![/bold red]")
-            break
-        
+            handler(args)
+        except PluginError as e:
+            rprint(f"[bold red]❌ {escape(str(e))}[/bold red]", file=sys.stderr)
+            run["failed"] = True
+            return 1
+        run["failed"] = command_failed()
+    return 0
+
+
+def expand_history(line: str):
+    """Applies !!/!N/!prefix replay, echoing the result. Returns None if the event is unknown."""
+    try:
+        expanded = command_history.expand(line)
+    except LookupError as e:
+        console.print(f"[bold red]❌ {escape(str(e))}[/bold red]")
+        return None
+    if expanded != line.strip():
+        console.print(f"[grey50]{escape(expanded)}[/grey50]")
+    return expanded
+
+
+def _build_pipeline(stage_lines):
+    """Resolves each `|` stage to a stage function. Returns (stages, error_message)."""
+    stages = []
+    for position, stage_line in enumerate(stage_lines):
+        cmd, args = parse_command(stage_line)
+        stage = STAGES.get(cmd)
+        if stage is None:
+            handler = COMMAND_MAP.get(cmd)
+            if handler is None:
+                return None, unknown_command_message(stage_line, cmd)
+            if position:
+                return None, f"[bold red]❌ '{cmd}' does not read piped input[/bold red]"
+            stage = text_stage(handler)  # plain text lines from its printed output
+        stages.append((cmd, stage, args))
+    return stages, None
+
+
+def run_segment(segment: str):
+    """Runs one command or `|` pipeline, timing it for `stats`. Returns True on success."""
+    stage_lines = split_stages(segment)
+    reset_status()
+    if len(stage_lines) == 1:
+        cmd, args = parse_command(segment)
         handler = COMMAND_MAP.get(cmd)
-        
-        if handler:
+        if handler is None:
+            console.print(unknown_command_message(segment, cmd))
+            return False
+        with command_stats.measure(cmd) as run:
             # Command handlers print directly to console (return None or empty string)
-            handler(args)
-        else:
-            console.print(f"[bold red]❌ Unknown command: '{line}'. Type 'help' to see available commands.[/bold red]")
+            try:
+                handler(args)
+            except PluginError as e:
+                console.print(f"[bold red]❌ {escape(str(e))}[/bold red]")
+            run["failed"] = command_failed()
+        return not run["failed"]
+    stages, error = _build_pipeline(stage_lines)
+    if error:
+        console.print(error)
+        return False
+    with command_stats.measure(" | ".join(name for name, _stage, _args in stages)) as run:
+        try:
+            run_pipeline(stages)
+        except Exception as e:
+            console.print(f"[bold red]❌ {escape(type(e).__name__ if not str(e) else str(e))}[/bold red]")
+        run["failed"] = command_failed()
+    return not run["failed"]
+
+
+def run_chain(chain):
+    """Runs `;`/`&&` chained segments. Returns (cmd, ok) for the last segment run."""
+    cmd, ok = None, True
+    for op, segment in chain:
+        if op == "&&" and not ok:
+            continue  # like a shell, the failure carries on to the next `&&`
+        cmd = parse_command(segment)[0]
+        if cmd in ("exit", "quit"):
+            return cmd, True
+        ok = run_segment(segment)
+    return cmd, ok
+
+
+def execute_line(line: str):
+    """Runs one already-expanded command line: `;`/`&&` chains of `|` pipelines, with a
+    trailing `&` running the whole line as a background job. Returns (cmd, ok)."""
+    background = line.endswith("&") and not line.endswith("&&")
+    if background:
+        line = line[:-1].rstrip()
+    try:
+        chain = split_chain(line)
+        for _op, segment in chain:
+            split_stages(segment)
+    except (PipelineError, ValueError) as e:
+        console.print(f"[bold red]❌ {escape(str(e))}[/bold red]")
+        return None, False
+    if not chain:
+        return None, True
+    if background:
+        # Unknown commands are reported now rather than from inside the job.
+        for _op, segment in chain:
+            cmd = parse_command(segment)[0]
+            if cmd in ("exit", "quit"):
+                console.print("[bold red]❌ exit cannot run in the background[/bold red]")
+                return cmd, False
+            stages, error = _build_pipeline(split_stages(segment))
+            if error:
+                console.print(error)
+                return cmd, False
+        job = jobs.submit(line, lambda _line: run_chain(chain))
+        console.print(f"[bold cyan][{job.id}] started: {escape(line)}[/bold cyan]")
+        return parse_command(chain[0][1])[0], True
+    return run_chain(chain)
+
+
+def collect_values(line: str, limit: int):
+    """Runs one command or `|` pipeline and returns up to `limit` of its values instead of
+    printing them (used by the RPC server's `values` method)."""
+    stages, error = _build_pipeline(split_stages(line))
+    if error:
+        raise PipelineError(Text.from_markup(error).plain.lstrip("❌ "))
+    return list(itertools.islice(iter_pipeline(stages), limit))
+
+
+def serve(argv):
+    """main.py --serve [--host H] [--port P] [--socket PATH] [--token T]"""
+    import asyncio
+    import secrets
+    from server import RpcServer, DEFAULT_HOST, DEFAULT_PORT
+    from utils import parse_flags
+
+    _rest, flags = parse_flags(argv, value_flags=("--host", "--port", "--socket", "--token"))
+    token = flags.get("token") or os.environ.get("ASSISTANT_SERVER_TOKEN")
+    generated = not token
+    if generated:  # every request needs a token; a page open in a browser cannot know it
+        token = secrets.token_urlsafe(24)
+    server = RpcServer(execute_line, collect_values, lambda: REGISTRY.names(), token)
+    host, port = flags.get("host", DEFAULT_HOST), int(flags.get("port", DEFAULT_PORT))
+    where = f"unix:{flags['socket']}" if "socket" in flags else f"http://{host}:{port}"
+
+    def ready(_server):
+        rprint(f"[bold green] Serving JSON-RPC on {where} (POST /rpc, GET /metrics, GET /health). Ctrl+C to stop.[/bold green]")
+        if generated:
+            rprint(f"[bold cyan] Token: {token}[/bold cyan] (send 'Authorization: Bearer <token>'; "
+                   "set --token or ASSISTANT_SERVER_TOKEN to keep one across restarts)")
+
+    try:
+        asyncio.run(server.serve(host, port, flags.get("socket"), ready))
+    except KeyboardInterrupt:
+        rprint("\n[bold red]Server stopped.[/bold red]")
+    return 0
+
+
+def run_batch(path: str):
+    """Replays a script (one command per line, # comments), e.g. one saved by `record`."""
+    try:
+        f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    except OSError as e:
+        rprint(f"[bold red]❌ Cannot open script: {e}[/bold red]", file=sys.stderr)
+        return 1
+    failures = 0
+    with f:
+        for line_number, line in iter_script(f):
+            console.print(f"[bold magenta]{line_number}>> [/bold magenta]{escape(line)}")
+            expanded = expand_history(line)
+            if expanded is None:
+                failures += 1
+                continue
+            cmd, ok = execute_line(expanded)
+            failures += not ok
+            if cmd in ("exit", "quit"):
+                break
+    # A script ends only when the jobs it started have finished.
+    for job in jobs.list():
+        jobs.wait(job.id)
+        failures += job.state != "done"
+    show_finished_jobs()
+    return 1 if failures else 0
+
+
+def main():
+    if len(sys.argv) > 1:
+        try:
+            if sys.argv[1] == "--serve":
+                sys.exit(serve(sys.argv[2:]))
+            if sys.argv[1] == "--batch":
+                if len(sys.argv) < 3:
+                    rprint("[bold red] Usage: main.py --batch <script|->[/bold red]", file=sys.stderr)
+                    sys.exit(2)
+                sys.exit(run_batch(sys.argv[2]))
+            sys.exit(run_once(sys.argv[1:]))
+        finally:
+            command_stats.save()
+
+    display_banner()
+    for problem in PLUGIN_PROBLEMS:
+        rprint(f"[bold yellow] Plugin skipped: {escape(problem)}[/bold yellow]")
+    install_completion(REGISTRY, lambda: list(get_setting("aliases")) + list(BUILTIN_WORDS))
+    command_history.attach_readline()
+    try:
+        while True:
+            show_finished_jobs()
+            try:
+                line = console.input("[bold magenta]>> [/bold magenta]").strip()
+            except (EOFError, KeyboardInterrupt):
+                rprint("\n[bold red]Exiting. Goodbye![/bold red]")
+                break
+            
+            if not line:
+                continue
+            
+            expanded = expand_history(line)
+            if expanded is None:
+                continue
+            command_history.add(expanded)
+            cmd, ok = execute_line(expanded)
+            
+            if cmd in ("exit", "quit"):
+                rprint("[bold red]Goodbye![/bold red]")
+                break
+            if ok and cmd not in UNRECORDED_COMMANDS:
+                command_history.record(expanded)
+    finally:
+        jobs.shutdown()
+        command_history.close()
+        command_stats.save()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,340 @@
+import asyncio
+import os
+import socket
+import struct
+import time
+from collections import namedtuple
+
+# --- CONSTANTS ---
+PROC_ROOT = "/proc"
+SYS_ROOT = "/sys"
+RTF_UP = 0x1
+RTF_GATEWAY = 0x2
+SIOCGIWESSID = 0x8B1B  # wireless extensions: read the ESSID of an interface
+DEFAULT_PROBE_PORT = 443
+DEFAULT_SCAN_CONCURRENCY = 500
+BANNER_BYTES = 256
+MAX_PORTS = 65535
+
+# IPv6 routes give the destination as "addr/prefix" and the prefix length as mask
+Route = namedtuple("Route", "interface destination gateway mask flags metric")
+Counters = namedtuple("Counters", "rx_bytes rx_packets rx_errors rx_dropped tx_bytes tx_packets tx_errors tx_dropped")
+Interface = namedtuple("Interface", "name state mac mtu speed ipv4 ipv6 wireless ssid counters")
+ProbeResult = namedtuple("ProbeResult", "host port address times errors")
+# state: open, closed (refused), filtered (no answer before the timeout) or error
+PortResult = namedtuple("PortResult", "host port address state seconds banner error")
+
+# --- ROUTES ---
+
+def _ipv4(hex_le: str):
+    """/proc/net/route stores addresses as little-endian hex words."""
+    return socket.inet_ntoa(struct.pack("<I", int(hex_le, 16)))
+
+def _ipv6(hex_be: str):
+    return socket.inet_ntop(socket.AF_INET6, bytes.fromhex(hex_be))
+
+def read_routes(proc: str = PROC_ROOT):
+    """IPv4 routes from /proc/net/route, then IPv6 routes from /proc/net/ipv6_route
+    (destination as "addr/prefix"). [] where the files do not exist (not Linux)."""
+    routes = []
+    try:
+        with open(os.path.join(proc, "net", "route"), "r", encoding="ascii") as f:
+            next(f, None)  # header
+            for line in f:
+                fields = line.split()
+                if len(fields) < 8:
+                    continue
+                routes.append(Route(fields[0], _ipv4(fields[1]), _ipv4(fields[2]), _ipv4(fields[7]),
+                                    int(fields[3], 16), int(fields[6])))
+    except FileNotFoundError:
+        return routes
+    try:
+        with open(os.path.join(proc, "net", "ipv6_route"), "r", encoding="ascii") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 10:
+                    continue
+                prefix = int(fields[1], 16)
+                routes.append(Route(fields[9], f"{_ipv6(fields[0])}/{prefix}", _ipv6(fields[4]),
+                                    str(prefix), int(fields[8], 16), int(fields[5], 16)))
+    except FileNotFoundError:
+        pass
+    return routes
+
+def default_gateways(proc: str = PROC_ROOT):
+    """[(interface, gateway)] of the default routes, lowest metric first."""
+    defaults = [r for r in read_routes(proc)
+                if r.flags & RTF_UP and r.flags & RTF_GATEWAY and r.destination in ("0.0.0.0", "::/0")
+                and r.gateway not in ("0.0.0.0", "::")]
+    defaults.sort(key=lambda r: (":" in r.gateway, r.metric))  # IPv4 first
+    return [(r.interface, r.gateway) for r in defaults]
+
+# --- COUNTERS ---
+
+def read_counters(proc: str = PROC_ROOT):
+    """{interface: Counters} from /proc/net/dev, or from psutil where there is no /proc."""
+    try:
+        with open(os.path.join(proc, "net", "dev"), "r", encoding="ascii") as f:
+            lines = f.readlines()[2:]  # two header lines
+    except FileNotFoundError:
+        import psutil
+        return {name: Counters(c.bytes_recv, c.packets_recv, c.errin, c.dropin, c.bytes_sent, c.packets_sent, c.errout, c.dropout)
+                for name, c in psutil.net_io_counters(pernic=True).items()}
+    counters = {}
+    for line in lines:
+        name, _, data = line.partition(":")
+        fields = data.split()
+        if len(fields) < 16:
+            continue
+        values = [int(v) for v in fields]
+        counters[name.strip()] = Counters(*values[0:4], *values[8:12])
+    return counters
+
+def sample_rates(interval: float = 1.0, count: int = 1, proc: str = PROC_ROOT, sleep=time.sleep):
+    """Yields {interface: (rx bytes/s, tx bytes/s)} `count` times, each averaged over
+    `interval` seconds. A counter that went backwards (interface reset, 32-bit wrap)
+    reports 0 for that interval."""
+    previous, previous_at = read_counters(proc), time.monotonic()
+    for _ in range(count):
+        sleep(interval)
+        current, now = read_counters(proc), time.monotonic()
+        elapsed = max(now - previous_at, 1e-9)
+        rates = {}
+        for name, c in current.items():
+            before = previous.get(name)
+            if before is None:
+                continue
+            rates[name] = (max(c.rx_bytes - before.rx_bytes, 0) / elapsed, max(c.tx_bytes - before.tx_bytes, 0) / elapsed)
+        yield rates
+        previous, previous_at = current, now
+
+# --- INTERFACES ---
+
+def _read_sys(sys_root: str, name: str, attribute: str):
+    try:
+        with open(os.path.join(sys_root, "class", "net", name, attribute), "r", encoding="ascii") as f:
+            return f.read().strip()
+    except OSError:  # missing, or EINVAL (e.g. `speed` of a link that is down)
+        return None
+
+def _ipv6_addresses(proc: str):
+    """{interface: [address/prefix]} from /proc/net/if_inet6."""
+    found = {}
+    try:
+        with open(os.path.join(proc, "net", "if_inet6"), "r", encoding="ascii") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 6:
+                    found.setdefault(fields[5], []).append(f"{_ipv6(fields[0])}/{int(fields[2], 16)}")
+    except FileNotFoundError:
+        pass
+    return found
+
+def _ipv4_addresses():
+    """{interface: [address]} via psutil (getifaddrs; no subprocess)."""
+    try:
+        import psutil
+        return {name: [a.address for a in addrs if a.family == socket.AF_INET]
+                for name, addrs in psutil.net_if_addrs().items()}
+    except Exception:
+        return {}
+
+def wireless_ssid(name: str):
+    """SSID an interface is associated with, via the SIOCGIWESSID ioctl; None if it is not
+    wireless, not associated, or the kernel lacks wireless extensions."""
+    try:
+        import array
+        import fcntl
+    except ImportError:  # Windows
+        return None
+    buffer = array.array("B", bytes(33))
+    request = struct.pack("16sPHH", name.encode()[:15], buffer.buffer_info()[0], len(buffer), 0)
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            response = fcntl.ioctl(sock.fileno(), SIOCGIWESSID, request)
+    except OSError:
+        return None
+    length = struct.unpack("16sPHH", response)[2]
+    return buffer.tobytes()[:length].decode("utf-8", "replace") or None
+
+def interfaces(proc: str = PROC_ROOT, sys_root: str = SYS_ROOT, ssid=wireless_ssid):
+    """Every interface with its link state, addresses and counters, sorted by name."""
+    counters = read_counters(proc)
+    ipv4 = _ipv4_addresses()
+    ipv6 = _ipv6_addresses(proc)
+    names = sorted(set(counters) | set(ipv4) | set(ipv6))
+    result = []
+    for name in names:
+        wireless = os.path.isdir(os.path.join(sys_root, "class", "net", name, "wireless"))
+        mtu = _read_sys(sys_root, name, "mtu")
+        speed = _read_sys(sys_root, name, "speed")
+        result.append(Interface(
+            name=name,
+            state=_read_sys(sys_root, name, "operstate") or "unknown",
+            mac=_read_sys(sys_root, name, "address"),
+            mtu=int(mtu) if mtu and mtu.isdigit() else None,
+            speed=int(speed) if speed and speed.lstrip("-").isdigit() and int(speed) > 0 else None,
+            ipv4=ipv4.get(name, []),
+            ipv6=ipv6.get(name, []),
+            wireless=wireless,
+            ssid=ssid(name) if wireless else None,
+            counters=counters.get(name),
+        ))
+    return result
+
+# --- LATENCY ---
+
+def parse_target(target: str, default_port: int = DEFAULT_PROBE_PORT):
+    """"host", "host:port" or "[v6addr]:port" -> (host, port)."""
+    if target.startswith("["):
+        host, _, rest = target[1:].partition("]")
+        return host, int(rest[1:]) if rest.startswith(":") else default_port
+    if target.count(":") == 1:
+        host, port = target.split(":")
+        return host, int(port)
+    return target, default_port
+
+async def _within(awaitable, timeout: float):
+    """Awaits with a timeout (asyncio.TimeoutError). asyncio.timeout() on 3.11+ avoids
+    the extra task wait_for() creates per call, which shows when scanning thousands of ports."""
+    if hasattr(asyncio, "timeout"):
+        async with asyncio.timeout(timeout):
+            return await awaitable
+    return await asyncio.wait_for(awaitable, timeout)
+
+async def _connect_time(address, timeout: float):
+    family, _type, _proto, _name, sockaddr = address
+    loop = asyncio.get_running_loop()
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.setblocking(False)
+        started = time.perf_counter()
+        await _within(loop.sock_connect(sock, sockaddr), timeout)
+        return time.perf_counter() - started
+
+async def probe(host: str, port: int, count: int = 4, timeout: float = 2.0, gap: float = 0.2):
+    """Times `count` TCP handshakes to host:port (name resolved once, not timed)."""
+    loop = asyncio.get_running_loop()
+    times, errors = [], []
+    try:
+        addresses = await asyncio.wait_for(loop.getaddrinfo(host, port, type=socket.SOCK_STREAM), timeout)
+    except (OSError, asyncio.TimeoutError) as e:
+        return ProbeResult(host, port, None, times, [f"resolve: {e or 'timed out'}"] * count)
+    address = addresses[0]
+    for attempt in range(count):
+        if attempt:
+            await asyncio.sleep(gap)
+        try:
+            times.append(await _connect_time(address, timeout))
+        except asyncio.TimeoutError:
+            errors.append("timed out")
+        except OSError as e:
+            errors.append(os.strerror(e.errno) if e.errno else str(e))
+    return ProbeResult(host, port, address[4][0], times, errors)
+
+async def probe_all(targets, count: int = 4, timeout: float = 2.0, concurrency: int = 32):
+    """Probes every (host, port) at once (at most `concurrency` in flight); results in order."""
+    slots = asyncio.Semaphore(concurrency)
+
+    async def limited(host, port):
+        async with slots:
+            return await probe(host, port, count, timeout)
+    return await asyncio.gather(*(limited(host, port) for host, port in targets))
+
+def run_probes(targets, count: int = 4, timeout: float = 2.0):
+    """Synchronous wrapper around probe_all() for command handlers."""
+    return asyncio.run(probe_all(targets, count, timeout))
+
+# --- PORT SCANS ---
+
+def parse_ports(spec: str):
+    """"22,80,8000-8100" -> sorted unique ports. Raises ValueError for anything outside 1-65535."""
+    ports = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        low, _, high = part.partition("-")
+        try:
+            low, high = int(low), int(high or low)
+        except ValueError:
+            raise ValueError(f"Invalid port or range: '{part}'") from None
+        if not 1 <= low <= high <= MAX_PORTS:
+            raise ValueError(f"Invalid port range: '{part}' (ports are 1-{MAX_PORTS})")
+        ports.update(range(low, high + 1))
+    if not ports:
+        raise ValueError("No ports given")
+    return sorted(ports)
+
+def parse_services(specs):
+    """["db:5432,web:443", "cache:6379"] -> [(host, port)] (a port is required)."""
+    services = []
+    for spec in specs:
+        for item in spec.split(","):
+            if not item.strip():
+                continue
+            host, port = parse_target(item.strip(), default_port=None)
+            if port is None:
+                raise ValueError(f"Missing port in '{item}' (use host:port)")
+            if not 1 <= port <= MAX_PORTS:
+                raise ValueError(f"Invalid port in '{item}'")
+            services.append((host, port))
+    return services
+
+def _fd_headroom(wanted: int):
+    """Caps concurrent sockets below the open-file limit (one descriptor per connection)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return wanted
+    soft, _hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    return max(1, min(wanted, soft - 64)) if soft != resource.RLIM_INFINITY else wanted
+
+async def _check(host: str, address, port: int, timeout: float, banner: bool):
+    if address is None:
+        return PortResult(host, port, None, "error", None, None, "could not resolve")
+    family, _type, _proto, _name, sockaddr = address
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.setblocking(False)
+        try:
+            await _within(loop.sock_connect(sock, (sockaddr[0], port, *sockaddr[2:])), timeout)
+        except asyncio.TimeoutError:
+            return PortResult(host, port, sockaddr[0], "filtered", None, None, None)
+        except ConnectionRefusedError:
+            return PortResult(host, port, sockaddr[0], "closed", time.perf_counter() - started, None, None)
+        except OSError as e:
+            return PortResult(host, port, sockaddr[0], "error", None, None, os.strerror(e.errno) if e.errno else str(e))
+        seconds = time.perf_counter() - started
+        text = None
+        if banner:  # services that speak first (ssh, smtp, ftp, redis errors...) identify themselves
+            try:
+                data = await _within(loop.sock_recv(sock, BANNER_BYTES), timeout)
+                text = " ".join(data.decode("utf-8", "replace").split()) or None
+            except (asyncio.TimeoutError, OSError):
+                pass
+        return PortResult(host, port, sockaddr[0], "open", seconds, text, None)
+
+async def scan(targets, timeout: float = 1.0, concurrency: int = DEFAULT_SCAN_CONCURRENCY, banner: bool = False):
+    """Connects to every (host, port) from one thread. A BoundedSemaphore keeps at most
+    `concurrency` sockets open; each host is resolved once. Results are in target order."""
+    loop = asyncio.get_running_loop()
+    addresses = {}
+    for host in dict.fromkeys(host for host, _port in targets):
+        try:
+            found = await asyncio.wait_for(loop.getaddrinfo(host, None, type=socket.SOCK_STREAM), timeout + 5)
+            addresses[host] = found[0]
+        except (OSError, asyncio.TimeoutError):
+            addresses[host] = None
+    slots = asyncio.BoundedSemaphore(_fd_headroom(concurrency))
+    tasks = []
+    for host, port in targets:
+        await slots.acquire()  # creating tasks lazily also keeps memory flat for big ranges
+        task = asyncio.ensure_future(_check(host, addresses[host], port, timeout, banner))
+        task.add_done_callback(lambda _task: slots.release())
+        tasks.append(task)
+    return await asyncio.gather(*tasks)
+
+def run_scan(targets, timeout: float = 1.0, concurrency: int = DEFAULT_SCAN_CONCURRENCY, banner: bool = False):
+    """Synchronous wrapper around scan() for command handlers."""
+    return asyncio.run(scan(targets, timeout, concurrency, banner))
@@ -0,0 +1,162 @@
+from rich.cells import cell_len
+from rich.console import COLOR_SYSTEMS
+from rich.style import Style
+from rich.table import Table
+from rich.text import Text
+
+# --- CONSTANTS ---
+FAST_PATH_ROWS = 100   # smaller tables go through Rich's Table (exact layout, wrapping)
+WRITE_CHUNK_LINES = 4096
+
+# --- STYLES ---
+
+_styles = {}
+
+def style(definition: str):
+    """Parsed Style for a definition such as "bold green", cached so rows never re-parse it."""
+    parsed = _styles.get(definition)
+    if parsed is None:
+        parsed = _styles[definition] = Style.parse(definition) if definition else Style.null()
+    return parsed
+
+def _ansi(console, definition: str):
+    """(prefix, suffix) escape codes for a style on this console, or ("", "") without colour."""
+    color_system = COLOR_SYSTEMS.get(console.color_system) if console.color_system else None
+    if not definition or color_system is None or console.no_color:
+        return "", ""
+    prefix = style(definition).render("\0", color_system=color_system).split("\0")[0]
+    return (prefix, "\x1b[0m") if prefix else ("", "")
+
+def _pad(text: str, width: int, justify: str):
+    gap = width - cell_len(text)
+    if gap <= 0:
+        return text
+    if justify == "right":
+        return " " * gap + text
+    if justify == "center":
+        return " " * (gap // 2) + text + " " * (gap - gap // 2)
+    return text + " " * gap
+
+# --- TABLES ---
+
+class DataTable:
+    """Table whose cells are plain data, never markup (so `[` in a file name is safe).
+
+    Big tables skip Rich's layout engine, which measures and wraps every cell:
+    - not a terminal (piped, redirected, captured): plain aligned columns, written in chunks;
+    - a terminal, when the rows fit the width: the same box drawing as Rich's default
+      table, with the style escape codes computed once per column instead of per cell.
+    Small tables, and ones too wide for the terminal, are rendered by Rich's Table from
+    Text cells, which still avoids parsing markup.
+    """
+
+    def __init__(self, title: str = "", title_style: str = "bold blue", header_style: str = "bold"):
+        self.title = title
+        self.title_style = title_style
+        self.header_style = header_style
+        self.columns = []  # (header, style, justify)
+        self.rows = []
+
+    def add_column(self, header: str, style: str = "", justify: str = "left"):
+        self.columns.append((header, style, justify))
+
+    def add_row(self, *cells):
+        self.rows.append(cells)
+
+    def print(self, console):
+        if not console.is_terminal:
+            self._write(console, self._plain_lines())
+            return
+        widths = self._widths()
+        fits = sum(widths) + 3 * len(widths) + 1 <= console.width
+        if len(self.rows) < FAST_PATH_ROWS or not fits or console.legacy_windows:
+            console.print(self._rich_table())
+            return
+        self._write(console, self._box_lines(console, widths))
+
+    def _widths(self):
+        widths = [cell_len(header) for header, _style, _justify in self.columns]
+        for row in self.rows:
+            for i, cell in enumerate(row):
+                length = len(cell) if cell.isascii() else cell_len(cell)
+                if length > widths[i]:
+                    widths[i] = length
+        return widths
+
+    def _plain_lines(self):
+        widths = self._widths()
+        justify = [justify for _header, _style, justify in self.columns]
+        widths[-1] = 0 if justify[-1] == "left" else widths[-1]  # no trailing spaces
+        def line(cells):
+            parts = []
+            for cell, width, side in zip(cells, widths, justify):
+                gap = width - (len(cell) if cell.isascii() else cell_len(cell))
+                parts.append(cell + " " * gap if side != "right" else " " * gap + cell)
+            return "  ".join(parts)
+        if self.title:
+            yield self.title.strip()
+        yield line([header for header, _style, _justify in self.columns])
+        for row in self.rows:
+            yield line(row)
+
+    def _box_lines(self, console, widths):
+        total = sum(widths) + 3 * len(widths) + 1
+        if self.title:
+            prefix, suffix = _ansi(console, f"italic {self.title_style}")
+            yield prefix + _pad(self.title, total, "center").rstrip() + suffix
+        yield "┏" + "┳".join("━" * (w + 2) for w in widths) + "┓"
+        head_prefix, head_suffix = _ansi(console, self.header_style)
+        yield "┃" + "┃".join(f" {head_prefix}{_pad(header, w, justify)}{head_suffix} "
+                             for (header, _style, justify), w in zip(self.columns, widths)) + "┃"
+        yield "┡" + "╇".join("━" * (w + 2) for w in widths) + "┩"
+        cell_formats = []
+        for (_header, column_style, justify), width in zip(self.columns, widths):
+            prefix, suffix = _ansi(console, column_style)
+            cell_formats.append((prefix, suffix, width, justify))
+        for row in self.rows:
+            parts = []
+            for cell, (prefix, suffix, width, justify) in zip(row, cell_formats):
+                gap = width - (len(cell) if cell.isascii() else cell_len(cell))
+                if justify == "right":
+                    parts.append(f" {' ' * gap}{prefix}{cell}{suffix} ")
+                else:
+                    parts.append(f" {prefix}{cell}{suffix}{' ' * gap} ")
+            yield "│" + "│".join(parts) + "│"
+        yield "└" + "┴".join("─" * (w + 2) for w in widths) + "┘"
+
+    def _rich_table(self):
+        title = Text(self.title, style=f"italic {self.title_style}") if self.title else None
+        table = Table(title=title,
+                      header_style=self.header_style)
+        for header, column_style, justify in self.columns:
+            table.add_column(header, style=column_style or None, justify=justify)
+        for row in self.rows:
+            table.add_row(*(Text(cell) for cell in row))
+        return table
+
+    @staticmethod
+    def _write(console, lines):
+        write = console.file.write
+        chunk = []
+        for line in lines:
+            chunk.append(line)
+            if len(chunk) == WRITE_CHUNK_LINES:
+                write("\n".join(chunk) + "\n")
+                chunk = []
+        if chunk:
+            write("\n".join(chunk) + "\n")
+        console.file.flush()
+
+# --- LINES ---
+
+def print_lines(console, lines, line_style: str = ""):
+    """Writes one plain-text line per item (no markup, no highlighting), styled once per
+    call rather than per line. Returns the number of lines written."""
+    prefix, suffix = _ansi(console, line_style) if console.is_terminal else ("", "")
+    write = console.file.write
+    count = 0
+    for line in lines:
+        write(f"{prefix}{line}{suffix}\n")
+        count += 1
+    console.file.flush()
+    return count
@@ -0,0 +1,170 @@
+import math
+import os
+import secrets
+import time
+import uuid
+
+# --- CONSTANTS ---
+CHARSETS = {
+    "lower": "abcdefghijklmnopqrstuvwxyz",
+    "upper": "ABCDEFGHIJKLMNOPQRSTUVWXYZ",
+    "digits": "0123456789",
+    "symbols": "!@#$%^&*()_+-=[]{}|;:,.<>?",
+}
+WORDLIST_FILES = ["data/wordlist.txt", "/usr/share/dict/words"]
+# Used for pronounceable passphrase words when no word list is installed.
+_CONSONANTS = "bdfghjklmnprstvz"
+_VOWELS = "aeiou"
+_BATCH_CHARS = 1 << 20  # random characters drawn per urandom/translate round
+
+# --- SAMPLING ---
+
+class _ByteSampler:
+    """Uniformly maps random bytes onto an ASCII alphabet by rejection sampling.
+
+    Bytes at or above the largest multiple of len(alphabet) are discarded, which
+    removes modulo bias; the mapping and rejection both run inside bytes.translate.
+    """
+
+    def __init__(self, alphabet: str):
+        if not alphabet:
+            raise ValueError("Empty character set.")
+        raw = alphabet.encode("ascii")
+        if len(set(raw)) != len(raw) or len(raw) > 256:
+            raise ValueError("Character set must contain unique ASCII characters.")
+        size = len(raw)
+        limit = 256 - (256 % size)
+        self.size = size
+        self.table = bytes(raw[i % size] if i < limit else 0 for i in range(256))
+        self.reject = bytes(range(limit, 256))
+
+    def draw(self, n: int):
+        out = bytearray()
+        while len(out) < n:
+            want = n - len(out)
+            # Over-draw by the expected rejection rate so one round almost always suffices.
+            out += os.urandom(want + want // 4 + 16).translate(self.table, self.reject)
+        return out
+
+def _count_constrained(length: int, class_sizes, minimums):
+    """Exact number of strings of `length` with at least minimums[i] chars from class i."""
+    ways = [1] + [0] * length  # ways[n]: arrangements of n positions using the classes seen so far
+    for size, minimum in zip(class_sizes, minimums):
+        nxt = [0] * (length + 1)
+        for used, count in enumerate(ways):
+            if not count:
+                continue
+            for k in range(minimum, length - used + 1):
+                nxt[used + k] += count * math.comb(used + k, k) * size ** k
+        ways = nxt
+    return ways[length]
+
+def password_entropy(length: int, classes, min_per_class: int = 1):
+    """Entropy in bits of a uniformly chosen password satisfying the class minimums."""
+    sizes = [len(CHARSETS[c]) for c in classes]
+    total = _count_constrained(length, sizes, [min_per_class] * len(sizes))
+    return math.log2(total) if total else 0.0
+
+# --- PASSWORDS ---
+
+def iter_passwords(length: int, count: int, classes=tuple(CHARSETS), min_per_class: int = 1):
+    """Yields `count` passwords, each uniform over strings meeting the per-class minimums."""
+    classes = [c for c in CHARSETS if c in classes]
+    if not classes:
+        raise ValueError("Select at least one character class.")
+    if length <= 0 or count <= 0:
+        raise ValueError("Length and count must be positive.")
+    if min_per_class * len(classes) > length:
+        raise ValueError(f"Length {length} is too short for {min_per_class} character(s) from each of {len(classes)} classes.")
+
+    sampler = _ByteSampler("".join(CHARSETS[c] for c in classes))
+    class_bytes = [CHARSETS[c].encode("ascii") for c in classes]
+    per_batch = max(1, _BATCH_CHARS // length)
+    produced = 0
+    while produced < count:
+        n = min(per_batch, count - produced)
+        pool = sampler.draw(n * length)
+        for start in range(0, n * length, length):
+            candidate = bytes(pool[start:start + length])
+            # Reject whole candidates that miss a class minimum; this keeps the
+            # distribution uniform over the valid passwords.
+            if min_per_class and any(length - len(candidate.translate(None, cb)) < min_per_class for cb in class_bytes):
+                continue
+            yield candidate.decode("ascii")
+            produced += 1
+            if produced == count:
+                return
+
+def generate_password(length: int = 16, classes=tuple(CHARSETS), min_per_class: int = 1):
+    return next(iter_passwords(length, 1, classes, min_per_class))
+
+def write_passwords(path: str, length: int, count: int, classes=tuple(CHARSETS), min_per_class: int = 1):
+    """Writes passwords one per line, buffering output. Returns elapsed seconds."""
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="ascii", buffering=1024 * 1024) as f:
+        batch = []
+        for pw in iter_passwords(length, count, classes, min_per_class):
+            batch.append(pw)
+            if len(batch) >= 10000:
+                f.write("\n".join(batch) + "\n")
+                batch = []
+        if batch:
+            f.write("\n".join(batch) + "\n")
+    return time.perf_counter() - start
+
+def benchmark_passwords(length: int = 16, count: int = 100000, classes=tuple(CHARSETS)):
+    """Returns generated passwords per second."""
+    start = time.perf_counter()
+    for _ in iter_passwords(length, count, classes):
+        pass
+    return count / max(time.perf_counter() - start, 1e-9)
+
+# --- PASSPHRASES & TOKENS ---
+
+_wordlist_cache = None
+
+def load_wordlist():
+    """Returns (words, source). Falls back to generated pronounceable words."""
+    global _wordlist_cache
+    if _wordlist_cache is None:
+        for path in WORDLIST_FILES:
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                    words = sorted({w.strip().lower() for w in f if w.strip().isalpha() and 3 <= len(w.strip()) <= 9 and w.strip().isascii()})
+                if len(words) >= 1024:
+                    _wordlist_cache = (words, path)
+                    break
+        else:
+            _wordlist_cache = (None, "generated")
+    return _wordlist_cache
+
+def _pronounceable_word():
+    # Two consonant-vowel-consonant syllables: 16*5*16 = 1280 choices each.
+    return "".join(
+        secrets.choice(_CONSONANTS) + secrets.choice(_VOWELS) + secrets.choice(_CONSONANTS)
+        for _ in range(2)
+    )
+
+def generate_passphrase(words: int = 6, separator: str = "-"):
+    """Returns (passphrase, entropy_bits, source)."""
+    if words <= 0:
+        raise ValueError("Word count must be positive.")
+    wordlist, source = load_wordlist()
+    if wordlist:
+        chosen = [secrets.choice(wordlist) for _ in range(words)]
+        bits = words * math.log2(len(wordlist))
+    else:
+        chosen = [_pronounceable_word() for _ in range(words)]
+        bits = words * 2 * math.log2(len(_CONSONANTS) ** 2 * len(_VOWELS))
+    return separator.join(chosen), bits, source
+
+def generate_token(nbytes: int = 32, style: str = "urlsafe"):
+    """Returns (token, entropy_bits) for hex/urlsafe tokens or a UUID4."""
+    if style == "uuid":
+        return str(uuid.uuid4()), 122.0
+    if nbytes <= 0:
+        raise ValueError("Token size must be positive.")
+    if style == "hex":
+        return secrets.token_hex(nbytes), nbytes * 8.0
+    return secrets.token_urlsafe(nbytes), nbytes * 8.0
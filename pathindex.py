@@ -0,0 +1,432 @@
+import bisect
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import Counter, namedtuple
+
+from jobs import check_cancelled
+from storage import atomic_write, read_json, update_json
+
+# --- CONSTANTS ---
+FRECENCY_FILE = "data/frecency.json"
+PATH_INDEX_FILE = "data/paths.idx"
+MAX_RANK_TOTAL = 10000   # past this, every rank is scaled down and the faded ones dropped
+FRECENCY_WEIGHT = 0.25   # most a frecent path gains over an equally good match
+FUZZY_MIN = 0.5          # share of the query's trigrams a name needs to match fuzzily
+MAX_FUZZY_POSTINGS = 8000  # postings counted per fuzzy lookup, so 1M paths stay fast
+MAX_FUZZY_CANDIDATES = 400 # names checked per fuzzy lookup, most trigrams counted first
+SCAN_CHUNK = 1024        # postings decoded at a time while scanning
+FIRST_KEY = 1 << 24      # added to a name's first trigram: the names starting with it
+SKIP_DIRS = {".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv", ".tox", ".cache"}
+INDEX_MAGIC = b"PATHIX2" + sys.byteorder[0].encode()  # arrays are stored in native byte order
+# magic, paths, trigram keys, postings, built at
+INDEX_HEADER = struct.Struct("<8sQQQd")
+
+Match = namedtuple("Match", "path score source")  # source: "recent" or "index"
+
+# --- MATCHING ---
+
+def _grams(data: bytes):
+    return {(data[i] << 16) | (data[i + 1] << 8) | data[i + 2] for i in range(len(data) - 2)}
+
+def _first_key(data: bytes):
+    return FIRST_KEY | (data[0] << 16) | (data[1] << 8) | data[2]
+
+def trigrams(text: str):
+    """24-bit keys of the 3-byte windows of text's lowercased UTF-8 form."""
+    return _grams(text.lower().encode("utf-8", "surrogateescape"))
+
+def _terms(query: str):
+    """Lowercased query words; the last one is matched against names, the others must
+    appear (in order) in the directories above: `open proj report`."""
+    return [term for term in query.lower().replace("\\", "/").replace("/", " ").split() if term]
+
+def name_score(term: str, name: str, term_grams=None):
+    """How well a lowercased file/directory name matches term: 1.0 for the name itself,
+    then the name without its extension, a prefix, a substring, and below 0.6 a fuzzy
+    match sharing at least FUZZY_MIN of term's trigrams. 0.0 for no match."""
+    score = _substring_score(term, name, ".")
+    if score:
+        return score
+    if term_grams is None:
+        term_grams = trigrams(term)
+    if not term_grams:
+        return 0.0
+    shared = len(term_grams & trigrams(name)) / len(term_grams)
+    return 0.6 * shared if shared >= FUZZY_MIN else 0.0
+
+def _substring_score(term, name, dot):
+    """The exact tiers of name_score(), for str or (index) bytes."""
+    if name == term:
+        return 1.0
+    if name.startswith(term):
+        return 0.95 if name.rfind(dot) == len(term) else 0.9
+    return 0.8 if term in name else 0.0
+
+def _parents_match(terms, directory: str):
+    position = 0
+    for term in terms:
+        position = directory.find(term, position)
+        if position < 0:
+            return False
+        position += len(term)
+    return True
+
+def _split(path: str):
+    path = path.rstrip("/\\") or path
+    cut = max(path.rfind("/"), path.rfind("\\")) + 1
+    return path[:cut].lower(), path[cut:].lower()
+
+# --- FRECENCY ---
+
+def _frecency(rank: float, last: float, now: float):
+    """zoxide-style: visits, weighted up for the last hour/day and down after a week."""
+    age = now - last
+    if age < 3600:
+        return rank * 4
+    if age < 86400:
+        return rank * 2
+    if age < 604800:
+        return rank * 0.5
+    return rank * 0.25
+
+def record_open(path: str, now: float = None):
+    """Counts a visit to path in data/frecency.json ({path: [rank, last visit]})."""
+    path = os.path.abspath(path)
+    now = now or time.time()
+
+    def mutate(data):
+        data = data or {}
+        rank, _last = data.get(path, (0, 0))
+        data[path] = [rank + 1, now]
+        total = sum(rank for rank, _last in data.values())
+        if total > MAX_RANK_TOTAL:
+            scale = 0.9 * MAX_RANK_TOTAL / total
+            data = {p: [rank * scale, last] for p, (rank, last) in data.items() if rank * scale >= 1}
+        return data, None
+    update_json(FRECENCY_FILE, mutate, default={})
+
+def forget(path: str):
+    """Drops path from the frecency list. Returns False if it was not there."""
+    path = os.path.abspath(path)
+
+    def mutate(data):
+        if not data or path not in data:
+            return None, False
+        del data[path]
+        return data, True
+    return update_json(FRECENCY_FILE, mutate, default={})
+
+def frecent(now: float = None):
+    """[(path, frecency)] most frecent first."""
+    now = now or time.time()
+    data = read_json(FRECENCY_FILE, {}) or {}
+    rows = [(path, _frecency(rank, last, now)) for path, (rank, last) in data.items()]
+    rows.sort(key=lambda row: row[1], reverse=True)
+    return rows
+
+def _bonus(frecency: float):
+    return min(FRECENCY_WEIGHT, 0.05 * math.log2(1 + frecency)) if frecency else 0.0
+
+# --- PATH INDEX ---
+
+def build_index(roots, path: str = PATH_INDEX_FILE):
+    """Indexes every file and directory below roots, skipping SKIP_DIRS and symlinked
+    directories. Returns the number of paths."""
+    found = set()
+    for root in roots:
+        root = os.path.abspath(os.path.expanduser(root))
+        stack = [root]
+        found.add(root)
+        while stack:
+            check_cancelled()
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name in SKIP_DIRS:
+                    continue
+                found.add(entry.path)
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                except OSError:
+                    pass
+    return write_index(found, path)
+
+def write_index(paths, path: str = PATH_INDEX_FILE):
+    """Writes absolute paths into one index file of flat arrays:
+
+        header | path offsets, name offsets, posting offsets (u64) | trigram keys (u32,
+        sorted) | postings (u32 path numbers) | lowercased names | paths (sorted, UTF-8)
+
+    Path i is paths[path_offset[i]:path_offset[i + 1]], likewise for its name; the
+    paths whose name contains trigram keys[k] are postings[posting_offset[k]:
+    posting_offset[k + 1]]. Keys from FIRST_KEY up list the names starting with a
+    trigram. Paths are numbered by name length (then path), so every
+    postings list starts with the shortest names. Returns the number of paths.
+    """
+    paths = sorted(paths, key=lambda full: (len(_split(full)[1]), full))
+    path_offsets, name_offsets = array("Q", [0]), array("Q", [0])
+    postings = {}
+    encoded, names = [], []
+    path_end = name_end = 0
+    for number, full in enumerate(paths):
+        if number % 65536 == 0:
+            check_cancelled()
+        data = full.encode("utf-8", "surrogateescape")
+        name = _split(full)[1].encode("utf-8", "surrogateescape")
+        encoded.append(data)
+        names.append(name)
+        path_end += len(data)
+        name_end += len(name)
+        path_offsets.append(path_end)
+        name_offsets.append(name_end)
+        name_keys = _grams(name)
+        if name_keys:
+            name_keys.add(_first_key(name))
+        for key in name_keys:
+            bucket = postings.get(key)
+            if bucket is None:
+                postings[key] = array("I", [number])
+            else:
+                bucket.append(number)
+    keys = array("I", sorted(postings))
+    posting_offsets, flat = array("Q", [0]), array("I")
+    for key in keys:
+        flat.extend(postings[key])
+        posting_offsets.append(len(flat))
+    header = INDEX_HEADER.pack(INDEX_MAGIC, len(paths), len(keys), len(flat), time.time())
+    data = b"".join((header, path_offsets.tobytes(), name_offsets.tobytes(), posting_offsets.tobytes(),
+                     keys.tobytes(), flat.tobytes(), b"".join(names), b"".join(encoded)))
+    with _load_lock:
+        loaded = _loaded.pop(os.path.abspath(path), None)
+        if loaded is not None and os.name == "nt":
+            loaded.close()  # Windows cannot replace a mapped file; elsewhere searches still using it keep it
+        # Derived from the filesystem and rebuilt with `open --index`, so never fsynced.
+        atomic_write(path, data, fsync="none")
+    return len(paths)
+
+class PathIndex:
+    """Read-only view of a file written by write_index(), memory-mapped so opening it
+    costs the same for 1 or 1M paths."""
+
+    def __init__(self, path: str = PATH_INDEX_FILE):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, key_count, posting_count, self.built_at = INDEX_HEADER.unpack_from(self._map)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"Not a path index (or built on another platform): {path}. Rebuild it with `open --index`.")
+        self._view = memoryview(self._map)
+        start = INDEX_HEADER.size
+
+        def section(length, fmt):
+            nonlocal start
+            part = self._view[start:start + length].cast(fmt)
+            start += length
+            return part
+        self._path_offsets = section((self.count + 1) * 8, "Q")
+        self._name_offsets = section((self.count + 1) * 8, "Q")
+        self._posting_offsets = section((key_count + 1) * 8, "Q")
+        self._keys = section(key_count * 4, "I")
+        self._postings = section(posting_count * 4, "I")
+        self._names_start = start
+        self._paths_start = start + self._name_offsets[self.count]
+        self.mtime = os.stat(path).st_mtime_ns
+
+    def __len__(self):
+        return self.count
+
+    def path(self, number: int):
+        start = self._paths_start
+        return self._map[start + self._path_offsets[number]:start + self._path_offsets[number + 1]].decode("utf-8", "surrogateescape")
+
+    def name(self, number: int):
+        """The lowercased name, as UTF-8 bytes."""
+        start = self._names_start
+        return self._map[start + self._name_offsets[number]:start + self._name_offsets[number + 1]]
+
+    def postings(self, key: int):
+        i = bisect.bisect_left(self._keys, key)
+        if i == len(self._keys) or self._keys[i] != key:
+            return self._postings[0:0]
+        return self._postings[self._posting_offsets[i]:self._posting_offsets[i + 1]]
+
+    def search(self, terms, limit: int):
+        """[(score, path)] best first for _terms(query); needs a last term of 3+ bytes.
+
+        Postings are in number order, so every scan below meets the shortest names
+        first and stops as soon as the next name cannot make the results: a name that
+        contains the term has all of its trigrams (and starts with its first three
+        bytes if it is a prefix), so it is in the rarest of those keys' postings, and
+        only the names that really match, with matching directories, count towards
+        `limit`. Names are scanned from the first one long enough to hold the term.
+        """
+        term = terms[-1].encode("utf-8", "surrogateescape")
+        grams = _grams(term)
+        if not grams:
+            return []
+        names, offsets, start = self._map, self._name_offsets, self._names_start
+        parents, length = terms[:-1], len(term)
+        first_key = _first_key(term)
+        found = set()
+        exact, stem, prefix, inner = [], [], [], []
+
+        def fits(number):
+            return not parents or _parents_match(parents, _split(self.path(number))[0])
+
+        # _substring_score()'s tiers, inlined: these loops are most of a lookup.
+        last = None
+        for number in self._scan(grams | {first_key}, self._from_length(length)):
+            candidate = names[start + offsets[number]:start + offsets[number + 1]]
+            if not candidate.startswith(term) or not fits(number):
+                continue
+            if candidate == term:
+                exact.append(number)
+            elif candidate.rfind(b".") == length:
+                stem.append(number)
+            else:
+                prefix.append(number)
+            if len(exact) + len(stem) + len(prefix) >= limit:
+                last = number
+                break
+        if last is not None and len(exact) + len(stem) < limit:
+            # Longer names can still beat the prefixes found so far if they are the
+            # term plus an extension; those contain the term and its dot.
+            for number in self._scan(_grams(term + b".") | {first_key}, last + 1):
+                candidate = names[start + offsets[number]:start + offsets[number + 1]]
+                if candidate.startswith(term) and candidate.rfind(b".") == length and fits(number):
+                    stem.append(number)
+                    if len(exact) + len(stem) >= limit:
+                        break
+        found.update(exact, stem, prefix)
+        if len(found) < limit:
+            for number in self._scan(grams, self._from_length(length + 1)):
+                candidate = names[start + offsets[number]:start + offsets[number + 1]]
+                if term in candidate and not candidate.startswith(term) and fits(number):
+                    inner.append(number)
+                    if len(found) + len(inner) >= limit:
+                        break
+            found.update(inner)
+        ranked = [(1.0, n) for n in exact] + [(0.95, n) for n in stem] + [(0.9, n) for n in prefix] + [(0.8, n) for n in inner]
+        if len(ranked) < limit:
+            ranked += self._fuzzy(grams, found, fits, limit - len(ranked))
+        return [(score, self.path(number)) for score, number in ranked[:limit]]
+
+    def _fuzzy(self, grams, found, fits, limit: int):
+        """[(score, number)] best first of the names outside found that share at least
+        FUZZY_MIN of the term's trigrams (grams).
+
+        Such a name is in all but (1 - FUZZY_MIN) of the postings, so in at least
+        `needed` of the rarest `used` ones; those are counted together (at most
+        MAX_FUZZY_POSTINGS numbers, so very common trigrams are left out) and only the
+        names counted often enough are checked for the other trigrams, most counted
+        first, until no unchecked name could still make the results (or after
+        MAX_FUZZY_CANDIDATES).
+        """
+        pieces = sorted(((self.postings(key), key.to_bytes(3, "big")) for key in grams),
+                        key=lambda item: len(item[0]))
+        lists = [postings for postings, _piece in pieces]
+        required = math.ceil(len(lists) * FUZZY_MIN)
+        used, total = len(lists) - required + 1, sum(len(postings) for postings in lists[:len(lists) - required + 1])
+        while used < len(lists) and total + len(lists[used]) <= MAX_FUZZY_POSTINGS:
+            total += len(lists[used])
+            used += 1
+        needed = required - (len(lists) - used)
+        end = self.count
+        if total > MAX_FUZZY_POSTINGS:
+            # Even the fewest lists that must be counted are too long: count the same
+            # leading (shortest) stretch of each.
+            low, high = 0, self.count
+            while low < high:
+                middle = (low + high + 1) // 2
+                if sum(bisect.bisect_left(postings, middle) for postings in lists[:used]) <= MAX_FUZZY_POSTINGS:
+                    low = middle
+                else:
+                    high = middle - 1
+            end = low
+        counts = Counter()
+        for postings in lists[:used]:
+            counts.update(postings[:bisect.bisect_left(postings, end)])
+        candidates = sorted((-count, number) for number, count in counts.items() if count >= needed and number not in found)
+        uncounted = [piece for _postings, piece in pieces[used:]]
+        best = []  # (-shared, number), kept sorted
+        for negative, number in candidates[:MAX_FUZZY_CANDIDATES]:
+            if len(best) >= limit and negative - len(uncounted) > best[limit - 1][0]:
+                break  # even sharing every unchecked trigram would not do
+            shared = -negative
+            if uncounted:
+                shared += sum(map(self.name(number).__contains__, uncounted))
+            if shared >= required and fits(number):
+                bisect.insort(best, (-shared, number))
+        return [(-0.6 * negative / len(lists), number) for negative, number in best[:limit]]
+
+    def _from_length(self, length: int):
+        """The first path number whose name is at least length bytes long."""
+        offsets, low, high = self._name_offsets, 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if offsets[middle + 1] - offsets[middle] < length:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _scan(self, keys, first: int):
+        """Path numbers from first on in the shortest of keys' postings, in order."""
+        postings = min((self.postings(key) for key in keys), key=len)
+        for chunk in range(bisect.bisect_left(postings, first), len(postings), SCAN_CHUNK):
+            yield from postings[chunk:chunk + SCAN_CHUNK].tolist()
+
+    def close(self):
+        for part in (self._path_offsets, self._name_offsets, self._posting_offsets, self._keys, self._postings, self._view):
+            part.release()
+        self._map.close()
+
+_loaded = {}  # path -> PathIndex, reopened when the file is rebuilt
+_load_lock = threading.Lock()
+
+def load_index(path: str = PATH_INDEX_FILE):
+    """The PathIndex in path, or None if it has not been built."""
+    key = os.path.abspath(path)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _load_lock:
+        index = _loaded.get(key)
+        if index is None or index.mtime != mtime:
+            index = _loaded[key] = PathIndex(path)
+        return index
+
+# --- SEARCH ---
+
+def search(query: str, limit: int = 10, index_path: str = PATH_INDEX_FILE, now: float = None):
+    """[Match] best first: frecent paths and, for names of 3+ characters, the path index.
+    Frecent paths get up to FRECENCY_WEIGHT on top of their match score."""
+    terms = _terms(query)
+    if not terms:
+        return []
+    term = terms[-1]
+    term_grams = trigrams(term)
+    frecencies = dict(frecent(now))
+    best = {}
+    for path, frecency in frecencies.items():
+        directory, name = _split(path)
+        score = name_score(term, name, term_grams)
+        if score and _parents_match(terms[:-1], directory):
+            best[path] = Match(path, score + _bonus(frecency), "recent")
+    index = load_index(index_path) if term_grams else None
+    if index is not None:
+        for score, path in index.search(terms, limit + len(best)):
+            if path not in best:
+                best[path] = Match(path, score + _bonus(frecencies.get(path, 0)), "index")
+    matches = sorted(best.values(), key=lambda match: (-match.score, len(match.path)))
+    return matches[:limit]
@@ -0,0 +1,197 @@
+import itertools
+import re
+import sys
+import threading
+from collections import deque
+
+from rich.console import Console
+from rich.text import Text
+
+from jobs import captured_output
+from jsontools import dump_value
+
+class PipelineError(ValueError):
+    """A pipeline that cannot be built, e.g. a stage that does not read piped input."""
+
+# --- COMMAND STATUS ---
+
+_status = threading.local()
+
+class StatusConsole(Console):
+    """Console that remembers whether the running command reported an error, so `&&`
+    can stop a chain. Handlers report failures by printing a `[bold red]` message."""
+
+    def print(self, *objects, **kwargs):
+        if objects and isinstance(objects[0], str) and objects[0].lstrip().startswith("[bold red]"):
+            _status.failed = True
+        super().print(*objects, **kwargs)
+
+def reset_status():
+    _status.failed = False
+
+def mark_failed():
+    """For handlers whose output must stay machine-readable (no red message to print)."""
+    _status.failed = True
+
+def command_failed():
+    return getattr(_status, "failed", False)
+
+console = StatusConsole()
+
+# --- SPLITTING ---
+
+def _split_unquoted(line: str, operators):
+    """Splits on operators outside quotes. Returns [(operator_before, segment)]."""
+    parts = []
+    current = []
+    quote = None
+    before = None
+    i = 0
+    while i < len(line):
+        ch = line[i]
+        if quote:
+            if ch == quote:
+                quote = None
+            current.append(ch)
+            i += 1
+            continue
+        if ch in "\"'":
+            quote = ch
+            current.append(ch)
+            i += 1
+            continue
+        op = next((op for op in operators if line.startswith(op, i)), None)
+        if op:
+            parts.append((before, "".join(current).strip()))
+            before = op
+            current = []
+            i += len(op)
+            continue
+        current.append(ch)
+        i += 1
+    parts.append((before, "".join(current).strip()))
+    return parts
+
+def split_chain(line: str):
+    """'a | b && c ; d' -> [(None, 'a | b'), ('&&', 'c'), (';', 'd')]"""
+    parts = _split_unquoted(line, ("&&", ";"))
+    # A trailing `;` is allowed; an empty command anywhere else is not.
+    if any(not segment for _op, segment in parts[:-1]) or (parts[-1][0] == "&&" and not parts[-1][1]):
+        raise PipelineError("Empty command in chain")
+    return [(op, segment) for op, segment in parts if segment]
+
+def split_stages(segment: str):
+    """'a | b | c' -> ['a', 'b', 'c']"""
+    stages = [stage for _op, stage in _split_unquoted(segment, ("|",))]
+    if len(stages) > 1 and not all(stages):
+        raise PipelineError("Empty stage in pipeline")
+    return stages
+
+def has_operators(line: str):
+    return any(len(_split_unquoted(line, (op,))) > 1 for op in ("|", ";", "&&"))
+
+# --- RUNNING ---
+
+def iter_pipeline(stages):
+    """Chains stage functions and returns the final iterator without consuming it."""
+    upstream = None
+    for _name, stage_fn, args in stages:
+        upstream = stage_fn(args, upstream)
+    return upstream
+
+def run_pipeline(stages):
+    """stages: [(name, stage_fn, args)]. Each stage_fn(args, upstream) returns an iterator;
+    upstream is the previous stage's iterator (None for the first). Values flow lazily,
+    so a stage that stops early (head) stops everything before it."""
+    upstream = iter_pipeline(stages)
+    try:
+        for value in upstream:
+            render_value(value)
+    finally:
+        close = getattr(upstream, "close", None)
+        if close:
+            close()
+
+def render_value(value):
+    """Prints a value at the end of a pipeline: text as-is, structures as JSON."""
+    if isinstance(value, str):
+        text = value
+    elif isinstance(value, bytes):
+        text = value.decode("utf-8", errors="replace")
+    else:
+        text = dump_value(value, indent=2)
+    sys.stdout.write(text if text.endswith("\n") else text + "\n")
+
+def as_text(value):
+    """Text form of a value for stages that work on strings."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return dump_value(value, indent=0)
+
+def values_or_args(args, upstream):
+    """Upstream values, or the joined args as one value when the stage starts a pipeline."""
+    if upstream is not None:
+        return upstream
+    text = " ".join(args)
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+        text = text[1:-1]
+    return iter([text] if text else [])
+
+# --- GENERIC STAGES ---
+
+def _count_arg(args, default=10):
+    if not args:
+        return default
+    if not args[0].lstrip("-").isdigit():
+        raise PipelineError(f"Expected a number, got '{args[0]}'")
+    return abs(int(args[0]))
+
+def _require_upstream(name, upstream):
+    if upstream is None:
+        raise PipelineError(f"'{name}' reads piped input, e.g. `file search *.py | {name}`")
+
+def stage_head(args, upstream):
+    _require_upstream("head", upstream)
+    return itertools.islice(upstream, _count_arg(args))
+
+def stage_tail(args, upstream):
+    _require_upstream("tail", upstream)
+    count = _count_arg(args)
+    yield from deque(upstream, maxlen=count)
+
+def stage_count(_args, upstream):
+    _require_upstream("count", upstream)
+    yield sum(1 for _ in upstream)
+
+def stage_grep(args, upstream):
+    _require_upstream("grep", upstream)
+    if not args:
+        raise PipelineError("Usage: ... | grep <regex> [-i] [-v]")
+    invert = "-v" in args
+    flags = re.IGNORECASE if "-i" in args else 0
+    pattern = re.compile(" ".join(a for a in args if a not in ("-i", "-v")).strip('"'), flags)
+    return (value for value in upstream if bool(pattern.search(as_text(value))) != invert)
+
+BUILTIN_STAGES = {
+    "head": stage_head,
+    "tail": stage_tail,
+    "count": stage_count,
+    "grep": stage_grep,
+}
+
+def text_stage(handler):
+    """Adapts a handler that only prints: at the head of a pipeline it yields the lines of
+    its output as plain text."""
+    def stage(args, _upstream):
+        with captured_output() as buffer:
+            handler(args)
+        yield from Text.from_ansi(buffer.getvalue()).plain.splitlines()
+    return stage
+
+def pipe_only(name: str):
+    """Handler used when a pipeline-only stage is run on its own."""
+    def handler(_args):
+        console.print(f"[bold red] '{name}' reads piped input, e.g. file search \"*.py\" | {name}[/bold red]")
+    return handler
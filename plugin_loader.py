@@ -0,0 +1,155 @@
+import ast
+import importlib.util
+import os
+import sys
+
+from registry import CommandSpec
+from storage import read_json, update_json
+
+# --- CONSTANTS ---
+PLUGIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plugins")
+PLUGIN_PACKAGE = "plugins"
+MANIFEST_FILE = "data/plugins.json"
+MANIFEST_VERSION = 1
+ENTRY_POINT_GROUP = "assistant.plugins"
+DIST_INFO_SUFFIXES = (".dist-info", ".egg-info")
+DECLARATION_KEYS = {"name", "handler", "help", "example", "category", "aliases", "subcommands",
+                    "usage", "requires", "stage"}
+
+# Problems from the last load_plugins() call, shown by the `plugins` command
+PROBLEMS = []
+
+# --- DECLARATIONS ---
+
+def read_declarations(path: str):
+    """Returns the literal `COMMANDS = [...]` list of a plugin file without importing it."""
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "COMMANDS" for t in node.targets):
+            commands = ast.literal_eval(node.value)
+            break
+    else:
+        raise ValueError("no COMMANDS list")
+    for entry in commands:
+        if not isinstance(entry, dict) or not isinstance(entry.get("name"), str) or not isinstance(entry.get("handler"), str):
+            raise ValueError("each COMMANDS entry needs a 'name' and a 'handler' (function name)")
+        unknown = set(entry) - DECLARATION_KEYS
+        if unknown:
+            raise ValueError(f"unknown keys for '{entry['name']}': {', '.join(sorted(unknown))}")
+    return commands
+
+def _file_sources(plugin_dir: str):
+    """{source_key: (signature, module, path)} for plugins/*.py."""
+    sources = {}
+    try:
+        entries = sorted(os.scandir(plugin_dir), key=lambda e: e.name)
+    except FileNotFoundError:
+        return sources
+    for entry in entries:
+        if entry.name.endswith(".py") and not entry.name.startswith("_") and entry.is_file():
+            st = entry.stat()
+            stem = entry.name[:-3]
+            sources[f"file:{entry.name}"] = ([st.st_mtime_ns, st.st_size], f"{PLUGIN_PACKAGE}.{stem}", entry.path)
+    return sources
+
+def _holds_distributions(directory: str):
+    if os.path.basename(os.path.normpath(directory)) in ("site-packages", "dist-packages"):
+        return True
+    try:
+        return any(name.endswith(DIST_INFO_SUFFIXES) for name in os.listdir(directory))
+    except OSError:
+        return False
+
+def _path_signature(plugin_dir: str):
+    """mtimes of the sys.path directories holding installed distributions (installing or
+    removing a package changes them) and of plugin_dir. Other sys.path entries, like the
+    project directory, are left out: any file created there would change their mtime."""
+    signature = []
+    for entry in [e for e in sys.path if _holds_distributions(e or ".")] + [plugin_dir]:
+        try:
+            signature.append([entry, os.stat(entry or ".").st_mtime_ns])
+        except OSError:
+            continue
+    return signature
+
+def _scan_entry_points():
+    """{name: [module, path, version]} for installed `assistant.plugins` entry points."""
+    from importlib.metadata import entry_points
+
+    found = {}
+    for ep in entry_points(group=ENTRY_POINT_GROUP):
+        module = ep.value.split(":")[0].strip()
+        dist = getattr(ep, "dist", None)
+        spec = importlib.util.find_spec(module)
+        path = spec.origin if spec and spec.origin and spec.origin.endswith(".py") else None
+        found[ep.name] = [module, path, f"{dist.name}=={dist.version}" if dist else ""]
+    return found
+
+def _entry_point_sources(manifest, plugin_dir: str):
+    """{source_key: (signature, module, path)} for entry points, plus the scan to cache.
+    Scanning installed distributions is the slow part, so it is redone only when a
+    directory in _path_signature() changed."""
+    path_signature = _path_signature(plugin_dir)
+    cached = manifest.get("entry_points") if manifest else None
+    if cached and cached.get("path_signature") == path_signature:
+        found = cached["found"]
+    else:
+        found = _scan_entry_points()
+    sources = {}
+    for name, (module, path, version) in found.items():
+        try:
+            mtime = os.stat(path).st_mtime_ns if path else 0
+        except OSError:
+            mtime = 0
+        sources[f"entry-point:{name}"] = ([version, mtime], module, path)
+    return sources, {"path_signature": path_signature, "found": found}
+
+# --- DISCOVERY ---
+
+def discover(plugin_dir: str = PLUGIN_DIR, manifest_path: str = MANIFEST_FILE):
+    """Returns ([CommandSpec], problems) for every plugin command.
+
+    Declarations are cached in data/plugins.json keyed by file mtime/size (or package
+    version), so an unchanged plugin is neither parsed nor imported at startup; a changed
+    one is re-read with `ast` only. Modules are imported when a command first runs.
+    """
+    manifest = read_json(manifest_path, default=None)
+    if not manifest or manifest.get("version") != MANIFEST_VERSION:
+        manifest = {}
+    cached = manifest.get("sources", {})
+    sources = _file_sources(plugin_dir)
+    entry_sources, entry_scan = _entry_point_sources(manifest, plugin_dir)
+    sources.update(entry_sources)
+
+    fresh, problems, specs = {}, [], []
+    for key, (signature, module, path) in sources.items():
+        entry = cached.get(key)
+        if not entry or entry.get("signature") != signature or entry.get("module") != module:
+            try:
+                if path is None:
+                    raise ValueError("plugin must be a .py source file")
+                entry = {"signature": signature, "module": module, "commands": read_declarations(path)}
+            except (OSError, SyntaxError, ValueError) as e:
+                problems.append(f"{key}: {e}")
+                continue
+        fresh[key] = entry
+        for declaration in entry["commands"]:
+            specs.append(CommandSpec(module=module, source=key, **declaration))
+
+    if fresh != cached or entry_scan != manifest.get("entry_points"):
+        new_manifest = {"version": MANIFEST_VERSION, "sources": fresh, "entry_points": entry_scan}
+        update_json(manifest_path, lambda _old: (new_manifest, None))
+    return specs, problems
+
+def load_plugins(registry, plugin_dir: str = PLUGIN_DIR, manifest_path: str = MANIFEST_FILE):
+    """Adds discovered plugin commands to `registry`. Returns a list of problems
+    (unreadable plugins, names that clash with existing commands)."""
+    specs, problems = discover(plugin_dir, manifest_path)
+    for spec in specs:
+        try:
+            registry.add(spec)
+        except ValueError as e:
+            problems.append(f"{spec.source}: {e}")
+    PROBLEMS[:] = problems
+    return problems
@@ -0,0 +1 @@
+"""Plugin commands. See uptime.py for the layout a plugin module uses."""
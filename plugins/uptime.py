@@ -0,0 +1,42 @@
+"""Example plugin: how long the system has been up.
+
+A plugin declares its commands in a literal COMMANDS list. The list is read (with `ast`,
+without importing this module) into data/plugins.json, and the module is imported the
+first time one of its commands runs. Keys: name, handler, and optionally help, example,
+category, aliases, subcommands, usage, requires (modules that must be installed) and
+stage (a pipeline stage(args, upstream) function).
+"""
+import time
+from datetime import datetime
+
+import psutil
+
+from pipeline import console
+
+COMMANDS = [
+    {
+        "name": "uptime",
+        "handler": "cmd_uptime",
+        "stage": "stage_uptime",
+        "help": "Show how long the system has been running",
+        "example": "uptime",
+        "category": "System Information",
+        "requires": ["psutil"],
+    },
+]
+
+def _format_duration(seconds: int):
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes = seconds // 60
+    return (f"{days}d " if days else "") + f"{hours}h {minutes}m"
+
+def cmd_uptime(_args):
+    boot = psutil.boot_time()
+    console.print(f"[bold green] Up {_format_duration(int(time.time() - boot))} "
+                  f"(since {datetime.fromtimestamp(boot):%Y-%m-%d %H:%M})[/bold green]")
+    return None
+
+def stage_uptime(_args, _upstream):
+    boot = psutil.boot_time()
+    yield {"boot_time": datetime.fromtimestamp(boot).isoformat(timespec="seconds"), "seconds": int(time.time() - boot)}
@@ -0,0 +1,120 @@
+import cProfile
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+# --- CONSTANTS ---
+PROFILE_DIR = "data/profiles"
+DEFAULT_INTERVAL = 0.005  # seconds between samples
+SORT_KEYS = ("cumulative", "self", "calls")
+
+def _label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+# --- SAMPLING ---
+
+class SamplingProfiler:
+    """Samples one thread's stack from a background thread with sys._current_frames().
+
+    Unlike cProfile it adds no per-call overhead, so timings of call-heavy code stay
+    realistic, and it sees time spent blocked in I/O or sleeping. Stacks are cut at the
+    frame that started profiling, so the REPL's own frames do not show up.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()  # (root, ..., leaf) labels -> samples
+        self.samples = 0
+        self.ticks = 0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+        self._base = None
+
+    def run(self, fn, *args):
+        """Calls fn(*args) in this thread while sampling it. Returns fn's result."""
+        self._target = threading.get_ident()
+        self._base = sys._getframe()
+        self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        started = time.perf_counter()
+        self._thread.start()
+        try:
+            return fn(*args)
+        finally:
+            self._stop.set()
+            self._thread.join()
+            self.elapsed = time.perf_counter() - started
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.ticks += 1
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None and frame is not self._base:
+                stack.append(_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+
+    def top(self, limit: int, sort: str = "cumulative"):
+        """[(function, self_seconds, cumulative_seconds, samples)] estimated from sample counts."""
+        inclusive, exclusive = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            exclusive[stack[-1]] += count
+            for label in set(stack):  # recursion counts once per sample
+                inclusive[label] += count
+        key = exclusive.__getitem__ if sort == "self" else inclusive.__getitem__
+        rows = sorted(inclusive, key=key, reverse=True)[:limit]
+        # Waking up takes longer than `interval`, so scale by the measured time per tick
+        per_sample = self.elapsed / self.ticks if self.ticks else self.interval
+        return [(label, exclusive[label] * per_sample, inclusive[label] * per_sample, inclusive[label])
+                for label in rows]
+
+    def write_collapsed(self, path: str):
+        """Brendan Gregg's collapsed-stack format (`root;child;leaf count`), readable by
+        flamegraph.pl, speedscope and inferno."""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(";".join(label.replace(";", ":") for label in stack) + f" {count}\n")
+
+# --- CPROFILE ---
+
+class DeterministicProfiler:
+    """cProfile around one call: exact call counts, but adds overhead to every call."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def run(self, fn, *args):
+        return self.profile.runcall(fn, *args)
+
+    def top(self, limit: int, sort: str = "cumulative"):
+        """[(function, self_seconds, cumulative_seconds, calls)] for the top `limit` functions."""
+        stats = pstats.Stats(self.profile).stats
+        index = {"self": 2, "calls": 1}.get(sort, 3)
+        rows = sorted(stats.items(), key=lambda item: item[1][index], reverse=True)
+        top = []
+        for (filename, line, name), (_prim, calls, self_time, cumulative, _callers) in rows:
+            if name == "<method 'disable' of '_lsprof.Profiler' objects>":
+                continue
+            label = name if filename == "~" else f"{name} ({os.path.basename(filename)}:{line})"
+            top.append((label, self_time, cumulative, calls))
+            if len(top) == limit:
+                break
+        return top
+
+    def write_pstats(self, path: str):
+        """Binary stats for `python -m pstats`, snakeviz or gprof2dot."""
+        self.profile.dump_stats(path)
+
+def profile_path(command: str, extension: str, directory: str = PROFILE_DIR):
+    """data/profiles/20250101-120000-<command>.<extension>"""
+    os.makedirs(directory, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "-", command).strip("-")[:40] or "command"
+    return os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}.{extension}")
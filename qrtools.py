@@ -0,0 +1,243 @@
+import csv
+import hashlib
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import qrcode
+from qrcode.constants import ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q, ERROR_CORRECT_H
+
+# --- CONSTANTS ---
+QR_CACHE_DIR = "data/qr_cache"
+MAX_CACHE_ENTRIES = 5000  # rendered codes kept; past this the least recently used are deleted
+QR_FORMATS = {"png": ".png", "svg": ".svg", "ascii": ".txt"}
+EC_LEVELS = {"L": ERROR_CORRECT_L, "M": ERROR_CORRECT_M, "Q": ERROR_CORRECT_Q, "H": ERROR_CORRECT_H}
+DEFAULT_BOX_SIZE = 10
+DEFAULT_BORDER = 5
+
+# One encoder per option set per process; QRCode.clear() resets it between payloads.
+_encoders = {}
+
+# --- ENCODING ---
+
+def check_options(fmt: str, ec: str, mask=None):
+    if fmt not in QR_FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}'. Use: {', '.join(QR_FORMATS)}")
+    if ec not in EC_LEVELS:
+        raise ValueError(f"Unknown error correction level '{ec}'. Use: L, M, Q, H")
+    if mask is not None and not 0 <= mask <= 7:
+        raise ValueError("Mask pattern must be between 0 and 7.")
+
+def _matrix(text: str, ec: str, box_size: int, border: int, mask=None):
+    key = (ec, box_size, border, mask)
+    qr = _encoders.get(key)
+    if qr is None:
+        # A fixed mask skips qrcode's 8-way penalty search, which dominates encode time.
+        qr = _encoders[key] = qrcode.QRCode(version=None, error_correction=EC_LEVELS[ec], box_size=box_size,
+                                            border=border, mask_pattern=mask)
+    qr.clear()
+    qr.add_data(text)
+    qr.make(fit=True)
+    return qr, qr.get_matrix()  # includes the quiet-zone border
+
+def render_svg(matrix, box_size: int):
+    """One <path> of horizontal runs; no Pillow involved."""
+    size = len(matrix)
+    parts = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if row[x]:
+                start = x
+                while x < size and row[x]:
+                    x += 1
+                parts.append(f"M{start},{y}h{x - start}v1h-{x - start}z")
+            else:
+                x += 1
+    pixels = size * box_size
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixels}" height="{pixels}" '
+        f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="100%" height="100%" fill="#fff"/>'
+        f'<path fill="#000" d="{"".join(parts)}"/></svg>\n'
+    )
+
+def render_ascii(matrix):
+    """Two module rows per text line using half blocks; light modules are drawn so the
+    code scans on dark terminals. No Pillow involved."""
+    blocks = {(False, False): "█", (False, True): "▀", (True, False): "▄", (True, True): " "}
+    rows = [list(r) for r in matrix]
+    if len(rows) % 2:
+        rows.append([False] * len(rows[0]))
+    lines = []
+    for top, bottom in zip(rows[0::2], rows[1::2]):
+        lines.append("".join(blocks[(t, b)] for t, b in zip(top, bottom)))
+    return "\n".join(lines) + "\n"
+
+def render_qr(text: str, fmt: str = "png", ec: str = "M", box_size: int = DEFAULT_BOX_SIZE,
+              border: int = DEFAULT_BORDER, mask=None):
+    """Returns the encoded QR code as bytes in the requested format."""
+    check_options(fmt, ec, mask)
+    qr, matrix = _matrix(text, ec, box_size, border, mask)
+    if fmt == "svg":
+        return render_svg(matrix, box_size).encode("utf-8")
+    if fmt == "ascii":
+        return render_ascii(matrix).encode("utf-8")
+    import io
+    buf = io.BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buf, format="PNG")
+    return buf.getvalue()
+
+# --- CONTENT-HASH CACHE ---
+
+def payload_key(text: str, fmt: str, ec: str, box_size: int, border: int, mask=None):
+    """Stable name for a rendered code; identical payload + options map to one file."""
+    h = hashlib.sha256(f"{fmt}\0{ec}\0{box_size}\0{border}\0{mask}\0{text}".encode("utf-8")).hexdigest()
+    return h[:24]
+
+def _cache_path(key: str, fmt: str, cache_dir: str):
+    return os.path.join(cache_dir, key + QR_FORMATS[fmt])
+
+def _touch(path: str):
+    """Marks a cache entry as used, for trim_cache()."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def trim_cache(cache_dir: str = QR_CACHE_DIR, max_entries: int = MAX_CACHE_ENTRIES):
+    """Deletes the least recently used renders (by mtime) down to 90% of max_entries once
+    there are more than max_entries. Returns the number deleted."""
+    names = [name for name in os.listdir(cache_dir) if not name.endswith(".tmp")]  # .tmp: still being written
+    if len(names) <= max_entries:
+        return 0  # the common case, answered without a stat() per entry
+    entries = []
+    for name in names:
+        path = os.path.join(cache_dir, name)
+        try:
+            entries.append((os.stat(path).st_mtime_ns, path))
+        except FileNotFoundError:
+            pass
+    entries.sort()
+    removed = 0
+    for _mtime, path in entries[:len(entries) - max_entries * 9 // 10]:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass  # trimmed by another process
+    return removed
+
+def _render_to_cache(job):
+    text, fmt, ec, box_size, border, mask, path = job
+    data = render_qr(text, fmt, ec, box_size, border, mask)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)  # atomic, so concurrent batches never see half-written files
+    return path
+
+def generate_cached(text: str, fmt: str = "png", ec: str = "M", box_size: int = DEFAULT_BOX_SIZE,
+                    border: int = DEFAULT_BORDER, mask=None, cache_dir: str = QR_CACHE_DIR):
+    """Returns (cache_path, hit). Encodes only when the payload has not been seen before."""
+    check_options(fmt, ec, mask)
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(payload_key(text, fmt, ec, box_size, border, mask), fmt, cache_dir)
+    if os.path.exists(path):
+        _touch(path)
+        return path, True
+    _render_to_cache((text, fmt, ec, box_size, border, mask, path))
+    trim_cache(cache_dir)
+    return path, False
+
+def place_output(cached: str, dest: str):
+    """Copies a cached render to its output path. Not a hard link: editing the output in
+    place would then change the cache entry every later identical request is served from."""
+    if os.path.abspath(cached) == os.path.abspath(dest):
+        return
+    if os.path.exists(dest):
+        os.remove(dest)  # it may be a link to a cache entry made by an older version
+    shutil.copyfile(cached, dest)
+
+# --- BATCH ---
+
+def read_batch_csv(path: str):
+    """Reads rows of `text[,name]`; a header row with a 'text' column is honoured."""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        rows = [r for r in csv.reader(f) if r and any(cell.strip() for cell in r)]
+    if not rows:
+        return []
+    header = [c.strip().lower() for c in rows[0]]
+    if "text" in header:
+        text_col = header.index("text")
+        name_col = header.index("name") if "name" in header else None
+        rows = rows[1:]
+    else:
+        text_col, name_col = 0, 1
+    items = []
+    for row in rows:
+        name = row[name_col].strip() if name_col is not None and name_col < len(row) else ""
+        items.append((row[text_col], name))
+    return items
+
+def _safe_name(name: str):
+    cleaned = "".join(c if c.isalnum() or c in "-_." else "_" for c in name).strip("._")
+    return cleaned[:100]
+
+def generate_batch(items, out_dir: str, fmt: str = "png", ec: str = "M", box_size: int = DEFAULT_BOX_SIZE,
+                   border: int = DEFAULT_BORDER, mask=None, workers: int = None, cache_dir: str = QR_CACHE_DIR):
+    """Generates one file per (text, name) item. Unique, uncached payloads are encoded in a
+    process pool; everything else is copied from the cache. A name already used by a
+    different code gets a -2, -3, ... suffix (counted in "renamed"). Returns a stats dict."""
+    check_options(fmt, ec, mask)
+    start = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    placements = []
+    pending = {}
+    placed = {}  # lowercased file name -> cached render (names clash on case-insensitive disks)
+    hits = renamed = 0
+    for text, name in items:
+        key = payload_key(text, fmt, ec, box_size, border, mask)
+        cached = _cache_path(key, fmt, cache_dir)
+        base = _safe_name(name) or key
+        filename, n = base, 2
+        while placed.get(filename.lower(), cached) != cached:  # another code already has this name
+            filename, n = f"{base}-{n}", n + 1
+        renamed += filename != base
+        if filename.lower() not in placed:
+            placed[filename.lower()] = cached
+            placements.append((cached, os.path.join(out_dir, filename + QR_FORMATS[fmt])))
+        if cached in pending:
+            hits += 1
+        elif os.path.exists(cached):
+            _touch(cached)
+            hits += 1
+        else:
+            pending[cached] = (text, fmt, ec, box_size, border, mask, cached)
+
+    jobs = list(pending.values())
+    workers = workers or os.cpu_count() or 1
+    if len(jobs) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_render_to_cache, jobs, chunksize=max(1, len(jobs) // (workers * 8))))
+    else:
+        for job in jobs:
+            _render_to_cache(job)
+
+    for cached, dest in placements:
+        place_output(cached, dest)
+    if jobs:
+        trim_cache(cache_dir)
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    return {
+        "items": len(items),
+        "encoded": len(jobs),
+        "cache_hits": hits,
+        "renamed": renamed,
+        "seconds": elapsed,
+        "codes_per_second": len(items) / elapsed,
+    }
@@ -0,0 +1,282 @@
+import importlib
+import importlib.util
+import sys
+from collections import defaultdict
+
+# --- CONSTANTS ---
+MAX_SUGGESTION_DISTANCE = 2
+
+class PluginError(RuntimeError):
+    """A command that cannot run: its module fails to import or a dependency is missing."""
+
+# --- COMMAND SPECS ---
+
+class CommandSpec:
+    """A command and the metadata that help, completion and plugin loading use.
+
+    Built-in commands pass their handler(args) and pipeline stage(args, upstream) as
+    callables. Plugin commands pass attribute names in `module` instead; the module is
+    imported the first time the command runs, so listing commands imports nothing.
+    `subcommands` maps each word the handler parses to (description, example), or None
+    when it should only complete with <Tab>.
+    """
+
+    def __init__(self, name, handler=None, help="", example="", category="Other", aliases=(),
+                 subcommands=(), usage=(), requires=(), stage=None, module=None, hidden=False,
+                 source="built-in"):
+        self.name = name.lower()
+        self._handler = handler
+        self._stage = stage
+        self.help = help
+        self.example = example
+        self.category = category
+        self.aliases = tuple(alias.lower() for alias in aliases)
+        if isinstance(subcommands, dict):
+            self.subcommands = {word: tuple(info) if info else None for word, info in subcommands.items()}
+        else:
+            self.subcommands = dict.fromkeys(subcommands)
+        self.usage = [tuple(row) for row in usage]  # extra help rows: (label, description, example)
+        self.requires = tuple(requires)
+        self.module = module
+        self.hidden = hidden
+        self.source = source
+        self._checked = not self.requires
+
+    @property
+    def loaded(self):
+        return self.module is None or self.module in sys.modules
+
+    @property
+    def has_stage(self):
+        return self._stage is not None
+
+    def missing_requirements(self):
+        return [name for name in self.requires if importlib.util.find_spec(name) is None]
+
+    def _resolve(self, target):
+        if not self._checked:
+            missing = self.missing_requirements()
+            if missing:
+                raise PluginError(f"'{self.name}' needs {', '.join(missing)} (pip install {' '.join(missing)})")
+            self._checked = True
+        if callable(target):
+            return target
+        try:
+            return getattr(importlib.import_module(self.module), target)
+        except Exception as e:
+            raise PluginError(f"Cannot load '{self.name}' from {self.module}: {e}") from e
+
+    def __call__(self, args):
+        return self._resolve(self._handler)(args)
+
+    def stage(self, args, upstream):
+        return self._resolve(self._stage)(args, upstream)
+
+    def help_rows(self):
+        """(label, description, example) rows for the help table."""
+        rows = [("/".join((self.name, *self.aliases)), self.help, self.example)] if self.help else []
+        rows += [(f"{self.name} {word}", *info) for word, info in self.subcommands.items() if info]
+        return rows + self.usage
+
+# --- TRIE ---
+
+class _Node:
+    __slots__ = ("children", "handler", "path")
+
+    def __init__(self, path=""):
+        self.children = {}
+        self.handler = None
+        self.path = path
+
+class CommandRegistry:
+    """Commands stored as a trie of lower-cased tokens.
+
+    Nodes with a handler are commands; nodes without one are sub-commands that the parent
+    handler parses itself and that only exist for completion. Resolution walks the tokens
+    once and keeps the deepest handler seen, so `calc history`, `note add` and any deeper
+    paths resolve in a single pass.
+    """
+
+    def __init__(self, specs=()):
+        self._root = _Node()
+        self._index = None
+        self._specs = {}
+        for spec in specs:
+            self.add(spec)
+
+    def add(self, spec: CommandSpec):
+        """Registers a command under its name and aliases, with its sub-commands."""
+        for path in (spec.name, *spec.aliases):
+            if self.handler(path) is not None:
+                raise ValueError(f"'{path}' is already a command")
+        for path in (spec.name, *spec.aliases):
+            self.register(path, spec)
+            for word in spec.subcommands:
+                self.register(f"{path} {word}")
+        self._specs[spec.name] = spec
+
+    def register(self, path: str, handler=None):
+        node = self._root
+        for token in path.lower().split():
+            child = node.children.get(token)
+            if child is None:
+                child = node.children[token] = _Node(f"{node.path} {token}".strip())
+            node = child
+        if handler is not None:
+            node.handler = handler
+        self._index = None
+
+    def handler(self, path: str):
+        node = self._root
+        for token in path.lower().split():
+            node = node.children.get(token)
+            if node is None:
+                return None
+        return node.handler
+
+    def specs(self):
+        """Registered commands in registration order."""
+        return list(self._specs.values())
+
+    def command_map(self):
+        """{path: handler} for every command path, aliases included."""
+        found = {}
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node.handler is not None:
+                found[node.path] = node.handler
+            stack.extend(node.children.values())
+        return found
+
+    def stages(self):
+        """{path: stage} for commands that declare a pipeline stage."""
+        return {path: spec.stage for path, spec in self.command_map().items()
+                if isinstance(spec, CommandSpec) and spec.has_stage}
+
+    def __contains__(self, name: str):
+        return name.lower() in self._root.children
+
+    def resolve(self, parts):
+        """Returns (command_path, handler, args) for the longest registered prefix of parts.
+        handler is None when the first token is not a command."""
+        node = self._root
+        best = (None, None, 0)
+        for depth, token in enumerate(parts, 1):
+            node = node.children.get(token.lower())
+            if node is None:
+                break
+            if node.handler is not None:
+                best = (node.path, node.handler, depth)
+        path, handler, used = best
+        if handler is None:
+            return (parts[0].lower() if parts else None), None, parts[1:]
+        return path, handler, parts[used:]
+
+    def complete(self, tokens, prefix: str):
+        """Candidates for `prefix` after the already-typed `tokens`."""
+        node = self._root
+        for token in tokens:
+            node = node.children.get(token.lower())
+            if node is None:
+                return []
+        prefix = prefix.lower()
+        return sorted(word for word in node.children if word.startswith(prefix))
+
+    def names(self):
+        return list(self._root.children)
+
+    # --- SUGGESTIONS ---
+
+    def suggest(self, word: str, extra=(), limit: int = 3):
+        """'Did you mean' candidates among top-level commands (and `extra` names such as aliases)."""
+        if self._index is None:
+            self._index = _DeletionIndex(self.names())
+        word = word.lower()
+        candidates = self._index.lookup(word) | {name for name in extra if _within(word, name)}
+        ranked = sorted((damerau_levenshtein(word, name), name) for name in candidates)
+        return [name for distance, name in ranked if distance <= MAX_SUGGESTION_DISTANCE][:limit]
+
+# Built-in commands register here with @command; main.py adds plugins at startup.
+COMMANDS = CommandRegistry()
+
+def command(name: str, **meta):
+    """Decorator registering handler(args) as a built-in command; see CommandSpec for `meta`."""
+    def decorate(handler):
+        COMMANDS.add(CommandSpec(name, handler, **meta))
+        return handler
+    return decorate
+
+# --- EDIT DISTANCE ---
+
+def _deletes(word: str, depth: int = MAX_SUGGESTION_DISTANCE):
+    """All strings reachable from word by deleting up to `depth` characters."""
+    results = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        results |= frontier
+    return results
+
+class _DeletionIndex:
+    """Symmetric-delete index: a typo and its command share a deletion variant when their
+    edit distance is at most MAX_SUGGESTION_DISTANCE, so lookups avoid scanning every name."""
+
+    def __init__(self, words):
+        self._variants = defaultdict(set)
+        for word in words:
+            for variant in _deletes(word):
+                self._variants[variant].add(word)
+
+    def lookup(self, word: str):
+        found = set()
+        for variant in _deletes(word):
+            found |= self._variants.get(variant, set())
+        return found
+
+def _within(word: str, name: str):
+    return abs(len(word) - len(name)) <= MAX_SUGGESTION_DISTANCE
+
+def damerau_levenshtein(a: str, b: str):
+    """Edit distance counting adjacent transpositions as one edit (optimal string alignment)."""
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[len(b)]
+
+# --- READLINE COMPLETION ---
+
+def install_completion(registry, extra_names=lambda: ()):
+    """Enables <Tab> completion with readline when it is available. Returns True on success."""
+    try:
+        import readline
+    except ImportError:  # Windows without pyreadline
+        return False
+
+    matches = []
+
+    def completer(text, state):
+        if state == 0:
+            line = readline.get_line_buffer()[:readline.get_begidx()]
+            tokens = line.split()
+            matches[:] = registry.complete(tokens, text)
+            if not tokens:
+                matches.extend(sorted(n for n in extra_names() if n.startswith(text.lower()) and n not in matches))
+        if state < len(matches):
+            return matches[state] + " "
+        return None
+
+    readline.set_completer(completer)
+    readline.set_completer_delims(" \t\n")
+    if "libedit" in (readline.__doc__ or ""):
+        readline.parse_and_bind("bind ^I rl_complete")  # macOS system Python
+    else:
+        readline.parse_and_bind("tab: complete")
+    return True
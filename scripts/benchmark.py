@@ -0,0 +1,403 @@
+"""Offline benchmark suite for the hot paths in utils.py and commands.py.
+
+Usage:
+    python scripts/benchmark.py [--scale small|full] [--only name,name] [--repeat N]
+        [--fixtures DIR] [--save results.json]
+        [--compare baseline.json [--threshold 0.10] [--against results.json]]
+    python scripts/benchmark.py --list
+
+Fixtures are generated deterministically (fixed seed) and kept in --fixtures (default:
+a directory under the system temp dir) so later runs reuse them. `full` uses the sizes
+the paths are expected to cope with (1M-line notes file, 100k-entry directory, 2 GB
+backup source, 1M-path `open` index); `small` is a quick sanity run. Timings use a warm page cache.
+
+--save writes the results as JSON; --compare runs the suite (or loads --against) and
+exits with status 1 if any benchmark is slower than the baseline by more than --threshold
+(10% by default). Runs are compared on their fastest time (--stat min), which is the least
+noisy on shared machines; --stat median is also available. Nothing touches the network.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RESULTS_VERSION = 1
+SEED = 1234
+SCALES = {
+    "small": {"notes_lines": 100_000, "flat_entries": 10_000, "backup_bytes": 64 * 1024 ** 2, "indexed_paths": 100_000},
+    "full": {"notes_lines": 1_000_000, "flat_entries": 100_000, "backup_bytes": 2 * 1024 ** 3, "indexed_paths": 1_000_000},
+}
+RENDER_ROWS = 100_000
+WORDS = ("alpha", "report", "milk", "deploy", "python", "meeting", "invoice", "backup", "review", "travel",
+         "garden", "release", "budget", "kernel", "coffee", "ticket", "search", "archive", "window", "market")
+
+# --- FIXTURES ---
+
+def _write_notes(path, lines, rng):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        chunk = []
+        for i in range(lines):
+            words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12)))
+            chunk.append(f"[2024-01-{i % 28 + 1:02d} 12:{i % 60:02d}:00] {words} #{i}\n")
+            if len(chunk) == 10_000:
+                f.writelines(chunk)
+                chunk = []
+        f.writelines(chunk)
+
+def _write_flat(path, entries):
+    os.makedirs(path, exist_ok=True)
+    for i in range(entries):
+        if i % 10 == 0:
+            os.makedirs(os.path.join(path, f"dir_{i:06d}"), exist_ok=True)
+        else:
+            with open(os.path.join(path, f"file_{i:06d}.txt"), "wb") as f:
+                f.write(b"x" * (i % 4096))
+
+def _write_backup_source(path, total_bytes, rng):
+    """Mixed tree: many small files plus a few large ones, about `total_bytes` in all."""
+    block = rng.getrandbits(8 * 1024 * 1024).to_bytes(1024 * 1024, "little")  # randbytes() is 3.9+
+    written = 0
+    small_budget = total_bytes // 5
+    index = 0
+    while written < small_budget:
+        folder = os.path.join(path, f"projects/p{index // 200:03d}")
+        os.makedirs(folder, exist_ok=True)
+        size = rng.randint(1, 64) * 1024
+        with open(os.path.join(folder, f"f{index:06d}.dat"), "wb") as f:
+            f.write(block[:size])
+        written += size
+        index += 1
+    os.makedirs(os.path.join(path, "media"), exist_ok=True)
+    large = 0
+    while written < total_bytes:
+        size = min(256 * 1024 * 1024, total_bytes - written)
+        with open(os.path.join(path, "media", f"large_{large:02d}.bin"), "wb") as f:
+            for offset in range(0, size, len(block)):
+                f.write(block[:min(len(block), size - offset)])
+        written += size
+        large += 1
+
+EXTENSIONS = (".txt", ".pdf", ".md", ".py", ".csv", ".jpg", ".docx", "")
+OPEN_QUERIES = WORDS + ("report_12", "invoce", "pythn", "meeting notes", "alpha review", "depl")
+
+def _write_path_index(path, count, rng):
+    """A pathindex file of `count` made-up paths (nothing is created on disk)."""
+    import pathindex
+
+    paths = set()
+    while len(paths) < count:
+        folders = "/".join(rng.choice(WORDS) for _ in range(rng.randint(1, 5)))
+        name = "_".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))) + f"_{rng.randint(0, 9999)}"
+        paths.add(f"/home/user/{folders}/{name}{rng.choice(EXTENSIONS)}")
+    pathindex.write_index(paths, path)
+
+def ensure_fixtures(directory, scale):
+    """Creates the fixtures that are missing or were built for other sizes."""
+    params = SCALES[scale]
+    manifest_path = os.path.join(directory, "fixtures.json")
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            built = json.load(f)
+    except (OSError, ValueError):
+        built = {}
+    import pathindex
+    if built.get("path_index_format") != pathindex.INDEX_MAGIC.hex():
+        built.pop("indexed_paths", None)  # written by another version of the index format
+    steps = (
+        ("notes_lines", os.path.join(directory, "data", "notes.txt"),
+         lambda p: _write_notes(p, params["notes_lines"], random.Random(SEED))),
+        ("flat_entries", os.path.join(directory, "flat"), lambda p: _write_flat(p, params["flat_entries"])),
+        ("backup_bytes", os.path.join(directory, "backup_src"),
+         lambda p: _write_backup_source(p, params["backup_bytes"], random.Random(SEED))),
+        ("indexed_paths", os.path.join(directory, "paths.idx"),
+         lambda p: _write_path_index(p, params["indexed_paths"], random.Random(SEED))),
+    )
+    for key, path, build in steps:
+        if built.get(key) == params[key] and os.path.exists(path):
+            continue
+        print(f"generating {key}={params[key]:,} in {path} ...", flush=True)
+        started = time.perf_counter()
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+        build(path)
+        built[key] = params[key]
+        built["path_index_format"] = pathindex.INDEX_MAGIC.hex()
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(built, f)
+        print(f"  done in {time.perf_counter() - started:.1f}s", flush=True)
+
+# --- BENCHMARKS ---
+
+class Benchmark:
+    """`run()` is timed `repeat` times; `before_each()` runs untimed before every run and
+    `after()` once at the end. `ops` operations per run give a per-operation time."""
+
+    def __init__(self, name, run, repeat=5, ops=1, before_each=None, after=None, description=""):
+        self.name = name
+        self.run = run
+        self.repeat = repeat
+        self.ops = ops
+        self.before_each = before_each or (lambda: None)
+        self.after = after or (lambda: None)
+        self.description = description
+
+def _run_command(handler, args):
+    """Runs a command handler with its output captured; fails if it reported an error."""
+    from jobs import captured_output
+    from pipeline import command_failed, reset_status
+
+    reset_status()
+    with captured_output() as buffer:
+        handler(args)
+    if command_failed():
+        raise RuntimeError(f"{handler.__name__} {' '.join(args)} failed:\n{buffer.getvalue()[-2000:]}")
+
+def _render_rows(rows, terminal, rich_table=False):
+    """Renders rows as a three-column table into memory, as on a 200-column terminal."""
+    import io
+    from rich.console import Console
+    from output import DataTable
+
+    console = Console(file=io.StringIO(), force_terminal=terminal, width=200, color_system="truecolor")
+    table = DataTable(title=" Benchmark")
+    table.add_column("ID", style="cyan", justify="right")
+    table.add_column("Name", style="green")
+    table.add_column("Size", style="yellow")
+    for row in rows:
+        table.add_row(*row)
+    if rich_table:
+        console.print(table._rich_table())
+    else:
+        table.print(console)
+
+def build_benchmarks(fixtures):
+    import commands
+    import pathindex
+    import utils
+    from config import get_setting
+    from fs_index import drop_index, tree_index
+
+    notes_path = os.path.join("data", "notes.txt")
+    notes_size = None  # as generated; taken before the first append, so --list needs no fixtures
+    calc_history = os.path.join("data", "calc_history.txt")
+    backup_src = os.path.join(fixtures, "backup_src")
+    backup_dst = os.path.join(fixtures, "backup_dst")
+
+    def reset_calc_history():
+        if os.path.exists(calc_history):
+            os.remove(calc_history)
+
+    def truncate_notes():
+        nonlocal notes_size
+        if notes_size is None:
+            notes_size = os.path.getsize(notes_path)
+        with open(notes_path, "r+b") as f:
+            f.truncate(notes_size)
+
+    def remove_backup():
+        if os.path.exists(backup_dst):
+            shutil.rmtree(backup_dst)
+
+    def run_backup():
+        _run_command(commands.cmd_backup, [backup_src, backup_dst])
+
+    def ensure_backup():
+        if not os.path.exists(backup_dst):
+            run_backup()
+
+    def search_backup_src():
+        return sum(1 for _ in commands.iter_file_search("*.dat", backup_src))
+
+    def append_notes():
+        for i in range(200):
+            utils.append_note(notes_path, f"benchmark note {i}")
+
+    paths_index = os.path.join(fixtures, "paths.idx")
+
+    def open_search():
+        for query in OPEN_QUERIES:
+            pathindex.search(query, index_path=paths_index)
+
+    calc_size = get_setting("history.calc_size")
+    rows = [(str(i), f"file_{i:06d}.dat", f"{i * 37 % 100_000} bytes") for i in range(RENDER_ROWS)]
+    return [
+        Benchmark("search_notes", lambda: utils.search_notes("invoice budget"), repeat=5,
+                  description="substring search over data/notes.txt"),
+        Benchmark("search_notes_miss", lambda: utils.search_notes("no-such-keyword"), repeat=5,
+                  description="search with no hits (pure scan)"),
+        Benchmark("append_note", append_notes, repeat=5, ops=200, before_each=truncate_notes, after=truncate_notes,
+                  description="locked append to the large notes file"),
+        Benchmark("save_calc_history", lambda: [utils.save_calc_history(f"{i}+1 = {i + 1}") for i in range(200)],
+                  repeat=5, ops=200, before_each=reset_calc_history, after=reset_calc_history,
+                  description=f"append + trim to {calc_size} entries"),
+        Benchmark("safe_eval", lambda: [utils.safe_eval(f"({i} + 3.5) * 2 / 7 - {i} % 3") for i in range(200)],
+                  repeat=5, ops=200, before_each=reset_calc_history, after=reset_calc_history,
+                  description="validate + eval + history write"),
+        Benchmark("get_sysinfo", utils.get_sysinfo, repeat=3,
+                  description="psutil snapshot (includes cpu_percent sampling)"),
+        Benchmark("file_list", lambda: _run_command(commands.cmd_file_manager, ["list", os.path.join(fixtures, "flat")]),
+                  repeat=3, description="`file list` on the large directory, rendered"),
+        Benchmark("note_show", lambda: _run_command(commands.cmd_note, ["show"]), repeat=3,
+                  description="`note show` of the large notes file, rendered"),
+        Benchmark("render_rows", lambda: _render_rows(rows, terminal=True), repeat=3,
+                  description=f"output.DataTable, {RENDER_ROWS:,} rows to a colour terminal"),
+        Benchmark("render_rows_plain", lambda: _render_rows(rows, terminal=False), repeat=3,
+                  description=f"output.DataTable, {RENDER_ROWS:,} rows to a pipe"),
+        Benchmark("render_rows_rich", lambda: _render_rows(rows, terminal=True, rich_table=True), repeat=1,
+                  description="the same rows through rich.table.Table (reference for render_rows)"),
+        Benchmark("file_search", search_backup_src, repeat=5, before_each=lambda: drop_index(backup_src),
+                  description="iter_file_search over the backup tree (os.walk)"),
+        Benchmark("file_search_indexed", search_backup_src, repeat=5, before_each=lambda: tree_index(backup_src),
+                  after=lambda: drop_index(backup_src), description="the same search from a watched TreeIndex"),
+        Benchmark("backup", run_backup, repeat=3, before_each=remove_backup, after=remove_backup,
+                  description="`backup` of the mixed tree"),
+        Benchmark("backup_update", run_backup, repeat=3, before_each=lambda: (ensure_backup(), tree_index(backup_src)),
+                  after=lambda: (remove_backup(), drop_index(backup_src)),
+                  description="`backup` again with nothing changed (manifest + watched index)"),
+        Benchmark("open_search", open_search, repeat=5, ops=len(OPEN_QUERIES),
+                  description="`open <name>` lookups (exact, fuzzy, multi-word) in the path index"),
+    ]
+
+def run_benchmark(bench, repeat=None):
+    times = []
+    try:
+        bench.run()  # warm-up: imports, page cache, lazily built state
+        for _ in range(repeat or bench.repeat):
+            bench.before_each()
+            gc.collect()
+            started = time.perf_counter()
+            bench.run()
+            times.append(time.perf_counter() - started)
+    finally:
+        bench.after()
+    median = statistics.median(times)
+    return {
+        "median": median,
+        "min": min(times),
+        "max": max(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "runs": len(times),
+        "ops": bench.ops,
+        "per_op": median / bench.ops,
+    }
+
+# --- REPORTING ---
+
+def _fmt(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f}µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds:.3f}s"
+
+def compare(baseline, current, threshold, stat="min"):
+    """Prints a comparison table; returns the names of regressed benchmarks."""
+    if baseline.get("scale") != current.get("scale"):
+        print(f"warning: baseline scale {baseline.get('scale')!r} != current {current.get('scale')!r}")
+    regressions = []
+    print(f"\n{'benchmark':<20} {'baseline':>12} {'current':>12} {'change':>9}  status ({stat})")
+    names = list(baseline["results"]) + [n for n in current["results"] if n not in baseline["results"]]
+    for name in names:
+        old, new = baseline["results"].get(name), current["results"].get(name)
+        if old is None or new is None:
+            status = "new" if old is None else "missing"
+            print(f"{name:<20} {_fmt(old[stat]) if old else '-':>12} {_fmt(new[stat]) if new else '-':>12} {'':>9}  {status}")
+            continue
+        change = new[stat] / old[stat] - 1 if old[stat] else 0.0
+        if change > threshold:
+            status = "REGRESSION"
+            regressions.append(name)
+        elif change < -threshold:
+            status = "faster"
+        else:
+            status = "ok"
+        print(f"{name:<20} {_fmt(old[stat]):>12} {_fmt(new[stat]):>12} {change:>+8.1%}  {status}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", default="small", choices=tuple(SCALES))
+    parser.add_argument("--only", help="comma-separated benchmark names")
+    parser.add_argument("--repeat", type=int, help="timed runs per benchmark (default: per benchmark)")
+    parser.add_argument("--fixtures", help="fixture directory (reused between runs)")
+    parser.add_argument("--save", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON")
+    parser.add_argument("--against", help="compare this results JSON instead of running")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown (0.10 = 10%%)")
+    parser.add_argument("--stat", default="min", choices=("min", "median"), help="statistic compared")
+    parser.add_argument("--list", action="store_true", help="list benchmarks and exit")
+    opts = parser.parse_args()
+
+    if opts.against:
+        if not opts.compare:
+            parser.error("--against needs --compare")
+        with open(opts.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(opts.against, encoding="utf-8") as f:
+            current = json.load(f)
+        return 1 if compare(baseline, current, opts.threshold, opts.stat) else 0
+
+    fixtures = os.path.abspath(opts.fixtures or os.path.join(tempfile.gettempdir(), f"assistant_bench_{opts.scale}"))
+    if opts.list:
+        for bench in build_benchmarks(fixtures):
+            print(f"{bench.name:<20} {bench.description}")
+        return 0
+    os.makedirs(fixtures, exist_ok=True)
+    save_path = os.path.abspath(opts.save) if opts.save else None
+    compare_path = os.path.abspath(opts.compare) if opts.compare else None
+    ensure_fixtures(fixtures, opts.scale)
+    # Commands use data/ relative to the working directory, so run inside the fixtures.
+    os.chdir(fixtures)
+    os.environ.setdefault("ASSISTANT_FSYNC", "none")
+    benchmarks = build_benchmarks(fixtures)
+    if opts.only:
+        wanted = set(opts.only.split(","))
+        unknown = wanted - {b.name for b in benchmarks}
+        if unknown:
+            parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+        benchmarks = [b for b in benchmarks if b.name in wanted]
+
+    current = {
+        "version": RESULTS_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "scale": opts.scale,
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "results": {},
+    }
+    print(f"{'benchmark':<20} {'median':>12} {'min':>12} {'per op':>12}  runs")
+    for bench in benchmarks:
+        result = run_benchmark(bench, opts.repeat)
+        current["results"][bench.name] = result
+        per_op = _fmt(result["per_op"]) if bench.ops > 1 else ""
+        print(f"{bench.name:<20} {_fmt(result['median']):>12} {_fmt(result['min']):>12} {per_op:>12}  {result['runs']}", flush=True)
+
+    if save_path:
+        with open(save_path, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"\nresults written to {save_path}")
+    if compare_path:
+        with open(compare_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, opts.threshold, opts.stat)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {opts.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+        print("\nno regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Load test for `main.py --serve`: reports requests/second and latency percentiles.
+
+Usage:
+    python scripts/load_test_server.py [--spawn] [--host 127.0.0.1] [--port 8765]
+        [--concurrency 32] [--requests 5000] [--command "text upper hello"] [--method run]
+        [--token T]
+
+--spawn starts a server in a temporary directory (so data/ files are not touched) and
+stops it afterwards. Without --spawn, pass the server's token with --token (or
+ASSISTANT_SERVER_TOKEN). Each client keeps one HTTP/1.1 connection alive.
+"""
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+async def client(host, port, token, body, count, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    request = (
+        f"POST /rpc HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Authorization: Bearer {token}\r\nContent-Length: {len(body)}\r\n\r\n"
+    ).encode() + body
+    try:
+        for _ in range(count):
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            payload = json.loads(await reader.readexactly(length)) if length else {}
+            latencies.append(time.perf_counter() - start)
+            if not head.startswith(b"HTTP/1.1 200") or "error" in payload or not payload.get("result", {}).get("ok", True):
+                errors.append(payload.get("error", payload))
+    finally:
+        writer.close()
+
+
+async def run_load(opts):
+    body = json.dumps({"jsonrpc": "2.0", "id": 1, "method": opts.method,
+                       "params": {"command": opts.command}}).encode()
+    latencies, errors = [], []
+    per_client = [opts.requests // opts.concurrency] * opts.concurrency
+    for i in range(opts.requests % opts.concurrency):
+        per_client[i] += 1
+    start = time.perf_counter()
+    await asyncio.gather(*(client(opts.host, opts.port, opts.token, body, n, latencies, errors) for n in per_client if n))
+    return time.perf_counter() - start, sorted(latencies), errors
+
+
+def wait_for_port(host, port, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex((host, port)) == 0:
+                return True
+        time.sleep(0.1)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--command", default="text upper hello")
+    parser.add_argument("--method", default="run", choices=("run", "values"))
+    parser.add_argument("--token", default=os.environ.get("ASSISTANT_SERVER_TOKEN", ""))
+    parser.add_argument("--spawn", action="store_true", help="start a server for the duration of the test")
+    opts = parser.parse_args()
+
+    proc = None
+    workdir = None
+    if opts.spawn:
+        workdir = tempfile.TemporaryDirectory(prefix="assistant_load_")
+        opts.token = secrets.token_urlsafe(24)
+        proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "main.py"), "--serve", "--host", opts.host,
+                                 "--port", str(opts.port)], cwd=workdir.name,
+                                env=dict(os.environ, ASSISTANT_SERVER_TOKEN=opts.token),
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if not wait_for_port(opts.host, opts.port):
+            proc.kill()
+            print("Server did not start")
+            return 1
+    try:
+        elapsed, latencies, errors = asyncio.run(run_load(opts))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+            workdir.cleanup()
+
+    ms = lambda seconds: f"{seconds * 1000:.2f} ms"
+    print(f"{len(latencies)} requests, {opts.concurrency} connections, command: {opts.command!r}")
+    print(f"throughput: {len(latencies) / elapsed:,.0f} req/s over {elapsed:.2f}s")
+    print(f"latency: p50 {ms(percentile(latencies, 50))}  p95 {ms(percentile(latencies, 95))}  "
+          f"p99 {ms(percentile(latencies, 99))}  max {ms(latencies[-1] if latencies else 0)}")
+    print(f"errors: {len(errors)}" + (f" (first: {errors[0]})" if errors else ""))
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""Multi-process stress test for storage.py: proves concurrent writers lose no entries.
+
+Usage: python scripts/stress_storage.py [--procs 8] [--ops 200] [--fsync none|data|full]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import Process
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage import append_line, update_lines, update_json, read_lines  # noqa: E402
+
+
+def worker(workdir, worker_id, ops, fsync):
+    appended = os.path.join(workdir, "appended.txt")
+    rewritten = os.path.join(workdir, "rewritten.txt")
+    counter = os.path.join(workdir, "counter.json")
+    for op in range(ops):
+        append_line(appended, f"{worker_id}-{op}", fsync)
+        # Full read-modify-write of the file, like note edit/delete and calc history trimming.
+        update_lines(rewritten, lambda lines: (lines + [f"{worker_id}-{op}\n"], None), fsync)
+        update_json(counter, lambda data: ({"count": (data or {}).get("count", 0) + 1}, None), fsync=fsync)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--procs", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--fsync", default="none", choices=("none", "data", "full"))
+    opts = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="storage_stress_") as workdir:
+        start = time.perf_counter()
+        procs = [Process(target=worker, args=(workdir, i, opts.ops, opts.fsync)) for i in range(opts.procs)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - start
+
+        expected = {f"{i}-{op}" for i in range(opts.procs) for op in range(opts.ops)}
+        failures = []
+        for name in ("appended.txt", "rewritten.txt"):
+            lines = [line.rstrip("\n") for line in read_lines(os.path.join(workdir, name))]
+            if len(lines) != len(expected) or set(lines) != expected:
+                failures.append(f"{name}: {len(set(lines) & expected)}/{len(expected)} entries, {len(lines)} lines")
+        with open(os.path.join(workdir, "counter.json"), encoding="utf-8") as f:
+            count = json.load(f)["count"]
+        if count != len(expected):
+            failures.append(f"counter.json: {count}/{len(expected)} increments")
+
+    total_ops = len(expected) * 3
+    print(f"{opts.procs} processes x {opts.ops} ops x 3 files in {elapsed:.2f}s ({total_ops / elapsed:,.0f} ops/s, fsync={opts.fsync})")
+    if failures:
+        print("LOST UPDATES:\n  " + "\n  ".join(failures))
+        return 1
+    print("OK: no entries lost")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,360 @@
+import asyncio
+import hmac
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from rich.text import Text
+
+from config import get_setting
+from jobs import Job, jobs, captured_output
+from pipeline import reset_status, command_failed
+
+# --- CONSTANTS ---
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 1024 * 1024
+MAX_VALUES = 10000  # values returned by one `values` call
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+TIMEOUT_ERROR = -32001
+BUSY_ERROR = -32002
+
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+HTTP_REASONS = {200: "OK", 204: "No Content", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+                404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 415: "Unsupported Media Type"}
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+# --- METRICS ---
+
+class Metrics:
+    """Counters and a latency histogram rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.requests = defaultdict(int)  # (command, outcome) -> count
+        self.buckets = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+        self.latency_sum = defaultdict(float)
+        self.in_flight = 0
+        self.pending = 0
+
+    def observe(self, command: str, outcome: str, seconds: float):
+        self.requests[(command, outcome)] += 1
+        counts = self.buckets[command]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        self.latency_sum[command] += seconds
+
+    def render(self):
+        lines = [
+            "# HELP assistant_requests_total RPC requests by command and outcome.",
+            "# TYPE assistant_requests_total counter",
+        ]
+        for (command, outcome), count in sorted(self.requests.items()):
+            lines.append(f'assistant_requests_total{{command="{command}",outcome="{outcome}"}} {count}')
+        lines += [
+            "# HELP assistant_request_duration_seconds Time from accepting a request to its response.",
+            "# TYPE assistant_request_duration_seconds histogram",
+        ]
+        for command, counts in sorted(self.buckets.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f'assistant_request_duration_seconds_bucket{{command="{command}",le="{bound}"}} {cumulative}')
+            lines.append(f'assistant_request_duration_seconds_sum{{command="{command}"}} {self.latency_sum[command]:.6f}')
+            lines.append(f'assistant_request_duration_seconds_count{{command="{command}"}} {cumulative}')
+        lines += [
+            "# TYPE assistant_requests_in_flight gauge",
+            f"assistant_requests_in_flight {self.in_flight}",
+            "# TYPE assistant_requests_pending gauge",
+            f"assistant_requests_pending {self.pending}",
+            "# TYPE assistant_uptime_seconds gauge",
+            f"assistant_uptime_seconds {time.time() - self.started:.3f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+# --- RPC SERVER ---
+
+class RpcServer:
+    """JSON-RPC 2.0 over HTTP/1.1 (TCP or a Unix socket).
+
+    Handlers block and print, so each request runs on a thread pool with its output
+    captured per thread. At most `server.workers` run at once, and up to
+    `server.max_pending` more wait before the server answers "busy". A request that
+    times out has its cancel event set; handlers with cancellation points stop early,
+    and its worker slot is only freed once the handler has actually returned.
+    """
+
+    def __init__(self, execute_line, collect_values, command_names, token: str = None):
+        self.execute_line = execute_line
+        self.collect_values = collect_values
+        self.command_names = command_names
+        self.token = token
+        self.allowed_hosts = set(LOOPBACK_HOSTS)
+        self.workers = get_setting("server.workers")
+        self.max_pending = get_setting("server.max_pending")
+        self.default_timeout = get_setting("server.timeout")
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="rpc")
+        self.slots = None  # created inside the running loop
+        self.metrics = Metrics()
+        self._next_id = 0
+
+    # --- commands ---
+
+    def _run_sync(self, job, line: str, structured: bool):
+        with jobs.context(job), captured_output() as buffer:
+            reset_status()
+            if structured:
+                values = self.collect_values(line, MAX_VALUES)
+                ok = not command_failed()
+            else:
+                values = None
+                _cmd, ok = self.execute_line(line)
+        result = {"ok": bool(ok), "output": Text.from_ansi(buffer.getvalue()).plain}
+        if structured:
+            result["values"] = values
+        return result
+
+    async def run_command(self, line: str, structured: bool, timeout: float):
+        line = line.strip()
+        if not line:
+            raise RpcError(INVALID_PARAMS, "Empty command")
+        if line.endswith("&") and not line.endswith("&&"):
+            raise RpcError(INVALID_PARAMS, "Background jobs (&) are not available over RPC")
+        if self.metrics.pending >= self.max_pending and self.slots.locked():
+            raise RpcError(BUSY_ERROR, "Server busy, try again later")
+
+        self.metrics.pending += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.metrics.pending -= 1
+        self._next_id += 1
+        job = Job(self._next_id, line)
+        self.metrics.in_flight += 1
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.pool, self._run_sync, job, line, structured)
+
+        def release(_future):
+            self.metrics.in_flight -= 1
+            self.slots.release()
+
+        future.add_done_callback(release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            job.cancel_event.set()
+            raise RpcError(TIMEOUT_ERROR, f"Timed out after {timeout:g}s")
+
+    # --- JSON-RPC ---
+
+    def _command_line(self, method: str, params):
+        """'run'/'values' take {"command": line} or [line]; any other method is a command
+        name whose params are its arguments."""
+        if method in ("run", "values"):
+            if isinstance(params, dict):
+                line = params.get("command")
+            elif isinstance(params, list) and len(params) == 1:
+                line = params[0]
+            else:
+                line = None
+            if not isinstance(line, str):
+                raise RpcError(INVALID_PARAMS, f"'{method}' expects {{\"command\": \"<command line>\"}}")
+            return line
+        if method.split()[0].lower() not in self.command_names():
+            raise RpcError(METHOD_NOT_FOUND, f"Unknown method '{method}'")
+        args = params if isinstance(params, list) else []
+        quoted = [f'"{a}"' if isinstance(a, str) and " " in a else str(a) for a in args]
+        return " ".join([method] + quoted)
+
+    async def call(self, request):
+        """Handles one JSON-RPC request object. Returns the response, or None for notifications."""
+        if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or not isinstance(request.get("method"), str):
+            return _error_response(None, INVALID_REQUEST, "Invalid JSON-RPC 2.0 request")
+        request_id = request.get("id")
+        method = request["method"]
+        params = request.get("params", [])
+        started = time.perf_counter()
+        label = method if method in ("run", "values", "commands") else method.split()[0].lower()
+        try:
+            if method == "commands":
+                result = sorted(self.command_names())
+            else:
+                line = self._command_line(method, params)
+                if method in ("run", "values"):
+                    label = line.split()[0].lower() if line.split() else method
+                timeout = params.get("timeout", self.default_timeout) if isinstance(params, dict) else self.default_timeout
+                try:
+                    timeout = float(timeout)
+                except (TypeError, ValueError):
+                    raise RpcError(INVALID_PARAMS, "'timeout' must be a number of seconds")
+                if not timeout > 0:
+                    raise RpcError(INVALID_PARAMS, "'timeout' must be positive")
+                result = await self.run_command(line, method == "values", timeout)
+            outcome = "ok" if not isinstance(result, dict) or result.get("ok") else "failed"
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        except RpcError as e:
+            outcome = "timeout" if e.code == TIMEOUT_ERROR else ("busy" if e.code == BUSY_ERROR else "error")
+            response = _error_response(request_id, e.code, str(e))
+        except Exception as e:
+            outcome = "error"
+            response = _error_response(request_id, INTERNAL_ERROR, f"{type(e).__name__}: {e}")
+        if label not in self.command_names() and label not in ("run", "values", "commands"):
+            label = "unknown"  # keeps metric label cardinality bounded
+        self.metrics.observe(label, outcome, time.perf_counter() - started)
+        return None if "id" not in request else response
+
+    async def handle_rpc(self, body: bytes):
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return _error_response(None, PARSE_ERROR, "Parse error")
+        if isinstance(payload, list):
+            if not payload:
+                return _error_response(None, INVALID_REQUEST, "Empty batch")
+            responses = await asyncio.gather(*(self.call(item) for item in payload))
+            return [r for r in responses if r is not None] or None
+        return await self.call(payload)
+
+    # --- HTTP ---
+
+    def _authorized(self, headers):
+        if not self.token:
+            return True
+        supplied = headers.get("authorization", "")
+        return hmac.compare_digest(supplied.encode(), f"Bearer {self.token}".encode())
+
+    def _rejection(self, http_method: str, headers):
+        """(status, message) for a request a web page could have sent, else None.
+
+        Browsers send simple cross-origin POSTs (text/plain, no preflight) and, after DNS
+        rebinding, requests whose Host is the attacker's name; other clients send
+        neither an Origin header nor a foreign Host.
+        """
+        if "origin" in headers:
+            return 403, b"Cross-origin requests are not allowed\n"
+        host = headers.get("host")
+        if host is not None and _host_name(host) not in self.allowed_hosts:
+            return 403, b"Host not allowed\n"
+        if http_method == "POST" and headers.get("content-type", "").split(";")[0].strip().lower() != "application/json":
+            return 415, b"Content-Type must be application/json\n"
+        return None
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                try:
+                    http_method, path, version = request_line.split(" ", 2)
+                except ValueError:
+                    await _respond(writer, 400, b"Bad request line\n", "text/plain", False)
+                    return
+                headers = {}
+                for header in header_lines:
+                    if ":" in header:
+                        name, value = header.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                try:
+                    length = int(headers.get("content-length", "0") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await _respond(writer, 400, b"Invalid Content-Length\n", "text/plain", False)
+                    return
+                if length > MAX_BODY_BYTES:
+                    await _respond(writer, 413, b"Request body too large\n", "text/plain", False)
+                    return
+                body = await reader.readexactly(length) if length else b""
+
+                path = path.split("?", 1)[0]
+                rejection = self._rejection(http_method, headers)
+                if rejection:
+                    await _respond(writer, rejection[0], rejection[1], "text/plain", keep_alive)
+                elif not self._authorized(headers):
+                    await _respond(writer, 401, b"Missing or invalid bearer token\n", "text/plain", keep_alive)
+                elif path == "/metrics" and http_method == "GET":
+                    await _respond(writer, 200, self.metrics.render().encode(), "text/plain; version=0.0.4", keep_alive)
+                elif path == "/health" and http_method == "GET":
+                    await _respond(writer, 200, b'{"status":"ok"}', "application/json", keep_alive)
+                elif path in ("/", "/rpc"):
+                    if http_method != "POST":
+                        await _respond(writer, 405, b"Use POST for JSON-RPC\n", "text/plain", keep_alive)
+                    else:
+                        response = await self.handle_rpc(body)
+                        if response is None:
+                            await _respond(writer, 204, b"", "application/json", keep_alive)
+                        else:
+                            data = json.dumps(response, default=str, ensure_ascii=False).encode("utf-8")
+                            await _respond(writer, 200, data, "application/json", keep_alive)
+                else:
+                    await _respond(writer, 404, b"Not found\n", "text/plain", keep_alive)
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, socket_path: str = None, ready=None):
+        self.slots = asyncio.Semaphore(self.workers)
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            server = await asyncio.start_unix_server(self.handle_connection, path=socket_path)
+            os.chmod(socket_path, 0o600)  # other local users must not run commands as us
+        else:
+            if host not in ("", "0.0.0.0", "::"):
+                self.allowed_hosts.add(_host_name(host))  # e.g. --host 192.168.1.5 with a token
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        if ready:
+            ready(server)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if sys.version_info >= (3, 9):
+                self.pool.shutdown(wait=False, cancel_futures=True)
+            else:
+                self.pool.shutdown(wait=False)
+            if socket_path and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+def _host_name(value: str):
+    """'localhost:8765' -> 'localhost', '[::1]:8765' -> '::1'."""
+    value = value.strip().lower()
+    if value.startswith("["):
+        return value[1:].split("]", 1)[0]
+    return value.rsplit(":", 1)[0] if value.count(":") == 1 else value
+
+def _error_response(request_id, code: int, message: str):
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+async def _respond(writer, status: int, body: bytes, content_type: str, keep_alive: bool):
+    head = (
+        f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
@@ -0,0 +1,276 @@
+import contextlib
+import math
+import threading
+import time
+import tracemalloc
+
+from config import get_setting, subscribe
+from storage import read_json, update_json
+
+# --- CONSTANTS ---
+STATS_FILE = "data/stats.json"
+STATS_VERSION = 1
+GROWTH = 2 ** (1 / 8)  # bucket width: percentiles are accurate to about 9%
+SECONDS_BASE = 1e-6
+BYTES_BASE = 1.0
+
+# --- HISTOGRAM ---
+
+class Histogram:
+    """Log-scale histogram: bucket i holds values in (base*GROWTH^(i-1), base*GROWTH^i].
+
+    Memory stays constant however many values are added, histograms from several sessions
+    merge by adding counts, and percentiles keep the same relative accuracy from
+    microseconds to hours.
+    """
+
+    def __init__(self, base: float, counts=None, total=0.0, maximum=0.0):
+        self.base = base
+        self.counts = {int(k): v for k, v in (counts or {}).items()}
+        self.total = total
+        self.maximum = maximum
+
+    @property
+    def count(self):
+        return sum(self.counts.values())
+
+    def add(self, value: float):
+        index = 0 if value <= self.base else math.ceil(math.log(value / self.base, GROWTH))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.maximum = max(self.maximum, other.maximum)
+
+    def percentile(self, pct: float):
+        count = self.count
+        if not count:
+            return 0.0
+        rank = pct / 100 * count
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self.base * GROWTH ** index, self.maximum)
+        return self.maximum
+
+    def mean(self):
+        count = self.count
+        return self.total / count if count else 0.0
+
+    def to_json(self):
+        return {"counts": {str(k): v for k, v in sorted(self.counts.items())}, "total": self.total, "maximum": self.maximum}
+
+    @classmethod
+    def from_json(cls, base, data):
+        return cls(base, data.get("counts"), data.get("total", 0.0), data.get("maximum", 0.0))
+
+# --- PER-COMMAND METRICS ---
+
+class CommandMetrics:
+    """Everything recorded for one command label."""
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.wall = Histogram.from_json(SECONDS_BASE, data.get("wall", {}))
+        self.cpu = Histogram.from_json(SECONDS_BASE, data.get("cpu", {}))
+        self.peak_memory = Histogram.from_json(BYTES_BASE, data.get("peak_memory", {}))
+        self.failures = data.get("failures", 0)
+        self.read_bytes = data.get("read_bytes", 0)
+        self.write_bytes = data.get("write_bytes", 0)
+
+    def merge(self, other):
+        self.wall.merge(other.wall)
+        self.cpu.merge(other.cpu)
+        self.peak_memory.merge(other.peak_memory)
+        self.failures += other.failures
+        self.read_bytes += other.read_bytes
+        self.write_bytes += other.write_bytes
+
+    def to_json(self):
+        return {
+            "wall": self.wall.to_json(), "cpu": self.cpu.to_json(), "peak_memory": self.peak_memory.to_json(),
+            "failures": self.failures, "read_bytes": self.read_bytes, "write_bytes": self.write_bytes,
+        }
+
+def _thread_io():
+    """(read, written) bytes for the calling thread, or for the process where per-thread
+    counters are not available. None if the platform reports neither."""
+    try:
+        with open("/proc/thread-self/io", "rb") as f:
+            fields = dict(line.split(b": ") for line in f.read().splitlines())
+        return int(fields[b"rchar"]), int(fields[b"wchar"])
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        import psutil
+        io = psutil.Process().io_counters()
+    except Exception:  # macOS has no io_counters; AccessDenied on some systems
+        return None
+    return getattr(io, "read_chars", io.read_bytes), getattr(io, "write_chars", io.write_bytes)
+
+# --- RECORDER ---
+
+class CommandStats:
+    """Per-command wall time, CPU time, I/O bytes and (opt-in) peak allocations.
+
+    The current session is kept in memory and merged into data/stats.json by save(),
+    so `stats` covers every session, including one-shot and --batch runs.
+    """
+
+    def __init__(self, path: str = STATS_FILE):
+        self.path = path
+        self._session = {}
+        self._lock = threading.Lock()
+        self._tracing = False  # tracemalloc started by us
+
+    @contextlib.contextmanager
+    def measure(self, label: str):
+        """Times the block and records it under `label`. Yields a dict; set
+        result["failed"] = True to count the run as a failure."""
+        result = {"failed": False}
+        if not get_setting("stats.enabled"):
+            yield result
+            return
+        # Without reset_peak() (Python 3.8) the peak would be the process's, not the command's
+        trace = get_setting("stats.tracemalloc") and hasattr(tracemalloc, "reset_peak")
+        if trace:
+            self._start_tracing()
+            tracemalloc.reset_peak()
+            base_memory = tracemalloc.get_traced_memory()[0]
+        io_before = _thread_io()
+        cpu_before = time.thread_time()
+        started = time.perf_counter()
+        try:
+            yield result
+        except BaseException:
+            result["failed"] = True
+            raise
+        finally:
+            wall = time.perf_counter() - started
+            cpu = time.thread_time() - cpu_before
+            io_after = _thread_io() if io_before else None
+            peak = tracemalloc.get_traced_memory()[1] - base_memory if trace and tracemalloc.is_tracing() else None
+            with self._lock:
+                metrics = self._session.setdefault(label, CommandMetrics())
+                metrics.wall.add(wall)
+                metrics.cpu.add(cpu)
+                if peak is not None:
+                    metrics.peak_memory.add(max(peak, 0))
+                if io_after:
+                    metrics.read_bytes += io_after[0] - io_before[0]
+                    metrics.write_bytes += io_after[1] - io_before[1]
+                metrics.failures += result["failed"]
+
+    def _start_tracing(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+
+    def stop_tracing(self):
+        if self._tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._tracing = False
+
+    def snapshot(self):
+        """{label: CommandMetrics} for saved sessions plus this one."""
+        merged = {label: CommandMetrics(data) for label, data in self._load().items()}
+        with self._lock:
+            for label, metrics in self._session.items():
+                merged.setdefault(label, CommandMetrics()).merge(metrics)
+        return merged
+
+    def _load(self):
+        data = read_json(self.path, default=None) or {}
+        return data.get("commands", {}) if data.get("version") == STATS_VERSION else {}
+
+    def save(self):
+        """Merges this session into data/stats.json (under its lock) and starts a new one."""
+        with self._lock:
+            session, self._session = self._session, {}
+        if not session:
+            return
+
+        def merge(data):
+            commands = data.get("commands", {}) if data and data.get("version") == STATS_VERSION else {}
+            for label, metrics in session.items():
+                saved = CommandMetrics(commands.get(label))
+                saved.merge(metrics)
+                commands[label] = saved.to_json()
+            return {"version": STATS_VERSION, "commands": commands}, None
+        update_json(self.path, merge)
+
+    def reset(self):
+        with self._lock:
+            self._session = {}
+        update_json(self.path, lambda _data: ({"version": STATS_VERSION, "commands": {}}, None))
+
+command_stats = CommandStats()
+
+def _apply_tracemalloc(_key, _old, new):
+    if not new:
+        command_stats.stop_tracing()
+
+subscribe("stats.tracemalloc", _apply_tracemalloc)
+
+# --- EXPORT ---
+
+QUANTILES = (50, 95, 99)
+
+def to_json(snapshot):
+    """Summary per command: counts, percentiles (seconds / bytes) and totals."""
+    report = {}
+    for label, m in sorted(snapshot.items()):
+        entry = {
+            "runs": m.wall.count,
+            "failures": m.failures,
+            "wall_seconds": {**{f"p{q}": m.wall.percentile(q) for q in QUANTILES}, "max": m.wall.maximum, "sum": m.wall.total},
+            "cpu_seconds": {**{f"p{q}": m.cpu.percentile(q) for q in QUANTILES}, "sum": m.cpu.total},
+            "read_bytes": m.read_bytes,
+            "write_bytes": m.write_bytes,
+        }
+        if m.peak_memory.count:
+            entry["peak_memory_bytes"] = {**{f"p{q}": m.peak_memory.percentile(q) for q in QUANTILES}, "max": m.peak_memory.maximum}
+        report[label] = entry
+    return report
+
+def _label(label: str):
+    return label.replace("\\", "\\\\").replace('"', '\\"')
+
+def to_prometheus(snapshot):
+    """Prometheus text format: latency and memory as summaries, CPU and I/O as counters."""
+    lines = [
+        "# HELP assistant_command_duration_seconds Wall time per command.",
+        "# TYPE assistant_command_duration_seconds summary",
+    ]
+    for label, m in sorted(snapshot.items()):
+        name = _label(label)
+        for q in QUANTILES:
+            lines.append(f'assistant_command_duration_seconds{{command="{name}",quantile="{q / 100}"}} {m.wall.percentile(q):.6f}')
+        lines.append(f'assistant_command_duration_seconds_sum{{command="{name}"}} {m.wall.total:.6f}')
+        lines.append(f'assistant_command_duration_seconds_count{{command="{name}"}} {m.wall.count}')
+    counters = (
+        ("assistant_command_cpu_seconds_total", "CPU time spent in the command's thread.", lambda m: f"{m.cpu.total:.6f}"),
+        ("assistant_command_failures_total", "Runs that reported an error.", lambda m: m.failures),
+        ("assistant_command_read_bytes_total", "Bytes read (files, sockets, pipes) while the command ran.", lambda m: m.read_bytes),
+        ("assistant_command_written_bytes_total", "Bytes written while the command ran.", lambda m: m.write_bytes),
+    )
+    for metric, description, value in counters:
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} counter"]
+        lines += [f'{metric}{{command="{_label(label)}"}} {value(m)}' for label, m in sorted(snapshot.items())]
+    traced = {label: m for label, m in snapshot.items() if m.peak_memory.count}
+    if traced:
+        lines += [
+            "# HELP assistant_command_peak_memory_bytes Peak Python allocations per run (stats.tracemalloc).",
+            "# TYPE assistant_command_peak_memory_bytes summary",
+        ]
+        for label, m in sorted(traced.items()):
+            for q in QUANTILES:
+                lines.append(f'assistant_command_peak_memory_bytes{{command="{_label(label)}",quantile="{q / 100}"}} {m.peak_memory.percentile(q):.0f}')
+            lines.append(f'assistant_command_peak_memory_bytes_sum{{command="{_label(label)}"}} {m.peak_memory.total:.0f}')
+            lines.append(f'assistant_command_peak_memory_bytes_count{{command="{_label(label)}"}} {m.peak_memory.count}')
+    return "\n".join(lines) + "\n"
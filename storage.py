@@ -0,0 +1,140 @@
+import contextlib
+import json
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# --- CONSTANTS ---
+# none: leave flushing to the OS; data: fsync the file before it replaces the old one;
+# full: also fsync the directory so the rename itself survives a power cut.
+FSYNC_POLICIES = ("none", "data", "full")
+FSYNC_POLICY = None   # resolved on the first write that needs it; see fsync_policy()
+POLICY_SOURCE = None  # set by config: returns the `storage.fsync` setting
+
+def fsync_policy():
+    """The policy for writes that do not pass one. Looked up through POLICY_SOURCE on
+    first use (not at import, so a broken settings file cannot stop the app starting);
+    config keeps FSYNC_POLICY current after that."""
+    global FSYNC_POLICY
+    if FSYNC_POLICY is None:
+        FSYNC_POLICY = POLICY_SOURCE() if POLICY_SOURCE else os.environ.get("ASSISTANT_FSYNC", "data")
+    return FSYNC_POLICY
+
+# --- LOCKING ---
+
+@contextlib.contextmanager
+def locked(path: str, exclusive: bool = True):
+    """Holds an advisory lock for `path` across processes.
+
+    The lock lives on a `<path>.lock` sidecar because atomic replaces swap the data
+    file's inode, which would silently drop a lock taken on the file itself.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        else:
+            # msvcrt has no shared locks; every lock is exclusive on Windows.
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+        yield
+    finally:
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+def _fsync_dir(directory: str):
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory or ".", os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+# --- ATOMIC WRITES ---
+
+def atomic_write(path: str, data, fsync: str = None):
+    """Writes text or bytes to a temp file in the same directory and os.replace()s it
+    over `path`, so readers see either the old or the new file, never a truncated one.
+    Callers that read-modify-write must hold `locked(path)`."""
+    fsync = fsync or fsync_policy()
+    if fsync not in FSYNC_POLICIES:
+        raise ValueError(f"Unknown fsync policy '{fsync}'. Use: {', '.join(FSYNC_POLICIES)}")
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data.encode("utf-8") if isinstance(data, str) else data)
+            f.flush()
+            if fsync != "none":
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+    if fsync == "full":
+        _fsync_dir(directory)
+
+def append_line(path: str, line: str, fsync: str = None):
+    """Appends one line under the file lock."""
+    fsync = fsync or fsync_policy()
+    with locked(path):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line if line.endswith("\n") else line + "\n")
+            f.flush()
+            if fsync != "none":
+                os.fsync(f.fileno())
+
+# --- READ / UPDATE HELPERS ---
+
+def _read_lines_unlocked(path: str):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return f.readlines()
+
+def read_lines(path: str):
+    """Returns the file's lines (with newlines), or [] if it does not exist."""
+    with locked(path, exclusive=False):
+        return _read_lines_unlocked(path)
+
+def update_lines(path: str, mutate, fsync: str = None):
+    """Read-modify-write under one exclusive lock. `mutate(lines)` returns
+    (new_lines, result); new_lines=None leaves the file untouched. Returns result."""
+    with locked(path):
+        new_lines, result = mutate(_read_lines_unlocked(path))
+        if new_lines is not None:
+            atomic_write(path, "".join(new_lines), fsync)
+        return result
+
+def read_json(path: str, default=None):
+    with locked(path, exclusive=False):
+        if not os.path.exists(path):
+            return default
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+def update_json(path: str, mutate, default=None, fsync: str = None):
+    """Like update_lines for a JSON document. `mutate(data)` returns (new_data, result)."""
+    with locked(path):
+        data = default
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        new_data, result = mutate(data)
+        if new_data is not None:
+            atomic_write(path, json.dumps(new_data, indent=2), fsync)
+        return result
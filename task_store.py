@@ -0,0 +1,205 @@
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+
+# --- CONSTANTS ---
+TASKS_DB = "data/tasks.db"
+LEGACY_TASKS_FILE = "data/tasks.txt"
+STATUSES = ("open", "done", "deleted")
+PRIORITY_NAMES = {"high": 1, "medium": 3, "low": 5}
+DEFAULT_PRIORITY = 3
+SORT_ORDERS = {
+    "priority": "t.priority, t.due IS NULL, t.due, t.id",
+    "due": "t.due IS NULL, t.due, t.priority, t.id",
+    "created": "t.created, t.id",
+    "id": "t.id",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    text      TEXT NOT NULL,
+    status    TEXT NOT NULL DEFAULT 'open',
+    priority  INTEGER NOT NULL DEFAULT 3,
+    due       TEXT,
+    created   TEXT NOT NULL,
+    completed TEXT
+);
+CREATE TABLE IF NOT EXISTS task_tags (
+    task_id INTEGER NOT NULL REFERENCES tasks(id),
+    tag     TEXT NOT NULL,
+    PRIMARY KEY (task_id, tag)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_tasks_status_priority ON tasks(status, priority, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_status_due ON tasks(status, due);
+CREATE INDEX IF NOT EXISTS idx_task_tags_tag ON task_tags(tag, task_id);
+"""
+
+# One connection per thread: the REPL, background jobs and RPC workers all use the store,
+# and `with conn:` transactions on a shared connection would commit each other's work.
+_local = threading.local()
+_prepared = set()  # db paths whose schema and legacy import are done
+_prepare_lock = threading.Lock()
+
+# --- CONNECTION ---
+
+def _connect(db_path: str = TASKS_DB):
+    """Returns this thread's cached connection, creating the schema and importing
+    tasks.txt once per database."""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_path)
+    if conn is not None:
+        return conn
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")  # readers never block the writer
+    conn.execute("PRAGMA synchronous=NORMAL")
+    with _prepare_lock:
+        if db_path not in _prepared:
+            conn.executescript(_SCHEMA)
+            _migrate_legacy(conn, db_path)
+            _prepared.add(db_path)
+    connections[db_path] = conn
+    return conn
+
+def _migrate_legacy(conn, db_path):
+    """Imports the old `[timestamp] text` lines file into the database once."""
+    legacy = os.path.join(os.path.dirname(db_path), os.path.basename(LEGACY_TASKS_FILE))
+    if not os.path.exists(legacy):
+        return
+    if conn.execute("SELECT 1 FROM tasks LIMIT 1").fetchone():
+        return
+    rows = []
+    with open(legacy, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            m = re.match(r"\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] (.*)", line)
+            created, text = (m.group(1), m.group(2)) if m else (_now(), line)
+            rows.append((text, DEFAULT_PRIORITY, created))
+    with conn:
+        conn.executemany("INSERT INTO tasks (text, priority, created) VALUES (?, ?, ?)", rows)
+    os.replace(legacy, legacy + ".migrated")
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+# --- PARSING HELPERS ---
+
+def parse_priority(value):
+    if value is None:
+        return DEFAULT_PRIORITY
+    value = str(value).lower()
+    if value in PRIORITY_NAMES:
+        return PRIORITY_NAMES[value]
+    if value.isdigit() and 1 <= int(value) <= 5:
+        return int(value)
+    raise ValueError("Priority must be 1-5 or high/medium/low.")
+
+def parse_due(value, today: date = None):
+    """Accepts YYYY-MM-DD, today, tomorrow or +Nd. Returns an ISO date string."""
+    if value is None:
+        return None
+    today = today or date.today()
+    value = value.lower()
+    if value == "today":
+        return today.isoformat()
+    if value == "tomorrow":
+        return (today + timedelta(days=1)).isoformat()
+    m = re.fullmatch(r"\+(\d+)d", value)
+    if m:
+        return (today + timedelta(days=int(m.group(1)))).isoformat()
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f"Invalid due date '{value}'. Use YYYY-MM-DD, today, tomorrow or +Nd.")
+
+def parse_tags(value):
+    if not value:
+        return []
+    return sorted({t.strip().lower() for t in value.split(",") if t.strip()})
+
+# --- OPERATIONS ---
+
+def add_task(text: str, priority=None, due=None, tags=None, db_path: str = TASKS_DB):
+    """Inserts a task and returns its stable ID."""
+    conn = _connect(db_path)
+    with conn:
+        cur = conn.execute(
+            "INSERT INTO tasks (text, priority, due, created) VALUES (?, ?, ?, ?)",
+            (text, parse_priority(priority), parse_due(due), _now()),
+        )
+        task_id = cur.lastrowid
+        conn.executemany("INSERT OR IGNORE INTO task_tags (task_id, tag) VALUES (?, ?)",
+                         [(task_id, tag) for tag in parse_tags(tags)])
+    return task_id
+
+def set_status(task_id: int, status: str, db_path: str = TASKS_DB):
+    """Single-row status update by primary key. Returns the task row or None."""
+    if status not in STATUSES:
+        raise ValueError(f"Unknown status '{status}'.")
+    conn = _connect(db_path)
+    with conn:
+        cur = conn.execute(
+            "UPDATE tasks SET status = ?, completed = ? WHERE id = ? AND status != ?",
+            (status, _now() if status == "done" else None, task_id, status),
+        )
+    if not cur.rowcount:
+        return None
+    return conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+
+def complete_task(task_id: int, db_path: str = TASKS_DB):
+    return set_status(task_id, "done", db_path)
+
+def delete_task(task_id: int, db_path: str = TASKS_DB):
+    # Soft delete: the row stays for history and IDs are never reused.
+    return set_status(task_id, "deleted", db_path)
+
+def reopen_task(task_id: int, db_path: str = TASKS_DB):
+    return set_status(task_id, "open", db_path)
+
+def _due_clause(due: str, today: date):
+    if due == "overdue":
+        return "t.due < ?", [today.isoformat()]
+    if due == "week":
+        return "t.due BETWEEN ? AND ?", [today.isoformat(), (today + timedelta(days=7)).isoformat()]
+    if due == "none":
+        return "t.due IS NULL", []
+    return "t.due = ?", [parse_due(due, today)]
+
+def list_tasks(status: str = "open", due: str = None, tag: str = None, sort: str = "priority",
+               limit: int = 100, db_path: str = TASKS_DB, today: date = None):
+    """Returns (rows, total_matching). Filters map onto the status/due/tag indexes."""
+    if sort not in SORT_ORDERS:
+        raise ValueError(f"Unknown sort '{sort}'. Use: {', '.join(SORT_ORDERS)}")
+    conn = _connect(db_path)
+    where, params = [], []
+    joins = ""
+    if status != "all":
+        if status not in STATUSES:
+            raise ValueError(f"Unknown status '{status}'. Use: {', '.join(STATUSES)}, all")
+        where.append("t.status = ?")
+        params.append(status)
+    if due:
+        clause, values = _due_clause(due.lower(), today or date.today())
+        where.append(clause)
+        params.extend(values)
+    if tag:
+        joins = "JOIN task_tags f ON f.task_id = t.id AND f.tag = ?"
+        params.insert(0, tag.lower())
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+    total = conn.execute(f"SELECT COUNT(*) FROM tasks t {joins} {where_sql}", params).fetchone()[0]
+    sql = (
+        f"SELECT t.*, (SELECT group_concat(tag, ',') FROM task_tags g WHERE g.task_id = t.id) AS tags "
+        f"FROM tasks t {joins} {where_sql} ORDER BY {SORT_ORDERS[sort]}"
+    )
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return conn.execute(sql, params).fetchall(), total
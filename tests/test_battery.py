@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+import battery
+from battery import Sample
+
+# --- FAKE SYSFS ---
+
+def _supply(root, name, **attributes):
+    directory = os.path.join(str(root), name)
+    os.makedirs(directory)
+    for attribute, value in attributes.items():
+        with open(os.path.join(directory, attribute), "w", encoding="ascii") as f:
+            f.write(f"{value}\n")
+
+@pytest.fixture
+def two_batteries(tmp_path):
+    _supply(tmp_path, "AC", type="Mains", online=0)
+    _supply(tmp_path, "BAT0", type="Battery", status="Discharging", present=1, capacity=60,
+            energy_now=30_000_000, energy_full=50_000_000, power_now=10_000_000)
+    _supply(tmp_path, "BAT1", type="Battery", status="Discharging", present=1, capacity=20,
+            energy_now=10_000_000, energy_full=50_000_000, power_now=5_000_000)
+    # A wireless mouse: reported by the same class, but not a system battery
+    _supply(tmp_path, "hidpp_battery_0", type="Battery", scope="Device", status="Discharging", capacity=5)
+    return str(tmp_path)
+
+# --- READING ---
+
+def test_read_sysfs_combines_batteries_by_energy(two_batteries):
+    reading = battery.read_sysfs(two_batteries)
+    assert reading.percent == pytest.approx(40.0)  # 40 of 100 Wh, not the mean of 60% and 20%
+    assert not reading.plugged
+    assert reading.status == "Discharging"
+    assert reading.seconds_left == 9600  # 40 Wh at 15 W
+    assert reading.source == "sysfs"
+
+def test_read_sysfs_charge_only_battery(tmp_path):
+    _supply(tmp_path, "ADP1", type="Mains", online=1)
+    _supply(tmp_path, "BAT0", type="Battery", status="Charging", capacity=49,
+            charge_now=2_000_000, charge_full=4_000_000, current_now=1_000_000, voltage_now=12_000_000)
+    reading = battery.read_sysfs(str(tmp_path))
+    assert reading.percent == pytest.approx(50.0)  # from the charge counters, finer than capacity
+    assert reading.plugged
+    assert reading.status == "Charging"
+    assert reading.seconds_left is None  # only estimated while discharging
+
+def test_read_sysfs_capacity_only_and_missing_battery(tmp_path):
+    _supply(tmp_path, "BAT0", type="Battery", status="Full", capacity=100)
+    reading = battery.read_sysfs(str(tmp_path))
+    assert reading.percent == 100.0 and reading.plugged  # no Mains entry: plugged from the status
+
+    _supply(tmp_path, "hid", type="Battery", scope="Device", capacity=50)
+    assert battery.read_sysfs(str(tmp_path)).percent == 100.0
+
+def test_read_sysfs_without_system_battery(tmp_path):
+    _supply(tmp_path, "AC", type="Mains", online=1)
+    _supply(tmp_path, "hidpp_battery_0", type="Battery", scope="Device", capacity=80)
+    assert battery.read_sysfs(str(tmp_path)) is None
+    assert battery.read_sysfs(str(tmp_path / "missing")) is None
+
+# --- ESTIMATION ---
+
+def _discharging(start=1_000_000, minutes=20, level=80.0, per_minute=0.2, plugged=False):
+    return [Sample(start + 60 * i, level - per_minute * i, plugged) for i in range(minutes + 1)]
+
+def test_estimate_known_slope():
+    fit = battery.estimate(_discharging(), window=3600)
+    assert fit.rate == pytest.approx(-12.0)  # 0.2% a minute
+    assert fit.seconds == pytest.approx(76.0 / 12.0 * 3600, abs=1)  # 76% left at 12%/h
+    assert fit.samples == 21 and fit.span == 1200
+
+def test_estimate_charging_counts_to_full():
+    samples = [Sample(1_000_000 + 60 * i, 50.0 + 0.5 * i, True) for i in range(11)]
+    fit = battery.estimate(samples, window=3600)
+    assert fit.rate == pytest.approx(30.0)
+    assert fit.seconds == pytest.approx(45.0 / 30.0 * 3600, abs=1)
+
+def test_estimate_uses_only_the_current_run():
+    unplugged = _discharging(minutes=10)
+    plugged = [Sample(unplugged[-1].time + 60 * i, 78.0 + 0.5 * i, True) for i in range(1, 11)]
+    fit = battery.estimate(unplugged + plugged, window=3600)
+    assert fit.rate == pytest.approx(30.0) and fit.samples == 10
+
+def test_estimate_needs_enough_samples_and_a_consistent_slope():
+    assert battery.estimate(_discharging(minutes=1), window=3600) is None  # two samples, 60 s
+    assert battery.estimate(_discharging(per_minute=-0.1), window=3600) is None  # rising while unplugged
+    gap = _discharging(minutes=5) + _discharging(start=1_000_000 + 300 + battery.MAX_GAP + 1, minutes=1)
+    assert battery.estimate(gap, window=86400) is None  # the run after a suspend is too short
+
+# --- HISTORY ---
+
+def test_record_and_load_history(tmp_path):
+    path = str(tmp_path / "battery.csv")
+    for sample in _discharging(minutes=4):
+        battery.record(battery.Reading(sample.time, sample.percent, False, "Discharging", None, "sysfs"), path)
+    with open(path, "a", encoding="ascii") as f:
+        f.write("garbage line\n")
+    assert [s.percent for s in battery.load_history(path)] == [80.0, 79.8, 79.6, 79.4, 79.2]
+    assert len(battery.load_history(path, since=1_000_000 + 120)) == 3
+    assert battery.trim(path, 1_000_000 + 60) == 2
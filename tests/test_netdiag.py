@@ -0,0 +1,207 @@
+import os
+import socket
+import threading
+
+import pytest
+
+import netdiag
+
+# --- FIXTURES ---
+
+ROUTE = """\
+Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\t\tMTU\tWindow\tIRTT
+wlan0\t00000000\t0101A8C0\t0003\t0\t0\t600\t00000000\t0\t0\t0
+eth0\t00000000\t0102A8C0\t0003\t0\t0\t100\t00000000\t0\t0\t0
+eth0\t0002A8C0\t00000000\t0001\t0\t0\t100\t00FFFFFF\t0\t0\t0
+"""
+
+IPV6_ROUTE = """\
+20010db8000000000000000000000000 40 00000000000000000000000000000000 00 00000000000000000000000000000000 00000100 00000001 00000000 00000001     eth0
+00000000000000000000000000000000 00 00000000000000000000000000000000 00 fe800000000000000000000000000001 00000400 00000002 00000000 00000003     eth0
+00000000000000000000000000000000 00 00000000000000000000000000000000 00 00000000000000000000000000000000 ffffffff 00000001 00000000 00200200       lo
+"""
+
+DEV = """\
+Inter-|   Receive                                                |  Transmit
+ face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed
+    lo:    1000      10    0    0    0     0          0         0     1000      10    0    0    0     0       0          0
+  eth0: 123456789 1000    1    2    0     0          0         5 987654321  2000    3    4    0     0       0          0
+ wlan0:       0       0    0    0    0     0          0         0        0     0    0    0    0     0       0          0
+"""
+
+IF_INET6 = """\
+00000000000000000000000000000001 01 80 10 80       lo
+fe800000000000000000000000000001 02 40 20 80     eth0
+20010db8000000000000000000000010 02 40 00 00     eth0
+"""
+
+def _write(root, relative, text):
+    path = os.path.join(str(root), relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="ascii") as f:
+        f.write(text)
+
+@pytest.fixture
+def proc(tmp_path):
+    root = tmp_path / "proc"
+    _write(root, "net/route", ROUTE)
+    _write(root, "net/ipv6_route", IPV6_ROUTE)
+    _write(root, "net/dev", DEV)
+    _write(root, "net/if_inet6", IF_INET6)
+    return str(root)
+
+@pytest.fixture
+def sys_root(tmp_path):
+    root = tmp_path / "sys"
+    for name, values in {
+        "eth0": {"operstate": "up", "address": "aa:bb:cc:dd:ee:ff", "mtu": "1500", "speed": "1000"},
+        "wlan0": {"operstate": "dormant", "address": "11:22:33:44:55:66", "mtu": "1500", "speed": "-1"},
+        "lo": {"operstate": "unknown", "address": "00:00:00:00:00:00", "mtu": "65536"},
+    }.items():
+        for attribute, value in values.items():
+            _write(root, f"class/net/{name}/{attribute}", value + "\n")
+    os.makedirs(root / "class" / "net" / "wlan0" / "wireless")
+    return str(root)
+
+# --- ROUTES ---
+
+def test_read_routes_ipv4(proc):
+    routes = netdiag.read_routes(proc)
+    assert routes[:3] == [
+        netdiag.Route("wlan0", "0.0.0.0", "192.168.1.1", "0.0.0.0", 3, 600),
+        netdiag.Route("eth0", "0.0.0.0", "192.168.2.1", "0.0.0.0", 3, 100),
+        netdiag.Route("eth0", "192.168.2.0", "0.0.0.0", "255.255.255.0", 1, 100),
+    ]
+
+def test_read_routes_ipv6(proc):
+    routes = netdiag.read_routes(proc)[3:]
+    assert routes[0] == netdiag.Route("eth0", "2001:db8::/64", "::", "64", 1, 0x100)
+    assert routes[1] == netdiag.Route("eth0", "::/0", "fe80::1", "0", 3, 0x400)
+    assert routes[2].interface == "lo"
+
+def test_default_gateways_ipv4_by_metric_then_ipv6(proc):
+    assert netdiag.default_gateways(proc) == [("eth0", "192.168.2.1"), ("wlan0", "192.168.1.1"), ("eth0", "fe80::1")]
+
+def test_read_routes_without_proc(tmp_path):
+    assert netdiag.read_routes(str(tmp_path)) == []
+
+# --- COUNTERS ---
+
+def test_read_counters(proc):
+    counters = netdiag.read_counters(proc)
+    assert set(counters) == {"lo", "eth0", "wlan0"}
+    assert counters["eth0"] == netdiag.Counters(123456789, 1000, 1, 2, 987654321, 2000, 3, 4)
+
+def test_sample_rates_reports_zero_for_a_counter_that_went_back(proc):
+    later = DEV.replace("123456789", "123457789").replace("    1000      10", "     500      10", 1)
+
+    def sleep(_interval):
+        _write(proc, "net/dev", later)
+
+    rates = next(netdiag.sample_rates(1.0, 1, proc, sleep=sleep))
+    assert rates["eth0"][0] > 0
+    assert rates["eth0"][1] == 0
+    assert rates["lo"][0] == 0
+
+# --- INTERFACES ---
+
+def test_interfaces(proc, sys_root, monkeypatch):
+    monkeypatch.setattr(netdiag, "_ipv4_addresses", lambda: {"eth0": ["192.168.2.10"], "lo": ["127.0.0.1"]})
+    found = {i.name: i for i in netdiag.interfaces(proc, sys_root, ssid=lambda name: "HomeNet")}
+    assert sorted(found) == ["eth0", "lo", "wlan0"]
+
+    eth0 = found["eth0"]
+    assert (eth0.state, eth0.mac, eth0.mtu, eth0.speed) == ("up", "aa:bb:cc:dd:ee:ff", 1500, 1000)
+    assert eth0.ipv4 == ["192.168.2.10"]
+    assert eth0.ipv6 == ["fe80::1/64", "2001:db8::10/64"]
+    assert not eth0.wireless and eth0.ssid is None
+    assert eth0.counters.tx_bytes == 987654321
+
+    wlan0 = found["wlan0"]
+    assert wlan0.wireless and wlan0.ssid == "HomeNet"
+    assert wlan0.speed is None  # -1 while not associated
+    assert wlan0.ipv4 == [] and wlan0.ipv6 == []
+
+    assert found["lo"].ipv6 == ["::1/128"]
+
+# --- PROBES AND SCANS ---
+
+class Listener:
+    """A TCP listener on 127.0.0.1 that accepts connections and optionally greets them."""
+
+    def __init__(self, banner: bytes = b""):
+        self.banner = banner
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(16)
+        self.port = self.sock.getsockname()[1]
+        self.accepted = []
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _address = self.sock.accept()
+            except OSError:
+                return
+            self.accepted.append(conn)  # kept open until close(), like a real service
+            if self.banner:
+                conn.sendall(self.banner)
+
+    def close(self):
+        self.sock.close()
+        for conn in self.accepted:
+            conn.close()
+
+@pytest.fixture
+def listener():
+    server = Listener()
+    yield server
+    server.close()
+
+@pytest.fixture
+def greeter():
+    server = Listener(b"SSH-2.0-OpenSSH_9.6 test\r\n")
+    yield server
+    server.close()
+
+@pytest.fixture
+def closed_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]  # nothing listens once the socket is closed
+
+def test_parse_ports():
+    assert netdiag.parse_ports("443,22,8000-8002,22") == [22, 443, 8000, 8001, 8002]
+    for spec in ("0", "70000", "10-5", "http", ""):
+        with pytest.raises(ValueError):
+            netdiag.parse_ports(spec)
+
+def test_parse_services():
+    assert netdiag.parse_services(["db:5432,web:443", "[::1]:8080"]) == [("db", 5432), ("web", 443), ("::1", 8080)]
+    with pytest.raises(ValueError):
+        netdiag.parse_services(["db"])
+
+def test_scan_open_closed_and_banner(listener, greeter, closed_port):
+    targets = [("127.0.0.1", listener.port), ("127.0.0.1", closed_port), ("127.0.0.1", greeter.port)]
+    results = netdiag.run_scan(targets, timeout=0.5, banner=True)
+    assert [(r.port, r.state) for r in results] == [(listener.port, "open"), (closed_port, "closed"), (greeter.port, "open")]
+    assert all(r.address == "127.0.0.1" for r in results)
+    assert results[0].banner is None  # connected, but the service never spoke
+    assert results[0].seconds is not None
+    assert results[2].banner == "SSH-2.0-OpenSSH_9.6 test"
+
+def test_scan_without_banner_does_not_read(greeter):
+    (result,) = netdiag.run_scan([("127.0.0.1", greeter.port)], timeout=0.5)
+    assert result.state == "open" and result.banner is None
+
+def test_check_services(listener, closed_port):
+    services = netdiag.parse_services([f"127.0.0.1:{listener.port},127.0.0.1:{closed_port}"])
+    results = netdiag.run_scan(services, timeout=0.5, concurrency=1)
+    assert [r.state for r in results] == ["open", "closed"]
+
+def test_probe_all(listener, closed_port):
+    up, down = netdiag.run_probes([("127.0.0.1", listener.port), ("127.0.0.1", closed_port)], count=3, timeout=1.0)
+    assert (up.host, up.port, up.address) == ("127.0.0.1", listener.port, "127.0.0.1")
+    assert len(up.times) == 3 and not up.errors
+    assert not down.times and len(down.errors) == 3
@@ -0,0 +1,181 @@
+import contextlib
+import heapq
+import os
+from hashlib import blake2b
+import re
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+# --- CONSTANTS ---
+CHUNK_SIZE = 1024 * 1024  # bytes per read for streaming passes
+SORT_MEMORY_MB = 64  # lines held in memory per sorted run before spilling to disk
+MAX_OPEN_RUNS = 128  # merge fan-in; more runs are merged in passes to stay under fd limits
+WORD_PATTERN = re.compile(r"\w+")
+_WHITESPACE = b" \t\n\r\v\f"
+# UTF-8 continuation bytes (10xxxxxx) do not start a character.
+_NON_CONTINUATION = bytes(b for b in range(256) if not 0x80 <= b <= 0xBF)
+
+# --- STATS ---
+
+def file_stats(path: str, chunk_size: int = CHUNK_SIZE):
+    """Returns line/word/character/byte counts like `wc`, reading the file in chunks."""
+    lines = words = chars = size = 0
+    in_word = False
+    last = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            lines += chunk.count(b"\n")
+            chars += len(chunk) - len(chunk.translate(None, _NON_CONTINUATION))
+            words += len(chunk.split())
+            # A word cut by the chunk boundary was counted on both sides.
+            if in_word and chunk[0] not in _WHITESPACE:
+                words -= 1
+            in_word = chunk[-1] not in _WHITESPACE
+            last = chunk[-1:]
+    if last and last != b"\n":
+        lines += 1  # final line without a trailing newline
+    return {"path": path, "lines": lines, "words": words, "chars": chars, "bytes": size}
+
+def _iter_text_chunks(path: str, chunk_size: int = CHUNK_SIZE):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+def word_counts(path: str, chunk_size: int = CHUNK_SIZE, ignore_case: bool = True):
+    """Counts words (\\w+) in a file chunk by chunk, carrying words split across chunks."""
+    counts = Counter()
+    carry = ""
+    for chunk in _iter_text_chunks(path, chunk_size):
+        text = carry + (chunk.lower() if ignore_case else chunk)
+        # Hold back a trailing partial word until the next chunk arrives.
+        cut = len(text)
+        while cut and (text[cut - 1].isalnum() or text[cut - 1] == "_"):
+            cut -= 1
+        carry = text[cut:]
+        counts.update(WORD_PATTERN.findall(text, 0, cut))
+    if carry:
+        counts[carry] += 1
+    return counts
+
+def top_words(counts: Counter, n: int):
+    """Selects the n most frequent words with a heap instead of a full sort."""
+    return heapq.nlargest(n, counts.items(), key=lambda item: (item[1], item[0]))
+
+def map_files(func, paths, workers: int = None):
+    """Runs func over several files in a process pool (in-process for a single file)."""
+    if len(paths) <= 1 or workers == 1:
+        return [func(p) for p in paths]
+    with ProcessPoolExecutor(max_workers=workers or min(len(paths), os.cpu_count() or 1)) as pool:
+        return list(pool.map(func, paths))
+
+# --- REGEX ---
+
+def iter_matches(path: str, pattern: str, ignore_case: bool = False):
+    """Yields (line_number, line) for lines matching pattern, streaming the file."""
+    regex = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line_number, line in enumerate(f, 1):
+            if regex.search(line):
+                yield line_number, line.rstrip("\n")
+
+def replace_stream(path: str, pattern: str, replacement: str, out, ignore_case: bool = False):
+    """Writes the file with every match replaced (line by line). Returns substitution count."""
+    regex = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+    total = 0
+    with open(path, "r", encoding="utf-8", errors="replace", newline="") as f:
+        for line in f:
+            line, n = regex.subn(replacement, line)
+            total += n
+            out.write(line)
+    return total
+
+# --- DEDUP / SORT ---
+
+def dedup_stream(path: str, out):
+    """Writes lines in original order, dropping repeats. Returns (lines_in, lines_out).
+
+    Only 16-byte digests of seen lines are kept, not the lines themselves.
+    """
+    seen = set()
+    lines_in = lines_out = 0
+    with open(path, "rb") as f:
+        for line in f:
+            lines_in += 1
+            key = blake2b(line.rstrip(b"\r\n"), digest_size=16).digest()
+            if key in seen:
+                continue
+            seen.add(key)
+            out.write(line if line.endswith(b"\n") else line + b"\n")
+            lines_out += 1
+    return lines_in, lines_out
+
+def _write_unique(sorted_lines, out):
+    """Writes sorted lines skipping adjacent duplicates. Returns lines written."""
+    written = 0
+    previous = None
+    for line in sorted_lines:
+        if line != previous:
+            out.write(line)
+            written += 1
+            previous = line
+    return written
+
+def _write_run(lines):
+    lines.sort()
+    fd, run_path = tempfile.mkstemp(prefix="sortrun_", suffix=".txt")
+    with os.fdopen(fd, "wb") as f:
+        _write_unique(lines, f)
+    return run_path
+
+def _merge_runs(run_paths, out):
+    with contextlib.ExitStack() as stack:
+        files = [stack.enter_context(open(r, "rb", buffering=256 * 1024)) for r in run_paths]
+        return _write_unique(heapq.merge(*files), out)
+
+def sort_unique(path: str, out, memory_mb: int = SORT_MEMORY_MB):
+    """Sorts lines and drops duplicates; spills sorted runs to the temp directory and
+    k-way merges them when the input is larger than memory_mb. Returns (lines_in, lines_out, runs)."""
+    budget = memory_mb * 1024 * 1024
+    runs = []
+    lines = []
+    used = 0
+    lines_in = 0
+    try:
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    line += b"\n"
+                lines.append(line)
+                lines_in += 1
+                used += len(line) + 64  # rough per-object overhead
+                if used >= budget:
+                    runs.append(_write_run(lines))
+                    lines, used = [], 0
+
+        if not runs:
+            return lines_in, _write_unique(sorted(set(lines)), out), 0
+        if lines:
+            runs.append(_write_run(lines))
+        lines = []
+        total_runs = len(runs)
+        while len(runs) > MAX_OPEN_RUNS:
+            group = runs[:MAX_OPEN_RUNS]
+            fd, merged_path = tempfile.mkstemp(prefix="sortrun_", suffix=".txt")
+            with os.fdopen(fd, "wb") as f:
+                _merge_runs(group, f)
+            runs = runs[MAX_OPEN_RUNS:] + [merged_path]
+            for run_path in group:
+                os.remove(run_path)
+        return lines_in, _merge_runs(runs, out), total_runs
+    finally:
+        for run_path in runs:
+            if os.path.exists(run_path):
+                os.remove(run_path)
@@ -2,15 +2,20 @@ import os
 import platform
 import subprocess
 import datetime
+import io
 import psutil
-import requests
-import random
+import secrets
+import threading
 import time
 from math import pi
+from storage import locked, read_lines, append_line, update_lines
+from config import get_setting
 
 # --- CONSTANTS ---
 NOTES_FILE = "data/notes.txt"
 CALC_HISTORY_FILE = "data/calc_history.txt"
+TAIL_CHECK_BYTES = 64
+SYSTEM = platform.system()  # fixed for the process; `open` runs often enough to not re-ask
 # Conversion factors (example set)
 CONVERSION_FACTORS = {
     "length": {"km_to_mi": 0.621371, "m_to_ft": 3.28084, "cm_to_in": 0.393701},
@@ -18,6 +23,29 @@ CONVERSION_FACTORS = {
     "temp": {"C_to_F": lambda c: (c * 9/5) + 32, "F_to_C": lambda f: (f - 32) * 5/9},
 }
 
+# --- ARGUMENT UTILITIES ---
+
+def parse_flags(args, value_flags=(), bool_flags=()):
+    """Splits command args into (positional, flags). Flag names are returned without dashes."""
+    positional = []
+    flags = {}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        name = arg.lower()
+        if name in value_flags:
+            if i + 1 >= len(args):
+                raise ValueError(f"Missing value for {arg}")
+            flags[name.lstrip("-")] = args[i + 1].strip('"').strip("'")
+            i += 2
+            continue
+        if name in bool_flags:
+            flags[name.lstrip("-")] = True
+        else:
+            positional.append(arg)
+        i += 1
+    return positional, flags
+
 # --- TIME & SYSTEM UTILITIES ---
 
 def get_time():
@@ -25,13 +53,13 @@ def get_time():
     return now.strftime("%Y-%m-%d %H:%M:%S")
 
 def open_path(path: str):
-    path = path.strip('"').strip("'")
+    path = os.path.expanduser(path.strip('"').strip("'"))
     if not os.path.exists(path):
         return False, f"Path not found: {path}"
     try:
-        if platform.system() == "Windows":
+        if SYSTEM == "Windows":
             os.startfile(path)
-        elif platform.system() == "Darwin":
+        elif SYSTEM == "Darwin":
             subprocess.Popen(["open", path])
         else:
             subprocess.Popen(["xdg-open", path])
@@ -57,23 +85,14 @@ def safe_eval(expr: str):
         raise ValueError(f"Cannot evaluate expression: {e}")
 
 def save_calc_history(entry: str):
-    os.makedirs(os.path.dirname(CALC_HISTORY_FILE) or ".", exist_ok=True)
-    with open(CALC_HISTORY_FILE, "a", encoding="utf-8") as f:
-        f.write(entry + "\n")
-    
-    # Keep only the last 10 entries
-    with open(CALC_HISTORY_FILE, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-        
-    if len(lines) > 10:
-        with open(CALC_HISTORY_FILE, "w", encoding="utf-8") as f:
-            f.writelines(lines[-10:]) # Keep only the last 10
+    def append_and_trim(lines):
+        # Keep only the last `history.calc_size` entries
+        return (lines + [entry + "\n"])[-get_setting("history.calc_size"):], None
+
+    update_lines(CALC_HISTORY_FILE, append_and_trim)
 
 def read_calc_history():
-    if not os.path.exists(CALC_HISTORY_FILE):
-        return []
-    with open(CALC_HISTORY_FILE, "r", encoding="utf-8") as f:
-        return f.readlines()
+    return read_lines(CALC_HISTORY_FILE)[-get_setting("history.calc_size"):]
 
 def convert_unit(type: str, value: float, unit_from: str, unit_to: str):
     key = f"{unit_from}_to_{unit_to}"
@@ -100,75 +119,159 @@ def convert_unit(type: str, value: float, unit_from: str, unit_to: str):
 
 def read_all_notes(file_path: str):
     """Reads all notes and returns them as a list of strings with indices."""
-    if not os.path.exists(file_path):
-        return []
-    with open(file_path, "r", encoding="utf-8") as f:
-        # returns list of lines, including newline characters
-        return f.readlines()
+    # returns list of lines, including newline characters
+    return read_lines(file_path)
 
 def append_note(file_path: str, text: str):
-    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
-    with open(file_path, "a", encoding="utf-8") as f:
-        ts = datetime.datetime.now().strftime("[%Y-%m-%d %H:%M:%S] ")
-        f.write(ts + text + "\n")
+    ts = datetime.datetime.now().strftime("[%Y-%m-%d %H:%M:%S] ")
+    append_line(file_path, ts + text + "\n")
 
 def save_notes_list(file_path: str, notes_list: list):
-    """Rewrites the file with a list of notes."""
-    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.writelines(notes_list)
+    """Rewrites the file with a list of notes (locked, atomic replace)."""
+    update_lines(file_path, lambda _lines: (notes_list, None))
 
 def delete_note_by_index(index: int):
-    notes = read_all_notes(NOTES_FILE)
     index_to_delete = index - 1 
-    
-    if 0 <= index_to_delete < len(notes):
-        deleted_note = notes.pop(index_to_delete).strip()
-        save_notes_list(NOTES_FILE, notes)
-        return True, deleted_note
-    else:
-        return False, f"Note number {index} not found."
+
+    def delete(notes):
+        if 0 <= index_to_delete < len(notes):
+            deleted_note = notes.pop(index_to_delete).strip()
+            return notes, (True, deleted_note)
+        return None, (False, f"Note number {index} not found.")
+
+    return update_lines(NOTES_FILE, delete)
+
+class NoteIndex:
+    """In-memory copy of a notes file (one string, plus a lowercased copy) for searches.
+
+    refresh() reads only the appended bytes when the file just grew, which is what
+    `note add` does, and rereads it otherwise (edits and deletes replace the file).
+    Every search checks os.stat() so a process sees its own writes immediately; the
+    watch service additionally refreshes the index in the background when another
+    process changes the file, so the next search does not pay for the read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.text = ""
+        self.lowered = ""
+        self._key = None  # (inode, size, mtime_ns) of the file as read
+        self._tail = b""  # last bytes read, to tell an append from a rewrite
+        self._lock = threading.RLock()
+        self._unsubscribe = None
+
+    def _watch(self):
+        if self._unsubscribe is not None or not get_setting("watch.enabled"):
+            return
+        from watcher import watch_service
+
+        target = os.path.abspath(self.path)
+        def on_change(events):
+            if any(event.kind == "rescan" or event.path == target for event in events):
+                self.refresh()
+        try:
+            self._unsubscribe = watch_service.subscribe(os.path.dirname(target), on_change)
+        except OSError:
+            self._unsubscribe = False  # not watchable; stat() checks still keep us current
+
+    def refresh(self):
+        with self._lock, locked(self.path, exclusive=False):
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                self.text, self.lowered, self._key, self._tail = "", "", None, b""
+                return
+            key = (st.st_ino, st.st_size, st.st_mtime_ns)
+            if key == self._key:
+                return
+            # Appended to if it is the same file, grew, ended in a complete line and still
+            # has the bytes we read last at the old end
+            appended = (self._key is not None and st.st_ino == self._key[0]
+                        and st.st_size > self._key[1] and self._tail.endswith(b"\n"))
+            with open(self.path, "rb") as f:
+                if appended:
+                    f.seek(self._key[1] - len(self._tail))
+                    appended = f.read(len(self._tail)) == self._tail
+                if not appended:
+                    f.seek(0)
+                data = f.read()
+            self._tail = (self._tail + data if appended else data)[-TAIL_CHECK_BYTES:]
+            text = data.decode("utf-8")
+            if "\r" in text:  # same newline translation as reading in text mode
+                text = text.replace("\r\n", "\n").replace("\r", "\n")
+            if appended:
+                self.text += text
+                self.lowered += text.lower()
+            else:
+                self.text, self.lowered = text, text.lower()
+            self._key = key
+
+    def search(self, keyword: str):
+        """[(1-based line number, stripped line)] for lines containing keyword (any case)."""
+        self._watch()
+        self.refresh()
+        with self._lock:
+            text, lowered = self.text, self.lowered
+        keyword = keyword.lower()
+        if not keyword or "\n" in keyword:
+            return [(index, line.strip()) for index, line in enumerate(io.StringIO(text).readlines(), 1)
+                    if keyword in line.lower()]
+        # str.lower() can change the length of non-ASCII text; then map through line numbers
+        same_offsets = len(text) == len(lowered)
+        lines = None if same_offsets else text.split("\n")
+        results = []
+        line_number, counted_to = 1, 0
+        position = lowered.find(keyword)
+        while position != -1:
+            line_number += lowered.count("\n", counted_to, position)
+            start = lowered.rfind("\n", 0, position) + 1
+            end = lowered.find("\n", position)
+            end = len(lowered) if end == -1 else end
+            line = text[start:end] if same_offsets else lines[line_number - 1]
+            results.append((line_number, line.strip()))
+            counted_to = end
+            position = lowered.find(keyword, end)
+        return results
+
+_note_indexes = {}
+
+def note_index(path: str = None):
+    """The shared NoteIndex for a notes file (default: NOTES_FILE)."""
+    path = os.path.abspath(path or NOTES_FILE)
+    index = _note_indexes.get(path)
+    if index is None:
+        index = _note_indexes.setdefault(path, NoteIndex(path))
+    return index
 
 def search_notes(keyword: str):
     """Returns a list of notes containing the keyword and their 1-based index."""
-    notes = read_all_notes(NOTES_FILE)
-    results = []
-    keyword_lower = keyword.lower()
-    for index, note in enumerate(notes, 1):
-        if keyword_lower in note.lower():
-            results.append((index, note.strip()))
-    return results
+    return note_index(NOTES_FILE).search(keyword)
 
 def delete_notes_by_keyword(keyword: str):
     """Deletes all notes containing the keyword."""
-    notes = read_all_notes(NOTES_FILE)
-    original_count = len(notes)
-    
-    # Filter out notes containing the keyword
-    notes_to_keep = [note for note in notes if keyword.lower() not in note.lower()]
-    
-    deleted_count = original_count - len(notes_to_keep)
-    
-    if deleted_count > 0:
-        save_notes_list(NOTES_FILE, notes_to_keep)
-    
-    return deleted_count
+    def delete(notes):
+        # Filter out notes containing the keyword
+        notes_to_keep = [note for note in notes if keyword.lower() not in note.lower()]
+        deleted_count = len(notes) - len(notes_to_keep)
+        return (notes_to_keep if deleted_count > 0 else None), deleted_count
+
+    return update_lines(NOTES_FILE, delete)
 
 def edit_note_by_index(index: int, new_text: str):
-    notes = read_all_notes(NOTES_FILE)
     index_to_edit = index - 1
-    
-    if 0 <= index_to_edit < len(notes):
-        # Extract the timestamp part
-        old_note = notes[index_to_edit].strip()
-        timestamp = old_note.split(']')[0] + ']' if ']' in old_note else f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]"
-        
-        # Replace the note with the old timestamp + new text
-        notes[index_to_edit] = f"{timestamp} {new_text}\n"
-        save_notes_list(NOTES_FILE, notes)
-        return True, old_note
-    else:
-        return False, f"Note number {index} not found."
+
+    def edit(notes):
+        if 0 <= index_to_edit < len(notes):
+            # Extract the timestamp part
+            old_note = notes[index_to_edit].strip()
+            timestamp = old_note.split(']')[0] + ']' if ']' in old_note else f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]"
+
+            # Replace the note with the old timestamp + new text
+            notes[index_to_edit] = f"{timestamp} {new_text}\n"
+            return notes, (True, old_note)
+        return None, (False, f"Note number {index} not found.")
+
+    return update_lines(NOTES_FILE, edit)
 
 # --- ADVANCED SYSTEM UTILITIES ---
 
@@ -269,59 +372,62 @@ def clean_system():
     
     return "System cleanup performed (basic)."
 
+def _format_duration(seconds: int):
+    m, _s = divmod(int(seconds), 60)
+    h, m = divmod(m, 60)
+    return f"{h:d}h {m:02d}m"
+
 def get_battery_info():
-    """Returns battery status if available (mainly for laptops)."""
-    if not hasattr(psutil, 'sensors_battery') or psutil.sensors_battery() is None:
-        return {"status": "N/A", "percent": "N/A", "time_left": "N/A", "plugged": False}
-    
-    battery = psutil.sensors_battery()
-    
-    if battery.power_plugged:
-        status = "Charging"
-    elif battery.percent == 100:
-        status = "Full"
-    elif battery.secsleft == psutil.POWER_TIME_UNLIMITED:
-        status = "Discharging (Time not available)"
-    else:
-        status = "Discharging"
-        
+    """Returns battery status if available (mainly for laptops). Each call is logged to
+    the battery history, and the time left comes from the rate measured over it."""
+    import battery
+
+    reading = battery.read_battery()
+    if reading is None:
+        return {"status": "N/A", "percent": "N/A", "time_left": "N/A", "plugged": False, "rate": None, "estimated": False}
+    battery.record(reading, keep_days=get_setting("battery.history_days"))
+    window = get_setting("battery.window") * 60
+    fit = battery.estimate(battery.load_history(since=reading.time - window), window)
+
     time_left = "N/A"
-    if battery.secsleft not in [psutil.POWER_TIME_UNLIMITED, psutil.POWER_TIME_UNKNOWN]:
-        # Convert seconds to HH:MM format
-        m, s = divmod(battery.secsleft, 60)
-        h, m = divmod(m, 60)
-        time_left = f"{h:d}h {m:02d}m"
+    if fit is not None:
+        time_left = _format_duration(fit.seconds) + (" to full" if reading.plugged else "")
+    elif reading.seconds_left is not None:
+        time_left = _format_duration(reading.seconds_left)
 
     return {
-        "status": status,
-        "percent": battery.percent,
+        "status": reading.status,
+        "percent": round(reading.percent, 1),
         "time_left": time_left,
-        "plugged": battery.power_plugged
+        "plugged": reading.plugged,
+        "rate": fit.rate if fit else None,
+        "estimated": fit is not None,
+        "samples": fit.samples if fit else 0,
     }
 
 def get_network_info():
     """Gets local network details (IP, gateway, Wi-Fi name)."""
+    from netdiag import default_gateways, interfaces
+
     info = {"IP Address": "N/A", "Gateway": "N/A", "Wi-Fi Name": "N/A"}
     
-    # 1. IP Address and Gateway (using psutil)
-    stats = psutil.net_if_addrs()
-    
-    # Find active interface with an IPv4 address
-    for name, addresses in stats.items():
-        if name != 'lo': # Skip loopback
-            for addr in addresses:
-                if addr.family == 2: # AF_INET (IPv4)
-                    info["IP Address"] = addr.address
-                    
-                    # Try to get Gateway using net_if_stats or routing table (complex, simplified here)
-                    # This often requires running external commands, but we'll use a basic check
-                    # Gateway detection is complex and platform-dependent, often requiring 'route' or 'ip route'.
-                    # For simplicity, we skip gateway detection here to avoid external calls.
-                    # info["Gateway"] is left as N/A
-                    break
+    # 1. IP Address and Gateway (/proc/net/route on Linux; no gateway elsewhere)
+    gateways = default_gateways()
+    primary = gateways[0][0] if gateways else None
+    if gateways:
+        info["Gateway"] = f"{gateways[0][1]} ({primary})"
+    links = interfaces()
+    # Prefer the default route's interface, then any other non-loopback one
+    for link in sorted(links, key=lambda link: link.name != primary):
+        if link.name != "lo" and link.ipv4:
+            info["IP Address"] = link.ipv4[0]
+            break
             
     # 2. Wi-Fi Name (SSID)
-    if platform.system() == "Windows":
+    if SYSTEM == "Linux":
+        info["Wi-Fi Name"] = next((link.ssid for link in links if link.ssid), "N/A")
+
+    elif SYSTEM == "Windows":
         try:
             # Requires running external command
             result = subprocess.run(['netsh', 'wlan', 'show', 'interfaces'], capture_output=True, text=True, check=True)
@@ -332,7 +438,7 @@ def get_network_info():
         except Exception:
             pass # Ignore errors if netsh fails
             
-    elif platform.system() == "Darwin":
+    elif SYSTEM == "Darwin":
         try:
             # Requires running external command
             result = subprocess.run(['/System/Library/PrivateFrameworks/Apple80211.framework/Versions/Current/Resources/airport', '-I'], capture_output=True, text=True, check=True)
@@ -348,35 +454,28 @@ def get_network_info():
 # --- FUN UTILITIES ---
 
 def get_random_string(length=12):
-    """Generates a simple random password-like string."""
+    """Generates a random password-like string (cryptographically secure)."""
     chars = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789!@#$%^&*'
-    return ''.join(random.choice(chars) for _ in range(length))
-
-def get_fun_quote():
-    """Fetches a random programming quote (using a public API)."""
-    try:
-        # Example API for programming quotes
-        response = requests.get("https://programming-quotes-api.herokuapp.com/quotes/random/lang/en")
-        data = response.json()
-        return f"\"{data.get('en')}\" - {data.get('author')}"
-    except Exception:
-        return "Couldn't fetch an external quote. Enjoy coding!"
-
-def get_fun_joke():
-    """Provides programming-related jokes (Updated for English version)."""
-    jokes = [
-        "Why do programmers prefer dark mode? Because light attracts bugs!",
-        "How many programmers does it take to change a light bulb? None, that's a hardware problem.",
-        "Why do Java developers wear glasses? Because they can't C#!",
-        "A SQL query goes into a bar, walks up to two tables and asks: 'Can I join you?'",
-        "Why did the programmer quit his job? He didn't get arrays!",
-        "What do you call a programmer from Finland? Nerdic.",
-        "Why do Python programmers prefer snakes? Because they're always trying to catch exceptions!",
-        "How do you comfort a JavaScript bug? You console it!",
-        "Why don't programmers like nature? It has too many bugs.",
-        "What's a programmer's favorite hangout place? The Foo Bar!"
-    ]
-    return random.choice(jokes)
+    return ''.join(secrets.choice(chars) for _ in range(length))
+
+def _fun_entry(kind: str, tags=()):
+    import corpus
+
+    corpus.refresh_in_background(kind, get_setting(f"fun.{kind}_source"), get_setting("fun.refresh_hours") * 3600)
+    return corpus.random_entry(kind, tags)
+
+def get_fun_quote(tags=()):
+    """Returns a random quote from the local corpus (data/quotes.jsonl), or None if no
+    quote has all of `tags`. A configured `fun.quote_source` is fetched in the background."""
+    entry = _fun_entry("quote", tags)
+    if entry is None:
+        return None
+    return f"\"{entry.text}\" - {entry.author}" if entry.author else f"\"{entry.text}\""
+
+def get_fun_joke(tags=()):
+    """Returns a random programming joke from the local corpus (data/jokes.jsonl), or None."""
+    entry = _fun_entry("joke", tags)
+    return entry.text if entry else None
 
 # --- REMINDERS (requires plyer) ---
 def set_reminder(title, message, delay_seconds):
@@ -0,0 +1,455 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from config import get_setting, subscribe
+
+# --- CONSTANTS ---
+COALESCE_DELAY = 0.05  # seconds to let a burst of events pile up before dispatching
+
+# kind: "created", "modified", "deleted", or "rescan" when events were lost (path is the
+# watched root and subscribers should rebuild whatever they keep for it)
+ChangeEvent = namedtuple("ChangeEvent", "kind path is_dir")
+
+def is_under(path: str, root: str):
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+# --- INOTIFY (LINUX, CTYPES) ---
+
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x1000000
+IN_EXCL_UNLINK = 0x4000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_EXCL_UNLINK)
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+class InotifyBackend:
+    """One inotify watch per directory (inotify is not recursive); directories created
+    or moved in later are watched as they appear. Events are read on a daemon thread."""
+
+    name = "inotify"
+
+    def __init__(self, emit):
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, f"inotify_init1: {os.strerror(code)}")
+        self._emit = emit
+        self._lock = threading.RLock()
+        self._paths = {}  # wd -> directory
+        self._wds = {}    # directory -> wd
+        self._roots = set()
+        self._wake_r, self._wake_w = os.pipe()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="watch-inotify", daemon=True)
+        self._thread.start()
+
+    def add(self, root: str):
+        with self._lock:
+            added = []
+            try:
+                self._watch_tree(root, added)
+            except OSError:
+                for directory in added:
+                    self._unwatch(directory)
+                raise
+            self._roots.add(root)
+
+    def remove(self, root: str):
+        with self._lock:
+            self._roots.discard(root)
+            for directory in [d for d in self._wds if is_under(d, root)]:
+                if not any(is_under(directory, other) for other in self._roots):
+                    self._unwatch(directory)
+
+    def sync(self):
+        """Dispatches whatever the kernel has queued so far."""
+        self._drain()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        os.write(self._wake_w, b"x")
+        self._thread.join()
+        for fd in (self._fd, self._wake_r, self._wake_w):
+            os.close(fd)
+
+    def _watch_tree(self, top: str, added):
+        for dirpath, _dirnames, _filenames in os.walk(top):
+            if dirpath in self._wds:
+                continue
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd < 0:
+                code = ctypes.get_errno()
+                if code in (errno.ENOENT, errno.ENOTDIR):  # removed while we walked
+                    continue
+                hint = " (raise fs.inotify.max_user_watches)" if code == errno.ENOSPC else ""
+                raise OSError(code, f"inotify_add_watch: {os.strerror(code)}{hint}", dirpath)
+            self._paths[wd] = dirpath
+            self._wds[dirpath] = wd
+            added.append(dirpath)
+
+    def _unwatch(self, directory: str):
+        wd = self._wds.pop(directory, None)
+        if wd is not None:
+            self._paths.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def _forget(self, top: str):
+        """Drops the mapping for a moved-away subtree; its watches now report other paths."""
+        for directory in [d for d in self._wds if is_under(d, top)]:
+            self._unwatch(directory)
+
+    def _run(self):
+        while True:
+            readable, _, _ = select.select([self._fd, self._wake_r], [], [])
+            if self._wake_r in readable:
+                return
+            time.sleep(COALESCE_DELAY)
+            self._drain()
+
+    def _drain(self):
+        with self._lock:
+            if self._closed:
+                return
+            data = b""
+            while True:
+                try:
+                    chunk = os.read(self._fd, 64 * 1024)
+                except BlockingIOError:
+                    break
+                if not chunk:
+                    break
+                data += chunk
+            events = self._parse(data) if data else []
+        if events:
+            self._emit(events)
+
+    def _parse(self, data: bytes):
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                events.extend(ChangeEvent("rescan", root, True) for root in sorted(self._roots))
+                continue
+            if mask & IN_IGNORED:
+                directory = self._paths.pop(wd, None)
+                if directory is not None and self._wds.get(directory) == wd:
+                    del self._wds[directory]
+                continue
+            directory = self._paths.get(wd)
+            if directory is None:
+                continue
+            if not name:  # the watched directory itself
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF) and directory in self._roots:
+                    events.append(ChangeEvent("deleted", directory, True))
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            is_dir = bool(mask & IN_ISDIR)
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                if is_dir:
+                    try:
+                        self._watch_tree(path, [])
+                    except OSError:
+                        events.extend(ChangeEvent("rescan", root, True) for root in self._roots if is_under(path, root))
+                events.append(ChangeEvent("created", path, is_dir))
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                if is_dir:
+                    self._forget(path)
+                events.append(ChangeEvent("deleted", path, is_dir))
+            elif not is_dir:
+                events.append(ChangeEvent("modified", path, False))
+        return events
+
+# --- WATCHDOG ---
+
+class WatchdogBackend:
+    """The `watchdog` package (FSEvents, ReadDirectoryChangesW, kqueue, inotify)."""
+
+    name = "watchdog"
+
+    def __init__(self, emit):
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.event_type == "moved":
+                    emit([ChangeEvent("deleted", os.fsdecode(event.src_path), event.is_directory),
+                          ChangeEvent("created", os.fsdecode(event.dest_path), event.is_directory)])
+                elif event.event_type in ("created", "deleted"):
+                    emit([ChangeEvent(event.event_type, os.fsdecode(event.src_path), event.is_directory)])
+                elif event.event_type in ("modified", "closed") and not event.is_directory:
+                    emit([ChangeEvent("modified", os.fsdecode(event.src_path), False)])
+
+        self._handler = Handler()
+        self._observer = Observer()
+        self._observer.daemon = True
+        self._observer.start()
+        self._watches = {}
+
+    def add(self, root: str):
+        self._watches[root] = self._observer.schedule(self._handler, root, recursive=True)
+
+    def remove(self, root: str):
+        watch = self._watches.pop(root, None)
+        if watch is not None:
+            self._observer.unschedule(watch)
+
+    def sync(self):
+        time.sleep(COALESCE_DELAY)  # no way to flush the observer; give it a moment
+
+    def close(self):
+        self._observer.stop()
+        self._observer.join()
+
+# --- POLLING ---
+
+def _snapshot(root: str):
+    """{path: (is_dir, mtime_ns, size)} for everything under root."""
+    found = {}
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                st = entry.stat(follow_symlinks=False)
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            found[entry.path] = (is_dir, st.st_mtime_ns, 0 if is_dir else st.st_size)
+            if is_dir:
+                stack.append(entry.path)
+    return found
+
+class PollingBackend:
+    """Rescans every root each `watch.poll_interval` seconds and reports the differences.
+    Works everywhere, but costs a stat() per file per interval."""
+
+    name = "polling"
+
+    def __init__(self, emit):
+        self._emit = emit
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="watch-polling", daemon=True)
+        self._thread.start()
+
+    def add(self, root: str):
+        if not os.path.isdir(root):
+            raise FileNotFoundError(errno.ENOENT, "Directory not found", root)
+        snapshot = _snapshot(root)
+        with self._lock:
+            self._snapshots[root] = snapshot
+
+    def remove(self, root: str):
+        with self._lock:
+            self._snapshots.pop(root, None)
+
+    def sync(self):
+        self._poll()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(get_setting("watch.poll_interval")):
+            self._poll()
+
+    def _poll(self):
+        with self._lock:
+            events = []
+            for root, old in self._snapshots.items():
+                new = _snapshot(root)
+                for path, state in new.items():
+                    previous = old.get(path)
+                    if previous is None or previous[0] != state[0]:
+                        events.append(ChangeEvent("created", path, state[0]))
+                    elif previous != state and not state[0]:
+                        events.append(ChangeEvent("modified", path, False))
+                events.extend(ChangeEvent("deleted", path, state[0]) for path, state in old.items() if path not in new)
+                self._snapshots[root] = new
+        if events:
+            self._emit(events)
+
+# --- SERVICE ---
+
+def _create_backend(name: str, emit):
+    """The requested backend; for "auto", the first of inotify, watchdog, polling that works."""
+    order = {"auto": (InotifyBackend, WatchdogBackend, PollingBackend), "inotify": (InotifyBackend,),
+             "watchdog": (WatchdogBackend,), "polling": (PollingBackend,)}[name]
+    error = None
+    for backend in order:
+        try:
+            return backend(emit)
+        except (OSError, ImportError, AttributeError) as e:
+            error = e
+    raise OSError(f"watch backend '{name}' is not available: {error}")
+
+class WatchService:
+    """Watches directories for the caches that mirror the filesystem and publishes
+    ChangeEvents to them, so they can update the entries that changed instead of
+    rescanning.
+
+    subscribe(root, callback) calls callback([ChangeEvent]) from the watch thread for
+    changes under root. The backend is started with the first subscription; a root the
+    backend cannot watch (e.g. out of inotify watches) falls back to polling.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._backend = None
+        self._fallback = None
+        self._roots = {}        # root -> backend watching it
+        self._subscribers = []  # (root, callback)
+        self.events = 0
+        self.errors = []
+
+    @property
+    def backend(self):
+        return self._backend.name if self._backend else None
+
+    def subscribe(self, root: str, callback):
+        """Starts watching root (recursively). Returns a function that unsubscribes."""
+        root = os.path.abspath(root)
+        entry = (root, callback)
+        with self._lock:
+            if not any(is_under(root, watched) for watched in self._roots):
+                self._watch(root)
+            self._subscribers.append(entry)
+
+        def unsubscribe():
+            with self._lock:
+                if entry in self._subscribers:
+                    self._subscribers.remove(entry)
+                self._release_unused()
+        return unsubscribe
+
+    def roots(self):
+        """[(root, backend name, subscriber count)]"""
+        with self._lock:
+            return [(root, backend.name, sum(1 for r, _cb in self._subscribers if is_under(r, root)))
+                    for root, backend in sorted(self._roots.items())]
+
+    def sync(self):
+        """Delivers events that are already pending, so a caller about to read a cache
+        sees changes made just before (best effort for watchdog)."""
+        with self._lock:
+            backends = {id(b): b for b in self._roots.values()}.values()
+        for backend in backends:
+            backend.sync()
+
+    def restart(self):
+        """Re-creates the backend (after `watch.backend` changes) and asks every
+        subscriber to rescan, since events may have been missed meanwhile."""
+        with self._lock:
+            roots = list(self._roots)
+            old = self._detach_backends()
+        for backend in old:  # outside the lock: their threads may be dispatching
+            backend.close()
+        with self._lock:
+            for root in roots:
+                self._watch(root)
+            subscribers = list(self._subscribers)
+        for root, callback in subscribers:
+            self._call(callback, [ChangeEvent("rescan", root, True)])
+
+    def close(self):
+        with self._lock:
+            self._subscribers = []
+            old = self._detach_backends()
+        for backend in old:
+            backend.close()
+
+    def _watch(self, root: str):
+        if self._backend is None:
+            self._backend = _create_backend(get_setting("watch.backend"), self._dispatch)
+        try:
+            self._backend.add(root)
+            backend = self._backend
+        except OSError as e:
+            if isinstance(self._backend, PollingBackend) or e.errno not in (errno.ENOSPC, errno.EMFILE):
+                raise
+            if self._fallback is None:
+                self._fallback = PollingBackend(self._dispatch)
+            self._fallback.add(root)
+            backend = self._fallback
+            self.errors.append(f"{root}: {e.strerror}; polling instead")
+        # A new root may cover roots watched before; those watches are now redundant
+        for other in [r for r in self._roots if is_under(r, root)]:
+            self._roots.pop(other).remove(other)
+        self._roots[root] = backend
+
+    def _release_unused(self):
+        for root in list(self._roots):
+            if not any(is_under(r, root) for r, _cb in self._subscribers):
+                self._roots.pop(root).remove(root)
+
+    def _detach_backends(self):
+        old = [backend for backend in (self._backend, self._fallback) if backend is not None]
+        self._backend = self._fallback = None
+        self._roots = {}
+        return old
+
+    def _dispatch(self, events):
+        unique = list(dict.fromkeys(events))
+        with self._lock:
+            self.events += len(unique)
+            subscribers = list(self._subscribers)
+        for root, callback in subscribers:
+            relevant = []
+            for event in unique:
+                if event.kind == "rescan" and is_under(root, event.path):
+                    relevant.append(ChangeEvent("rescan", root, True))
+                elif is_under(event.path, root):
+                    relevant.append(event)
+            if relevant:
+                self._call(callback, relevant)
+
+    def _call(self, callback, events):
+        try:
+            callback(events)
+        except Exception as e:  # a broken subscriber must not stop the watch thread
+            with self._lock:
+                self.errors = (self.errors + [f"{getattr(callback, '__qualname__', callback)}: {e}"])[-20:]
+
+watch_service = WatchService()
+
+def _apply_backend(_key, _old, _new):
+    # Not inline: settings calls subscribers under its lock, which the polling thread needs to stop
+    if watch_service.backend is not None:
+        threading.Thread(target=watch_service.restart, name="watch-restart", daemon=True).start()
+
+subscribe("watch.backend", _apply_backend)